@@ -1,105 +1,448 @@
 # application/execute_refresh_uc.py
 
+import os
+import threading
 from datetime import datetime
-import pytz
 from domain.refresh_job import RefreshJob
-from infrastructure.config_loader import ConfigLoader
-from infrastructure.logger_service import LoggerService
-from infrastructure.email_notifier import EmailNotifier
+from domain.connection_selection import ConnectionSelection
+from domain.validation_rules import ValidationRules
+from domain.exceptions import FileLockedError, ExcelGatewayError, RefreshCancelledError
+from application.refresh_queue import RefreshJobQueue
+from application.refresh_planner import RefreshPlanner
+from application.refresh_graph import RefreshGraph, SKIPPED_UPSTREAM
+from application.hedged_refresh import HedgePolicy, HedgedRun, PRINCIPAL, BACKUP
 from infrastructure.excel_gateway import ExcelGateway
+from infrastructure.excel_backend import create_backend
+from infrastructure.excel_pool import ExcelPool
+from infrastructure.excel_supervisor import get_excel_supervisor
+from infrastructure.fingerprint_cache import FingerprintCache
+from application.runtime_context import get_runtime_context
+from infrastructure.retry_policy import RetryPolicy, get_circuit_breaker
+from infrastructure.phase_timer import PhaseRecorder, NULL_RECORDER, new_run_id
+from infrastructure.file_watcher import DirectoryWatcher
+from infrastructure.staging import StagingArea
+from infrastructure.screenshot_service import ScreenshotService, NULL_SCREENSHOTS
+from infrastructure.run_history import RunHistory
 
-def execute_refresh(files=None):
-    config = ConfigLoader()
-    logger = LoggerService(config.get("LOG_LEVEL", "INFO")).get_logger()
-    notifier = EmailNotifier(logger, config)
+SKIPPED_UNCHANGED = "SKIPPED (unchanged)"
 
-    tz = pytz.timezone(config.get("TIMEZONE", "UTC"))
+def execute_refresh(files=None, progress=None, context=None):
+    """
+    Refresca los archivos activos (o solo `files`) y envía el reporte.
+    `progress(evento)` recibe avisos por archivo (inicio y fin) y devuelve los resultados.
+    Los servicios (config, logger, notificador, jobs...) salen del RuntimeContext del proceso.
+    """
+    context = (context or get_runtime_context()).refresh()
+    config = context.config
+    logger = context.logger
+    notifier = context.notifier
+    tz = context.tz
     t_start_global = datetime.now(tz)
 
-    from application.scheduler_uc import SchedulerUseCase
-    scheduler_uc = SchedulerUseCase()
-    all_jobs = scheduler_uc._load_jobs()
+    all_jobs = context.jobs()
     
     # Solo los activos si no se especifican archivos
-    principals = files if files else [j["path"] for j in all_jobs if j.get("activo", True)]
-    backups = [j.get("backup", "") for j in all_jobs if j.get("activo", True)] if not files else []
+    if files:
+        # Para archivos puntuales tomamos sus opciones del excels.json, pero sin backup
+        jobs_by_path = {j.get("path"): j for j in all_jobs}
+        tareas = [dict(jobs_by_path.get(f, {}), path=f, backup=None) for f in files]
+    else:
+        tareas = [j for j in all_jobs if j.get("activo", True)]
 
-    if not principals:
+    if not tareas:
         logger.info("Aún no tienes archivos activos para actualizar.")
-        return
+        return []
 
-    resultados = []
+    # Dependencias entre libros: "depends_on" y vínculos externos entre los de excels.json
+    known = {j.get("path") for j in all_jobs}
+    graph = RefreshGraph.from_tasks(
+        all_jobs + [t for t in tareas if t["path"] not in known], logger,
+        detect_links=config.get_bool("DEPENDENCY_DETECT_LINKS", True),
+    )
+    max_parallel = max(1, min(config.get_int("REFRESH_MAX_PARALLEL", 1), len(tareas)))
+    orden = _plan_tasks(tareas, max_parallel, config, logger, graph)
+    fingerprints = context.fingerprints
+    run_id = new_run_id()
+    recorder = PhaseRecorder.from_config(config, logger, run_id=run_id)
+    screenshots = ScreenshotService.from_config(config, logger, run_id=run_id)
+    try:
+        history = RunHistory.from_config(config) # Duraciones para el umbral de hedging (None si está deshabilitado)
+        resultados = _run_tasks([tareas[i] for i in orden], max_parallel, logger, config, tz, fingerprints, recorder, screenshots,
+                                progress, history, graph)
+    finally:
+        # Las capturas se comprimen en segundo plano: esperamos a que estén en disco antes del correo
+        screenshots.close()
 
-    for idx, principal_path in enumerate(principals):
-        backup_path = backups[idx] if backups else None
-        t_file_start = datetime.now(tz)
-        logger.info(f"Empezando a procesar el archivo: {principal_path}")
+    # El plan solo cambia el orden de ejecución: el reporte y el correo salen en el orden de entrada
+    resultados = _input_order(resultados, orden)
 
-        try:
-            job = RefreshJob(principal_path)
-            gateway = ExcelGateway(logger, config)
-            result_principal = job.execute(gateway)
+    # Resumen final
+    t_end_global = datetime.now(tz)
+    _record_history(config, logger, run_id, t_start_global, t_end_global, resultados)
+    resumen = build_report(resultados, t_start_global, t_end_global)
+    
+    # Recolectar archivos exitosos para adjuntar (el notifier decidirá si incluirlos según el .env)
+    excel_attachments = [r["archivo"] for r in resultados if r["estado"].startswith("OK")]
 
-            t_file_end = datetime.now(tz)
-            resultados.append({
-                "archivo": principal_path,
-                "estado": "OK",
-                "duracion": round((t_file_end - t_file_start).total_seconds(), 2),
-                "refresh_time": result_principal["refresh_time"],
-                "fallback": False
-            })
+    notifier.send_email(
+        "Pivoty - Reporte de archivos actualizados", resumen,
+        attachments=excel_attachments,
+        screenshots=_failure_screenshots(tareas, resultados, screenshots),
+    )
 
-        except Exception as e:
-            logger.error(f"Hubo un problema con el archivo {principal_path}: {str(e)}")
-            if backup_path:
-                logger.info(f"Probando ahora con la copia de seguridad (backup): {backup_path}")
-                try:
-                    job_bk = RefreshJob(backup_path)
-                    gateway = ExcelGateway(logger, config)
-                    result_backup = job_bk.execute(gateway)
-                    t_file_end = datetime.now(tz)
-                    resultados.append({
-                        "archivo": principal_path,
-                        "estado": "OK (BACKUP)",
-                        "duracion": round((t_file_end - t_file_start).total_seconds(), 2),
-                        "refresh_time": result_backup["refresh_time"],
-                        "fallback": True,
-                        "backup_path": backup_path
-                    })
-                except Exception as e2:
-                    logger.error(f"La copia de seguridad también tuvo problemas: {str(e2)}")
-                    resultados.append({
-                        "archivo": principal_path,
-                        "estado": "ERROR",
-                        "error": f"Principal: {str(e)} | Backup: {str(e2)}",
-                        "fallback": True
-                    })
-            else:
-                resultados.append({
-                    "archivo": principal_path,
-                    "estado": "ERROR",
-                    "error": str(e),
-                    "fallback": False
-                })
+    logger.info("=== Tareas terminadas con éxito ===")
+    return resultados
 
-    # Resumen final
-    t_end_global = datetime.now(tz)
-    total_global = round((t_end_global - t_start_global).total_seconds(), 2)
+
+def build_report(resultados, t_start_global, t_end_global):
+    """Texto del correo con el resultado de cada archivo y el tiempo total de la corrida."""
     resumen = "REPORTE DE LO QUE HIZO EL BOT\n\n"
     for r in resultados:
         if r["estado"].startswith("OK"):
             resumen += f"✔ {r['archivo']}\n   Estado: {r['estado']}\n   Duración: {r['duracion']}s\n   Tiempo Refresh: {r['refresh_time']}s\n"
+            fases = _format_phases(r)
+            if fases:
+                resumen += f"   Fases: {fases}\n"
+            if r.get("conexiones"):
+                detalle = ", ".join(f"{c['nombre']} ({c['segundos']}s)" for c in r["conexiones"])
+                resumen += f"   Conexiones: {detalle}\n"
             if r.get("fallback"):
                 resumen += f"   Se usó BACKUP: {r['backup_path']}\n"
+            if r.get("hedge"):
+                resumen += f"   Hedging: {_format_hedge(r['hedge'])}\n"
             resumen += "\n"
+        elif r["estado"] == SKIPPED_UNCHANGED:
+            resumen += f"⏭ {r['archivo']}\n   Estado: {r['estado']}\n   Sin cambios en sus fuentes desde: {r.get('ultima_actualizacion')}\n\n"
+        elif r["estado"] == SKIPPED_UPSTREAM:
+            resumen += f"⏭ {r['archivo']}\n   Estado: {r['estado']}\n   Detalle: {r['error']}\n\n"
         else:
             resumen += f"❌ {r['archivo']}\n   FALLÓ\n   Detalle: {r['error']}\n   Fallback usado: {r['fallback']}\n\n"
 
+    total_global = round((t_end_global - t_start_global).total_seconds(), 2)
     resumen += f"Tiempo total del bot: {total_global} segundos\nInicio: {t_start_global}\nFin: {t_end_global}\n"
-    
-    # Recolectar archivos exitosos para adjuntar (el notifier decidirá si incluirlos según el .env)
-    excel_attachments = [r["archivo"] for r in resultados if r["estado"].startswith("OK")]
+    return resumen
 
-    notifier.send_email("Pivoty - Reporte de archivos actualizados", resumen, attachments=excel_attachments)
 
-    logger.info("=== Tareas terminadas con éxito ===")
+# --------------------------
+# Ejecución de las tareas (secuencial o en paralelo)
+# --------------------------
+def _run_tasks(tareas, max_parallel, logger, config, tz, fingerprints=None, recorder=NULL_RECORDER, screenshots=NULL_SCREENSHOTS, progress=None,
+               history=None, graph=None):
+    """
+    Procesa las tareas (jobs de excels.json) y devuelve los resultados en el mismo
+    orden de entrada. Con max_parallel > 1 cada hilo tiene su propio apartamento
+    COM y su propio pool de Excel. Los archivos abiertos por un usuario se
+    aparcan y la corrida sigue con los siguientes.
+    Con `graph`, cada libro empieza apenas terminan bien los libros de los que
+    depende; si alguno falla, se omite.
+    """
+    resultados = [None] * len(tareas)
+    upstream, blocked = graph.for_run(tareas) if graph else ({}, set())
+    cola = RefreshJobQueue(
+        tareas,
+        logger,
+        base_delay=config.get_int("LOCK_WAIT_BASE_SECONDS", 5),
+        max_delay=config.get_int("LOCK_WAIT_MAX_DELAY_SECONDS", 60),
+        max_wait=config.get_int("LOCK_WAIT_TIMEOUT_SECONDS", 300),
+        upstream=upstream,
+    )
+    for idx in sorted(blocked):
+        logger.error(f"{tareas[idx]['path']} está en un ciclo de dependencias (depends_on / vínculos): no se actualiza.")
+        resultados[idx] = {"archivo": tareas[idx]["path"], "estado": "ERROR", "error": "Dependencia circular", "fallback": False}
+        cola.discard(idx)
+    # Si un archivo aparcado se libera (el usuario cierra Excel), su carpeta cambia y lo reintentamos enseguida
+    watcher = DirectoryWatcher(logger, cola.notify_changed)
+    stats = {"created": 0, "reused": 0}
+    # Vigila los EXCEL.EXE de todos los hilos; al crearse cierra los que dejó una corrida anterior
+    supervisor = get_excel_supervisor(config, logger)
+    stats_lock = threading.Lock()
+
+    def worker():
+        # Cada hilo tiene su propio pool: un solo Excel reutilizado para todos sus archivos
+        pool = ExcelPool.from_config(create_backend(), logger, config, supervisor=supervisor)
+        gateway = ExcelGateway(logger, config, pool=pool, screenshots=screenshots)
+        try:
+            while True:
+                item = cola.get()
+                if item is None:
+                    break
+                idx, tarea = item
+                _notify(progress, {"evento": "inicio", "archivo": tarea["path"]})
+                try:
+                    resultados[idx] = _process_file(tarea, gateway, logger, config, tz, fingerprints, recorder, park_on_lock=True, history=history)
+                except FileLockedError:
+                    if cola.park(idx, tarea):
+                        watcher.watch(os.path.dirname(os.path.abspath(tarea["path"])))
+                        _notify(progress, {"evento": "en_espera", "archivo": tarea["path"]})
+                        continue
+                    # Se acabó la espera: falla con su propio error (o prueba el backup)
+                    resultados[idx] = _process_file(tarea, gateway, logger, config, tz, fingerprints, recorder, park_on_lock=False, history=history)
+                except Exception as e:
+                    resultados[idx] = {"archivo": tarea["path"], "estado": "ERROR", "error": str(e), "fallback": False}
+                _notify(progress, {"evento": "fin", "archivo": tarea["path"], "estado": resultados[idx]["estado"]})
+                for child, tarea_child, failed in cola.task_done(idx, ok=_succeeded(resultados[idx])):
+                    resultados[child] = _skipped_upstream(tarea_child, tareas[failed], logger)
+                    _notify(progress, {"evento": "fin", "archivo": tarea_child["path"], "estado": SKIPPED_UPSTREAM})
+        finally:
+            pool.shutdown()
+            with stats_lock:
+                stats["created"] += pool.stats["created"]
+                stats["reused"] += pool.stats["reused"]
+
+    watcher.start()
+    try:
+        if max_parallel <= 1:
+            worker()
+        else:
+            logger.info(f"Actualizando {len(tareas)} archivos con {max_parallel} Excel en paralelo.")
+            hilos = [threading.Thread(target=worker, name=f"pivoty-refresh-{i + 1}") for i in range(max_parallel)]
+            for t in hilos:
+                t.start()
+            for t in hilos:
+                t.join()
+    finally:
+        watcher.stop()
+
+    logger.info(f"Instancias de Excel abiertas: {stats['created']}, reutilizadas: {stats['reused']}")
+    for idx, resultado in enumerate(resultados):
+        if resultado is None:
+            # Un hilo murió (o la cola no lo entregó) sin dejar resultado: cuenta como error, no se pierde del reporte
+            logger.error(f"{tareas[idx]['path']} quedó sin resultado: el trabajador terminó sin informar.")
+            resultados[idx] = {"archivo": tareas[idx]["path"], "estado": "ERROR", "error": "El trabajador terminó sin informar resultado", "fallback": False}
+    return resultados
+
+
+def _succeeded(resultado):
+    return resultado["estado"].startswith("OK") or resultado["estado"] == SKIPPED_UNCHANGED
+
+
+def _skipped_upstream(tarea, failed, logger):
+    logger.warning(f"Se omite {tarea['path']}: depende de {failed['path']}, que no se pudo actualizar.")
+    return {
+        "archivo": tarea["path"],
+        "estado": SKIPPED_UPSTREAM,
+        "error": f"Depende de {failed['path']}, que no se pudo actualizar",
+        "fallback": False
+    }
+
+
+def _plan_tasks(tareas, max_parallel, config, logger, graph=None):
+    """
+    Orden de ejecución según el plan (con límite primero, luego las más largas),
+    como índices de `tareas`.
+    """
+    orden = list(range(len(tareas)))
+    if len(tareas) < 2 or not config.get_bool("REFRESH_PLANNER_ENABLED", True):
+        return orden
+    try:
+        plan = RefreshPlanner.from_config(config, logger=logger).plan(tareas, max_parallel, graph)
+    except Exception as e:
+        # Sin plan se procesa en el orden de excels.json
+        logger.warning(f"No se pudo planificar la corrida, se usa el orden de excels.json: {e}")
+        return orden
+    logger.info(f"Fin estimado de la corrida: {plan.predicted_finish:%H:%M:%S} ({round(plan.makespan)}s).")
+    for job in plan.late_jobs():
+        logger.warning(f"{job.path} podría terminar después de su hora límite ({job.deadline:%H:%M}).")
+    index = {id(t): i for i, t in enumerate(tareas)}
+    return [index[id(t)] for t in plan.ordered_tasks]
+
+
+def _input_order(resultados, orden):
+    """`resultados` viene en el orden de ejecución `orden`; se devuelve en el orden de entrada."""
+    ordenados = [None] * len(orden)
+    for posicion, idx in enumerate(orden):
+        ordenados[idx] = resultados[posicion]
+    return ordenados
+
+
+def _record_history(config, logger, run_id, inicio, fin, resultados):
+    run_history = RunHistory.from_config(config)
+    if run_history is None:
+        return
+    try:
+        run_history.record_run(run_id, inicio, fin, resultados)
+        run_history.compact()
+    except Exception as e:
+        # El historial es informativo: si falla, la corrida sigue igual
+        logger.warning(f"No se pudo guardar el historial de la corrida: {e}")
+
+
+def _notify(progress, evento):
+    if progress is None:
+        return
+    try:
+        progress(evento)
+    except Exception:
+        pass # Un aviso de progreso nunca debe frenar el refresh
+
+
+def _process_file(tarea, gateway, logger, config, tz, fingerprints=None, recorder=NULL_RECORDER, park_on_lock=False,
+                  history=None):
+    principal_path = tarea["path"]
+    backup_path = tarea.get("backup")
+    selection = ConnectionSelection.from_job(tarea)
+    policy = RetryPolicy.from_job(tarea, config)
+    validation = ValidationRules.from_job(tarea, config)
+    staging = StagingArea.from_job(tarea, config)
+    t_file_start = datetime.now(tz)
+    timer = recorder.job(principal_path)
+    timer_bk = recorder.job(backup_path) if backup_path else None
+    logger.info(f"Empezando a procesar el archivo: {principal_path}")
+
+    # --- OMITIR SI LAS FUENTES NO CAMBIARON ---
+    fingerprint = None
+    skip_unchanged = tarea.get("omitir_sin_cambios", config.get_bool("SKIP_UNCHANGED", False))
+    if fingerprints and skip_unchanged and FingerprintCache.is_tracked(tarea):
+        with timer.phase("huellas"):
+            unchanged, fingerprint, refreshed_at = fingerprints.check(tarea)
+        if unchanged:
+            logger.info(f"Las fuentes de {principal_path} no cambiaron desde {refreshed_at}, se omite el refresh.")
+            return {
+                "archivo": principal_path,
+                "estado": SKIPPED_UNCHANGED,
+                "ultima_actualizacion": refreshed_at,
+                "fallback": False
+            }
+
+    def run_principal(cancel_token=None):
+        return _run_job(principal_path, selection, policy, validation, staging, gateway, logger, config, timer, cancel_token)
+
+    def run_backup(cancel_token=None, backup_gateway=None):
+        return _run_job(backup_path, selection, policy, validation, staging, backup_gateway or gateway, logger, config, timer_bk, cancel_token)
+
+    def ok_principal(result):
+        if fingerprint is not None:
+            fingerprints.update(principal_path, fingerprint)
+        return {
+            "archivo": principal_path,
+            "estado": "OK",
+            "duracion": round((datetime.now(tz) - t_file_start).total_seconds(), 2),
+            "refresh_time": result["refresh_time"],
+            "conexiones": result.get("conexiones"),
+            "tiempos": timer.summary(),
+            "fallback": False
+        }
+
+    def ok_backup(result):
+        return {
+            "archivo": principal_path,
+            "estado": "OK (BACKUP)",
+            "duracion": round((datetime.now(tz) - t_file_start).total_seconds(), 2),
+            "refresh_time": result["refresh_time"],
+            "conexiones": result.get("conexiones"),
+            "tiempos": timer.summary(),
+            "tiempos_backup": timer_bk.summary(),
+            "fallback": True,
+            "backup_path": backup_path
+        }
+
+    def both_failed(e, e2):
+        return {
+            "archivo": principal_path,
+            "estado": "ERROR",
+            "error": f"Principal: {str(e)} | Backup: {str(e2)}",
+            "tiempos": timer.summary(),
+            "fallback": True
+        }
+
+    # --- HEDGING: si el principal tarda de más, el backup corre en paralelo ---
+    hedge = HedgePolicy.from_job(tarea, config, history) if backup_path else None
+    try:
+        if hedge is None:
+            return ok_principal(run_principal())
+
+        outcome = HedgedRun(hedge, run_principal, lambda token: _run_hedged_backup(run_backup, token, logger, config, gateway), logger).run()
+        if outcome.winner == PRINCIPAL:
+            result = ok_principal(outcome.result)
+            if outcome.backup_started:
+                result["hedge"] = outcome.summary(hedge)
+            return result
+        if outcome.winner == BACKUP:
+            return dict(ok_backup(outcome.result), hedge=outcome.summary(hedge))
+        if outcome.backup_started:
+            logger.error(f"Fallaron el principal y el backup lanzado en paralelo: {outcome.primary_error} | {outcome.backup_error}")
+            return dict(both_failed(outcome.primary_error, outcome.backup_error), hedge=outcome.summary(hedge))
+        raise outcome.primary_error # Falló antes del umbral: sigue el fallback de siempre
+
+    except Exception as e:
+        if park_on_lock and isinstance(e, FileLockedError):
+            raise # El hilo lo aparca y sigue con otro archivo
+        logger.error(f"Hubo un problema con el archivo {principal_path}: {str(e)}")
+        if not backup_path:
+            return {
+                "archivo": principal_path,
+                "estado": "ERROR",
+                "error": str(e),
+                "tiempos": timer.summary(),
+                "fallback": False
+            }
+
+        logger.info(f"Probando ahora con la copia de seguridad (backup): {backup_path}")
+        try:
+            return ok_backup(run_backup())
+        except Exception as e2:
+            logger.error(f"La copia de seguridad también tuvo problemas: {str(e2)}")
+            return both_failed(e, e2)
+
+
+def _run_hedged_backup(run_backup, cancel_token, logger, config, gateway):
+    """El backup en paralelo corre en otro hilo: necesita su propio Excel (y apartamento COM)."""
+    pool = ExcelPool.from_config(create_backend(), logger, config, supervisor=get_excel_supervisor(config, logger))
+    try:
+        backup_gateway = ExcelGateway(logger, config, pool=pool, screenshots=gateway.screenshots)
+        return run_backup(cancel_token, backup_gateway)
+    finally:
+        pool.shutdown()
+
+
+def _run_job(excel_path, selection, policy, validation, staging, gateway, logger, config, timer=None, cancel_token=None):
+    """Ejecuta el refresh de un libro respetando su circuit breaker."""
+    breaker = get_circuit_breaker(config)
+    open_until = breaker.open_until(excel_path)
+    if open_until:
+        raise ExcelGatewayError(
+            f"Se pausaron los intentos a este archivo por fallos repetidos hasta las {datetime.fromtimestamp(open_until):%H:%M}"
+        )
+
+    job = RefreshJob(
+        excel_path, selection=selection, retry_policy=policy, validation=validation, staging=staging, cancel_token=cancel_token
+    )
+    try:
+        result = job.execute(gateway, timer=timer)
+    except (FileLockedError, RefreshCancelledError):
+        raise # Que un usuario tenga el archivo abierto (o que se cancele) no es un fallo del libro
+    except Exception:
+        if breaker.record_failure(excel_path):
+            logger.warning(f"{excel_path} falló varias veces seguidas: no se intentará durante {breaker.cooldown_seconds // 60} min.")
+        raise
+    breaker.record_success(excel_path)
+    return result
+
+
+def _failure_screenshots(tareas, resultados, screenshots):
+    """Última captura de cada archivo que falló o terminó usando su backup."""
+    rutas = []
+    for tarea, r in zip(tareas, resultados):
+        if r["estado"] in ("OK", SKIPPED_UNCHANGED, SKIPPED_UPSTREAM):
+            continue
+        for archivo in (tarea["path"], tarea.get("backup")):
+            capturas = screenshots.captures(archivo) if archivo else []
+            if capturas:
+                rutas.append(capturas[-1]["ruta"])
+    return rutas
+
+
+def _format_hedge(hedge):
+    texto = f"ganó el {hedge['ganador'] or 'ninguno'}, backup lanzado a los {hedge['backup_inicio']}s (umbral {hedge['umbral']}s)"
+    if hedge.get("ahorro_estimado"):
+        texto += f", ahorro estimado {hedge['ahorro_estimado']}s"
+    return texto
+
+
+def _format_phases(resultado):
+    """Fases del intento que terminó bien, para el resumen del correo."""
+    tiempos = resultado.get("tiempos_backup") or resultado.get("tiempos")
+    if not tiempos or not tiempos["intentos"]:
+        return ""
+    ultimo = tiempos["intentos"][-1]
+    return ", ".join(f"{k} {v}s" for k, v in ultimo["fases"].items())
@@ -0,0 +1,157 @@
+# application/hedged_refresh.py
+
+import time
+import threading
+from infrastructure.cancel_token import CancelToken
+from infrastructure.run_history import percentile
+
+PRINCIPAL = "principal"
+BACKUP = "backup"
+
+
+class HedgePolicy:
+    """
+    Cuándo lanzar el backup en paralelo si el principal tarda demasiado.
+
+    En excels.json (el job debe tener "backup"):
+        "hedge": true                          -> umbral = p95 histórico x HEDGE_P95_FACTOR
+        "hedge": {"umbral_segundos": 900}      -> umbral fijo
+    El p95 sale de las últimas HEDGE_HISTORY_RUNS corridas exitosas del libro
+    en el RunHistory. Sin historial ni umbral fijo no se hace hedging (solo el
+    fallback de siempre).
+    """
+
+    def __init__(self, threshold_seconds, p95=None):
+        self.threshold_seconds = threshold_seconds
+        self.p95 = p95
+
+    @classmethod
+    def from_job(cls, job, config, history=None):
+        data = job.get("hedge", config.get_bool("HEDGE_ENABLED", False))
+        if not data or not job.get("backup"):
+            return None
+        data = data if isinstance(data, dict) else {}
+        durations = []
+        if history is not None:
+            try:
+                durations = history.durations(job["path"], limit=config.get_int("HEDGE_HISTORY_RUNS", 50))
+            except Exception:
+                pass # Sin historial legible se usa solo el umbral fijo, si hay
+        p95 = percentile(durations, 95)
+
+        if data.get("umbral_segundos"):
+            return cls(float(data["umbral_segundos"]), p95)
+        if p95 is None:
+            return None
+        factor = float(data.get("factor_p95", config.get("HEDGE_P95_FACTOR", 1.5)))
+        minimum = config.get_int("HEDGE_MIN_SECONDS", 60)
+        return cls(max(p95 * factor, minimum), p95)
+
+
+class HedgeOutcome:
+    def __init__(self):
+        self.winner = None
+        self.result = None
+        self.primary_error = None
+        self.backup_error = None
+        self.backup_started_at = None # Segundos desde el inicio
+        self.elapsed = None
+
+    @property
+    def backup_started(self):
+        return self.backup_started_at is not None
+
+    def summary(self, policy):
+        """Datos para el reporte: quién ganó y el tiempo ahorrado estimado (contra el p95 del principal)."""
+        saved = None
+        if self.winner == BACKUP and policy.p95 is not None:
+            saved = round(max(0.0, policy.p95 - self.elapsed), 2)
+        return {
+            "ganador": self.winner,
+            "umbral": round(policy.threshold_seconds, 2),
+            "backup_inicio": round(self.backup_started_at, 2) if self.backup_started else None,
+            "ahorro_estimado": saved,
+        }
+
+
+class HedgedRun:
+    """
+    Ejecuta el principal en el hilo actual (su Excel pertenece a este hilo) y, si
+    pasa el umbral, el backup en otro hilo con su propio Excel. El primero que
+    termina bien gana; al otro se le cancela con su CancelToken.
+
+    run_primary(token) y run_backup(token) devuelven el resultado o lanzan excepción.
+    """
+
+    def __init__(self, policy, run_primary, run_backup, logger, clock=time.monotonic):
+        self.policy = policy
+        self.run_primary = run_primary
+        self.run_backup = run_backup
+        self.logger = logger
+        self.clock = clock
+
+    def run(self):
+        outcome = HedgeOutcome()
+        primary_token, backup_token = CancelToken(), CancelToken()
+        lock = threading.Lock()
+        state = {"primary_done": False, "thread": None}
+        t0 = self.clock()
+
+        def backup_main():
+            try:
+                result = self.run_backup(backup_token)
+            except Exception as e:
+                with lock:
+                    outcome.backup_error = e
+                return
+            with lock:
+                if outcome.winner is None:
+                    outcome.winner = BACKUP
+                    outcome.result = result
+                    outcome.elapsed = self.clock() - t0
+                    primary_running = not state["primary_done"]
+                else:
+                    primary_running = False
+            if primary_running:
+                self.logger.info("El backup terminó primero: se cancela el principal.")
+                primary_token.cancel("el backup terminó primero")
+
+        def start_backup():
+            with lock:
+                if state["primary_done"]:
+                    return
+                outcome.backup_started_at = self.clock() - t0
+                thread = threading.Thread(target=backup_main, name="pivoty-hedge-backup", daemon=True)
+                state["thread"] = thread
+            self.logger.info(
+                f"El principal lleva más de {round(self.policy.threshold_seconds)}s: "
+                f"se lanza el backup en paralelo."
+            )
+            thread.start()
+
+        timer = threading.Timer(self.policy.threshold_seconds, start_backup)
+        timer.daemon = True
+        timer.start()
+        try:
+            result = self.run_primary(primary_token)
+        except Exception as e:
+            result = None
+            outcome.primary_error = e
+        finally:
+            timer.cancel()
+
+        with lock:
+            state["primary_done"] = True
+            if outcome.primary_error is None and outcome.winner is None:
+                outcome.winner = PRINCIPAL
+                outcome.result = result
+                outcome.elapsed = self.clock() - t0
+            thread = state["thread"]
+
+        if thread is not None:
+            if outcome.winner == PRINCIPAL:
+                self.logger.info("El principal terminó primero: se cancela el backup.")
+                backup_token.cancel("el principal terminó primero")
+            # Esperamos al backup: si ganó ya terminó; si no, termina al cancelarse o al fallar
+            thread.join()
+        return outcome
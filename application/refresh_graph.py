@@ -0,0 +1,125 @@
+# application/refresh_graph.py
+
+import os
+from infrastructure.xlsx_inspector import external_links
+
+SKIPPED_UPSTREAM = "SKIPPED (dependencia)"
+
+
+def _key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class RefreshGraph:
+    """
+    Dependencias entre los libros de excels.json: un libro se refresca después
+    de los libros de los que toma datos.
+
+    En excels.json:
+        "depends_on": "C:/Reportes/Ventas.xlsx"     (o una lista; vale solo el nombre si es único)
+    Además se detectan los vínculos externos del libro (xl/externalLinks) hacia
+    otros libros de la lista, salvo "detectar_vinculos": false.
+    """
+
+    def __init__(self, upstream, paths):
+        self._upstream = upstream # key -> {key de los libros de los que depende}
+        self._paths = paths # key -> ruta tal como está en excels.json
+        self._downstream = {}
+        for key, ups in upstream.items():
+            for up in ups:
+                self._downstream.setdefault(up, set()).add(key)
+
+    @classmethod
+    def from_tasks(cls, tareas, logger=None, detect_links=True):
+        paths = {_key(t["path"]): t["path"] for t in tareas}
+        by_name = {}
+        for key in paths:
+            by_name.setdefault(os.path.basename(key), []).append(key)
+
+        def resolve(ref):
+            key = _key(ref)
+            if key in paths:
+                return key
+            same_name = by_name.get(os.path.normcase(os.path.basename(ref)), [])
+            return same_name[0] if len(same_name) == 1 else None
+
+        upstream = {}
+        for t in tareas:
+            key = _key(t["path"])
+            ups = set()
+            declared = t.get("depends_on") or []
+            for ref in [declared] if isinstance(declared, str) else declared:
+                up = resolve(ref)
+                if up is None:
+                    if logger:
+                        logger.warning(f"{t['path']} depende de {ref}, que no está en la lista de archivos: se ignora.")
+                    continue
+                ups.add(up)
+
+            if detect_links and t.get("detectar_vinculos", True):
+                for link in _safe_links(t["path"], logger):
+                    if _key(link) in paths:
+                        ups.add(_key(link))
+            ups.discard(key)
+            if ups:
+                upstream[key] = ups
+        return cls(upstream, paths)
+
+    def __bool__(self):
+        return bool(self._upstream)
+
+    def upstream(self, path):
+        return {self._paths[k] for k in self._upstream.get(_key(path), ())}
+
+    def downstream(self, path):
+        return {self._paths[k] for k in self._downstream.get(_key(path), ())}
+
+    def descendants(self, paths):
+        """Todos los libros que dependen (directa o indirectamente) de `paths`."""
+        pending = [_key(p) for p in paths]
+        seen = set()
+        while pending:
+            for child in self._downstream.get(pending.pop(), ()):
+                if child not in seen:
+                    seen.add(child)
+                    pending.append(child)
+        return [self._paths[k] for k in seen]
+
+    def for_run(self, tareas):
+        """
+        Dependencias entre las tareas de una corrida, por índice:
+        ({idx: {idx de las que depende}}, {idx en un ciclo o que dependen de uno}).
+        Las dependencias hacia libros que no están en la corrida se ignoran.
+        """
+        index = {_key(t["path"]): i for i, t in enumerate(tareas)}
+        upstream = {}
+        for key, i in index.items():
+            ups = {index[u] for u in self._upstream.get(key, ()) if u in index}
+            if ups:
+                upstream[i] = ups
+
+        # Kahn: lo que no se puede ordenar está en un ciclo (o depende de uno)
+        pending = {i: len(ups) for i, ups in upstream.items()}
+        downstream = {}
+        for i, ups in upstream.items():
+            for u in ups:
+                downstream.setdefault(u, []).append(i)
+        ready = [i for i in range(len(tareas)) if i not in pending]
+        while ready:
+            for child in downstream.get(ready.pop(), ()):
+                pending[child] -= 1
+                if pending[child] == 0:
+                    del pending[child]
+                    ready.append(child)
+        return upstream, set(pending)
+
+
+def _safe_links(path, logger):
+    if not path.lower().endswith((".xlsx", ".xlsm")) or not os.path.exists(path):
+        return []
+    try:
+        return external_links(path)
+    except Exception as e:
+        if logger:
+            logger.debug(f"No se pudieron leer los vínculos externos de {path}: {e}")
+        return []
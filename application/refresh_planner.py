@@ -0,0 +1,221 @@
+# application/refresh_planner.py
+
+import os
+import heapq
+from datetime import datetime, timedelta
+from infrastructure.run_history import RunHistory, percentile
+
+HISTORY = "historial"
+SIZE = "tamaño"
+DEFAULT = "sin datos"
+
+
+class PlannedJob:
+    def __init__(self, tarea, estimate, source, deadline=None):
+        self.tarea = tarea
+        self.estimate = estimate # Segundos estimados
+        self.source = source # De dónde sale la estimación
+        self.deadline = deadline # datetime o None
+        self.worker = None
+        self.start = None # Segundos desde el inicio de la corrida
+        self.end = None
+
+    @property
+    def path(self):
+        return self.tarea["path"]
+
+
+class RefreshPlan:
+    def __init__(self, jobs, workers, started_at, blocked=()):
+        self.jobs = jobs # En orden de ejecución
+        self.workers = workers
+        self.started_at = started_at
+        self.blocked = list(blocked) # Jobs en un ciclo de dependencias: no se ejecutan
+
+    @property
+    def ordered_tasks(self):
+        """Tareas en orden de ejecución; las bloqueadas al final (la corrida las informa como error)."""
+        return [job.tarea for job in self.jobs + self.blocked]
+
+    @property
+    def makespan(self):
+        return max((job.end for job in self.jobs), default=0.0)
+
+    @property
+    def predicted_finish(self):
+        return self.started_at + timedelta(seconds=self.makespan)
+
+    def late_jobs(self):
+        """Jobs con hora límite que, según la estimación, terminarían tarde."""
+        return [
+            job for job in self.jobs
+            if job.deadline and self.started_at + timedelta(seconds=job.end) > job.deadline
+        ]
+
+    def format(self):
+        lines = [f"Plan para {len(self.jobs)} archivos con {self.workers} Excel en paralelo:", ""]
+        for job in self.jobs:
+            start = self.started_at + timedelta(seconds=job.start)
+            end = self.started_at + timedelta(seconds=job.end)
+            limit = f"  (límite {job.deadline:%H:%M})" if job.deadline else ""
+            lines.append(
+                f"  Excel {job.worker}  {start:%H:%M:%S} -> {end:%H:%M:%S}  ~{round(job.estimate)}s "
+                f"[{job.source}]  {job.path}{limit}"
+            )
+        for job in self.blocked:
+            lines.append(f"  ✖ {job.path}: dependencia circular, no se actualizaría")
+        lines.append("")
+        lines.append(f"Fin estimado: {self.predicted_finish:%Y-%m-%d %H:%M:%S} ({round(self.makespan)}s)")
+        for job in self.late_jobs():
+            lines.append(f"⚠ {job.path} terminaría después de su límite ({job.deadline:%H:%M}).")
+        return "\n".join(lines)
+
+
+class RefreshPlanner:
+    """
+    Ordena los jobs de una corrida para terminar antes:
+    - Primero los que tienen "hora_limite" (el más urgente primero).
+    - Luego el resto, del más largo al más corto (LPT): con la cola compartida,
+      cada Excel que se libera toma el siguiente, que es el reparto LPT.
+    - Con un RefreshGraph, la duración de un libro incluye la cadena de libros
+      que esperan por él (camino crítico).
+
+    La duración sale del historial (p50 de las últimas corridas); si un libro
+    nunca se corrió, se estima por su tamaño con los segundos por MB que
+    muestran los demás libros (o PLANNER_SECONDS_PER_MB).
+    """
+
+    def __init__(self, history=None, seconds_per_mb=2.0, default_seconds=60.0, clock=datetime.now, logger=None):
+        self.history = history
+        self.logger = logger
+        self.seconds_per_mb = seconds_per_mb
+        self.default_seconds = default_seconds
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, config, history=None, logger=None):
+        if history is None:
+            history = RunHistory.from_config(config)
+        return cls(
+            history,
+            seconds_per_mb=float(config.get("PLANNER_SECONDS_PER_MB", 2.0)),
+            default_seconds=float(config.get("PLANNER_DEFAULT_SECONDS", 60)),
+            logger=logger,
+        )
+
+    def plan(self, tareas, workers=1, graph=None):
+        now = self.clock()
+        jobs = self._estimate(tareas, now)
+        upstream, blocked = graph.for_run(tareas) if graph else ({}, set())
+        downstream = {}
+        for i, ups in upstream.items():
+            for u in ups:
+                downstream.setdefault(u, []).append(i)
+
+        # Con dependencias, un libro "dura" lo que tarda él más la cadena que espera por él,
+        # y hereda la hora límite más urgente de los que dependen de él
+        rank, deadline = {}, {}
+
+        def visit(i):
+            if i not in rank:
+                rank[i], deadline[i] = jobs[i].estimate, jobs[i].deadline
+                for child in downstream.get(i, ()):
+                    if child in blocked:
+                        continue
+                    visit(child)
+                    rank[i] = max(rank[i], jobs[i].estimate + rank[child])
+                    if deadline[child] and (not deadline[i] or deadline[child] < deadline[i]):
+                        deadline[i] = deadline[child]
+
+        for i in range(len(jobs)):
+            if i not in blocked:
+                visit(i)
+
+        # Con límite: el más urgente primero. Sin límite: el más largo primero.
+        # Un libro siempre queda antes que los que dependen de él.
+        runnable = [i for i in range(len(jobs)) if i not in blocked]
+        with_deadline = sorted((i for i in runnable if deadline[i]), key=lambda i: (deadline[i], -rank[i]))
+        without = sorted((i for i in runnable if not deadline[i]), key=lambda i: -rank[i])
+        order = with_deadline + without
+        self._simulate(jobs, order, upstream, max(1, workers))
+        return RefreshPlan([jobs[i] for i in order], max(1, workers), now, [jobs[i] for i in sorted(blocked)])
+
+    @staticmethod
+    def _simulate(jobs, order, upstream, workers):
+        """Cada Excel que se libera toma el primer job del orden cuyas dependencias ya terminaron."""
+        free_at = [(0.0, n + 1) for n in range(workers)]
+        heapq.heapify(free_at)
+        pending = list(order)
+        while pending:
+            now, worker = heapq.heappop(free_at)
+
+            def ready_at(i):
+                return max((jobs[u].end for u in upstream.get(i, ())), default=0.0)
+
+            # Solo los que tienen sus dependencias ya planificadas
+            candidates = [i for i in pending if all(jobs[u].end is not None for u in upstream.get(i, ()))]
+            ready = [i for i in candidates if ready_at(i) <= now]
+            chosen = ready[0] if ready else min(candidates, key=ready_at)
+            pending.remove(chosen)
+            job = jobs[chosen]
+            job.worker, job.start = worker, max(now, ready_at(chosen))
+            job.end = job.start + job.estimate
+            heapq.heappush(free_at, (job.end, worker))
+
+    def _estimate(self, tareas, now):
+        sizes = {t["path"]: _size_mb(t["path"]) for t in tareas}
+        known = {}
+        if self.history is not None:
+            for t in tareas:
+                p50 = percentile(self.history.durations(t["path"], limit=20), 50)
+                if p50 is not None:
+                    known[t["path"]] = p50
+
+        # Segundos por MB según los libros con historial (mejor que un número fijo)
+        ratios = [known[p] / sizes[p] for p in known if sizes.get(p)]
+        seconds_per_mb = percentile(ratios, 50) or self.seconds_per_mb
+
+        jobs = []
+        for t in tareas:
+            path = t["path"]
+            if path in known:
+                estimate, source = known[path], HISTORY
+            elif sizes.get(path):
+                estimate, source = sizes[path] * seconds_per_mb, SIZE
+            else:
+                estimate, source = self.default_seconds, DEFAULT
+            try:
+                deadline = _deadline(t, now)
+            except ValueError as e:
+                if self.logger:
+                    self.logger.warning(f"Se ignora la hora límite de {path}: {e}")
+                deadline = None
+            jobs.append(PlannedJob(t, estimate, source, deadline))
+        return jobs
+
+
+def _size_mb(path):
+    try:
+        return os.path.getsize(path) / (1024 * 1024)
+    except OSError:
+        return None
+
+
+def _deadline(tarea, now):
+    """
+    "hora_limite": "HH:MM" -> hoy a esa hora (o mañana si ya pasó hace rato).
+    Lanza ValueError si el valor no es una hora válida.
+    """
+    value = tarea.get("hora_limite")
+    if not value:
+        return None
+    try:
+        h, m = map(int, str(value).split(":"))
+    except ValueError:
+        raise ValueError(f"hora_limite inválida: {value}. Formato esperado HH:MM")
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"hora_limite fuera de rango: {value}")
+    deadline = now.replace(hour=h, minute=m, second=0, microsecond=0)
+    if deadline < now - timedelta(hours=12):
+        deadline += timedelta(days=1)
+    return deadline
@@ -0,0 +1,143 @@
+# application/refresh_queue.py
+
+import os
+import time
+import heapq
+import threading
+
+
+class RefreshJobQueue:
+    """
+    Cola de trabajos de una corrida con espera por bloqueo:
+    - get() entrega el siguiente trabajo listo (o None cuando no queda nada).
+    - park() aparca un archivo bloqueado por un usuario; la corrida sigue con los demás.
+    - Un archivo aparcado vuelve a estar listo cuando cambia su carpeta
+      (notify_changed) o cuando vence su espera exponencial.
+    - Con `upstream` ({idx: {idx}}) un trabajo espera a que terminen bien los
+      trabajos de los que depende; si alguno falla, se omite (task_done lo devuelve).
+    - Entre los listos sale primero el de menor índice (el orden del plan).
+    """
+
+    def __init__(self, items, logger, base_delay=5, max_delay=60, max_wait=300, upstream=None, clock=time.monotonic):
+        self.logger = logger
+        self.clock = clock
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._items = list(items)
+        self._waiting = {idx: set(ups) for idx, ups in (upstream or {}).items() if ups}
+        self._downstream = {}
+        for idx, ups in self._waiting.items():
+            for up in ups:
+                self._downstream.setdefault(up, []).append(idx)
+        self._ready = [(idx, tarea) for idx, tarea in enumerate(self._items) if idx not in self._waiting]
+        heapq.heapify(self._ready)
+        self._parked = {} # idx -> (tarea, next_retry)
+        self._waits = {} # idx -> {"since", "attempts"}: espera acumulada de cada archivo
+        self._in_progress = 0
+        self._cond = threading.Condition()
+
+    # --------------------------
+    # Tomar el siguiente trabajo
+    # --------------------------
+    def get(self):
+        with self._cond:
+            while True:
+                self._wake_due()
+                if self._ready:
+                    self._in_progress += 1
+                    return heapq.heappop(self._ready)
+                if not self._parked and self._in_progress == 0:
+                    return None # Lo que siga esperando depende de algo que nunca terminó
+                timeout = None
+                if self._parked:
+                    next_retry = min(next_retry for _, next_retry in self._parked.values())
+                    timeout = max(0.0, next_retry - self.clock())
+                self._cond.wait(timeout)
+
+    def task_done(self, idx=None, ok=True):
+        """
+        Marca el trabajo como terminado. Con `idx`, libera a los que dependen de
+        él; si falló (ok=False) devuelve los que quedan omitidos: [(idx, tarea, idx_del_que_falló)].
+        """
+        with self._cond:
+            self._in_progress -= 1
+            skipped = self._resolve(idx, ok) if idx is not None else []
+            self._cond.notify_all()
+        return skipped
+
+    def discard(self, idx):
+        """Quita un trabajo que no se va a ejecutar (p. ej. en un ciclo) y devuelve los omitidos por él."""
+        with self._cond:
+            self._waiting.pop(idx, None)
+            skipped = self._resolve(idx, ok=False)
+            self._cond.notify_all()
+        return skipped
+
+    def _resolve(self, idx, ok):
+        skipped = []
+        failed = [idx]
+        for child in self._downstream.get(idx, ()):
+            if child not in self._waiting:
+                continue
+            if ok:
+                self._waiting[child].discard(idx)
+                if not self._waiting[child]:
+                    del self._waiting[child]
+                    heapq.heappush(self._ready, (child, self._items[child]))
+        if ok:
+            return skipped
+        # Falló: se omiten sus dependientes y, en cascada, los de ellos
+        while failed:
+            current = failed.pop()
+            for child in self._downstream.get(current, ()):
+                if child in self._waiting:
+                    del self._waiting[child]
+                    skipped.append((child, self._items[child], current))
+                    failed.append(child)
+        return skipped
+
+    # --------------------------
+    # Aparcar un archivo bloqueado
+    # --------------------------
+    def park(self, idx, tarea):
+        """
+        Devuelve False si el archivo ya superó el tiempo máximo de espera: el
+        llamador debe darlo por fallido y luego llamar a task_done().
+        """
+        now = self.clock()
+        with self._cond:
+            wait = self._waits.setdefault(idx, {"since": now, "attempts": 0})
+            waited = now - wait["since"]
+            if waited >= self.max_wait:
+                return False
+            self._in_progress -= 1
+            self._cond.notify_all()
+            wait["attempts"] += 1
+            delay = min(self.base_delay * (2 ** (wait["attempts"] - 1)), self.max_delay, self.max_wait - waited)
+            self._parked[idx] = (tarea, now + delay)
+
+        self.logger.warning(
+            f"{tarea['path']} está abierto por otra persona. Lo dejamos en espera "
+            f"(reintento en {round(delay)}s) y seguimos con los demás archivos."
+        )
+        return True
+
+    def parked_directories(self):
+        with self._cond:
+            return {os.path.dirname(os.path.abspath(tarea["path"])) for tarea, _ in self._parked.values()}
+
+    def notify_changed(self, directory):
+        """Algo cambió en `directory`: los archivos aparcados ahí se reintentan ya."""
+        with self._cond:
+            now = self.clock()
+            for idx, (tarea, next_retry) in list(self._parked.items()):
+                if os.path.dirname(os.path.abspath(tarea["path"])) == directory:
+                    self._parked[idx] = (tarea, now)
+            self._cond.notify_all()
+
+    def _wake_due(self):
+        now = self.clock()
+        for idx in [i for i, (_, next_retry) in self._parked.items() if next_retry <= now]:
+            tarea, _ = self._parked.pop(idx)
+            heapq.heappush(self._ready, (idx, tarea))
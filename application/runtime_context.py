@@ -0,0 +1,88 @@
+# application/runtime_context.py
+
+import os
+import threading
+import pytz
+from application.scheduler_uc import SchedulerUseCase
+from infrastructure.config_loader import ConfigLoader
+from infrastructure.logger_service import LoggerService
+from infrastructure.email_notifier import EmailNotifier
+from infrastructure.fingerprint_cache import FingerprintCache
+from infrastructure.retry_policy import get_circuit_breaker
+
+
+class RuntimeContext:
+    """
+    Servicios de larga vida del proceso: configuración, logger, notificador,
+    jobs de excels.json, caché de huellas y circuit breaker.
+
+    Se crean una vez y refresh() solo vuelve a leer lo que cambió en disco
+    (.env, excels.json, fingerprints.json), en lugar de reconstruir todo en
+    cada corrida programada.
+    """
+
+    def __init__(self, env_path=".env", schedule_file=None):
+        self._lock = threading.RLock()
+        self.config = ConfigLoader(env_path)
+        self.logger = LoggerService(
+            log_level=self.config.get("LOG_LEVEL", "INFO"),
+            log_dir=self.config.get("LOG_DIR", "logs"),
+            log_name=self.config.get("LOG_FILE", "pivoty.log"),
+        ).get_logger()
+        self.scheduler_uc = SchedulerUseCase(schedule_file)
+        self._jobs_mtime = self._mtime(self.scheduler_uc.schedule_file)
+        self._build_services()
+
+    def _build_services(self):
+        """Lo que depende del .env: se rehace cuando el .env cambia."""
+        self.logger.setLevel(self.config.get("LOG_LEVEL", "INFO").upper())
+        self.tz = pytz.timezone(self.config.get("TIMEZONE", "UTC"))
+        self.notifier = EmailNotifier(self.logger, self.config)
+        fingerprint_path = self.config.get("FINGERPRINT_CACHE_FILE")
+        if getattr(self, "_fingerprint_path", False) != fingerprint_path:
+            self._fingerprint_path = fingerprint_path
+            self.fingerprints = FingerprintCache(self.logger, fingerprint_path)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    @property
+    def breaker(self):
+        return get_circuit_breaker(self.config)
+
+    # --------------------------
+    # Recargar solo lo que cambió
+    # --------------------------
+    def refresh(self):
+        with self._lock:
+            if self.config.reload_if_changed():
+                self.logger.info("Se detectaron cambios en la configuración (.env), recargando servicios.")
+                self._build_services()
+            self.fingerprints.reload_if_changed()
+
+            mtime = self._mtime(self.scheduler_uc.schedule_file)
+            if mtime != self._jobs_mtime:
+                self._jobs_mtime = mtime
+                self.scheduler_uc.jobs = self.scheduler_uc._load_jobs()
+        return self
+
+    def jobs(self):
+        with self._lock:
+            return list(self.scheduler_uc.jobs)
+
+
+# Un contexto por proceso (GUI, scheduler o cada proceso trabajador)
+DEFAULT_CONTEXT = None
+_CONTEXT_LOCK = threading.Lock()
+
+
+def get_runtime_context():
+    global DEFAULT_CONTEXT
+    with _CONTEXT_LOCK:
+        if DEFAULT_CONTEXT is None:
+            DEFAULT_CONTEXT = RuntimeContext()
+        return DEFAULT_CONTEXT
@@ -0,0 +1,52 @@
+# benchmarks/bench_excel_pool.py
+"""
+Compara abrir Excel por archivo contra reutilizar instancias del pool,
+usando el backend falso (funciona en Linux).
+
+    python -m benchmarks.bench_excel_pool --files 30 --startup 0.05
+"""
+
+import argparse
+import json
+import logging
+import time
+
+from infrastructure.excel_backend import FakeExcelBackend
+from infrastructure.excel_pool import ExcelPool
+
+
+def _run(files, startup_seconds, max_idle, max_uses):
+    logger = logging.getLogger("bench")
+    backend = FakeExcelBackend(startup_seconds=startup_seconds)
+    pool = ExcelPool(backend, logger, max_idle=max_idle, max_uses=max_uses)
+    t0 = time.perf_counter()
+    for _ in range(files):
+        with pool.lease() as app:
+            app.Workbooks.append("libro.xlsx")
+    pool.shutdown()
+    return {
+        "seconds": round(time.perf_counter() - t0, 4),
+        "created": backend.created,
+        "quit": backend.quit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--startup", type=float, default=0.05, help="Segundos de arranque simulados")
+    parser.add_argument("--max-uses", type=int, default=10)
+    args = parser.parse_args()
+
+    cold = _run(args.files, args.startup, max_idle=0, max_uses=args.max_uses)
+    warm = _run(args.files, args.startup, max_idle=1, max_uses=args.max_uses)
+    print(json.dumps({
+        "files": args.files,
+        "sin_pool": cold,
+        "con_pool": warm,
+        "ahorro_segundos": round(cold["seconds"] - warm["seconds"], 4),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
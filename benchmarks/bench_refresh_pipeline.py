@@ -0,0 +1,311 @@
+# benchmarks/bench_refresh_pipeline.py
+"""
+Mide el pipeline completo (execute_refresh -> RefreshJob.execute ->
+ExcelGateway.refresh_file -> reporte y EmailNotifier) con el Excel simulado
+de infrastructure/fake_excel_com.py. Funciona en Linux, sin Excel ni Outlook.
+
+    python -m benchmarks.bench_refresh_pipeline --jobs 1 50 500 --paralelo 4 --output benchmarks/baseline.json
+    python -m benchmarks.bench_refresh_pipeline --compare benchmarks/baseline.json
+
+Para cada tamaño de corrida mide:
+- segundos y archivos por segundo con el perfil de latencias elegido,
+- sobrecarga: tiempo que no es "Excel trabajando" (corrida con latencia cero),
+- memoria pico (tracemalloc) y RSS máximo del proceso,
+- costo de armar el reporte del correo.
+El resultado es un JSON comparable entre versiones (--compare).
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from infrastructure.excel_backend import set_backend_factory
+from infrastructure.fake_excel_com import FakeComExcelBackend, FakeExcelProfile
+
+PROFILES = {
+    # Sin latencias: todo lo que se mide es el costo propio de Pivoty
+    "sin_latencia": {"latencias": {}},
+    # Formas de un libro con Power Query, en centésimas de los tiempos reales
+    "rapido": {
+        "escala": 0.01,
+        "latencias": {
+            "arranque": 3.0,
+            "abrir": {"dist": "lognormal", "media": 1.5, "sigma": 0.4},
+            "conexion": {"dist": "uniforme", "min": 0.5, "max": 4.0},
+            "calculo": {"dist": "normal", "media": 2.0, "desvio": 0.5},
+            "guardar": 0.8,
+            "cerrar": 0.1,
+        },
+        "conexiones": 3,
+    },
+    # Igual que "rapido" pero con fallos transitorios y algunos permanentes
+    "inestable": {
+        "escala": 0.01,
+        "latencias": {
+            "arranque": 3.0,
+            "abrir": {"dist": "lognormal", "media": 1.5, "sigma": 0.4},
+            "conexion": {"dist": "uniforme", "min": 0.5, "max": 4.0},
+            "calculo": {"dist": "normal", "media": 2.0, "desvio": 0.5},
+            "guardar": 0.8,
+            "cerrar": 0.1,
+        },
+        "conexiones": 3,
+        "fallos": {"abrir": 0.02, "refresh": 0.03, "guardar": 0.01},
+        "proporcion_permanentes": 0.2,
+    },
+}
+
+# Métricas donde más es mejor (el resto: menos es mejor)
+HIGHER_IS_BETTER = {"archivos_por_segundo"}
+
+ENV = {
+    "LOG_DIR": "logs",
+    "TIMEZONE": "UTC",
+    "MAIL_ENABLED": "false",
+    "EXCEL_SUPERVISOR_ENABLED": "false", # Los PID del Excel simulado no son procesos reales
+    "SCREENSHOT_ON_ERROR": "false",
+    "REFRESH_EVENTS_ENABLED": "false",
+    "REFRESH_IN_SUBPROCESS": "false",
+    "RETRY_INTERVAL_SECONDS": "0",
+    "RETRY_JITTER": "false",
+    "CIRCUIT_BREAKER_FAILURES": "0",
+    "FINGERPRINT_CACHE_FILE": os.path.join("config", "fingerprints.json"),
+    "RUN_HISTORY_DB": os.path.join("config", "run_history.db"),
+}
+
+
+# --------------------------
+# Preparar libros y configuración
+# --------------------------
+def _write_workbook(path, rows):
+    """Un .xlsx mínimo pero válido (una hoja con `rows` filas) para que la validación lo lea de verdad."""
+    sheet_rows = "".join(
+        f'<row r="{r}"><c r="A{r}" t="inlineStr"><is><t>fila {r}</t></is></c><c r="B{r}"><v>{r}</v></c></row>'
+        for r in range(1, rows + 1)
+    )
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+            ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Datos" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>'
+        ),
+        "xl/worksheets/sheet1.xml": (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<sheetData>{sheet_rows}</sheetData></worksheet>'
+        ),
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in parts.items():
+            zf.writestr(name, content)
+
+
+def _prepare(root, jobs, rows):
+    folder = os.path.join(root, f"libros_{jobs}")
+    os.makedirs(folder, exist_ok=True)
+    excels = []
+    for n in range(jobs):
+        path = os.path.join(folder, f"reporte_{n + 1:04d}.xlsx")
+        _write_workbook(path, rows)
+        excels.append({"path": path, "horario": "06:00", "activo": True})
+    schedule_file = os.path.join(root, f"excels_{jobs}.json")
+    with open(schedule_file, "w", encoding="utf-8") as f:
+        json.dump({"excels": excels}, f, indent=4)
+    return schedule_file
+
+
+def _write_env(root, parallel, log_level):
+    env = dict(ENV, REFRESH_MAX_PARALLEL=str(parallel), LOG_LEVEL=log_level)
+    with open(os.path.join(root, ".env"), "w", encoding="utf-8") as f:
+        for key, value in env.items():
+            f.write(f"{key}={value}\n")
+
+
+# --------------------------
+# Mediciones
+# --------------------------
+def _run_once(schedule_file, profile, seed, trace_memory=False):
+    from application.execute_refresh_uc import execute_refresh
+    from application.runtime_context import RuntimeContext
+
+    backend = FakeComExcelBackend(FakeExcelProfile.from_dict(profile), seed=seed)
+    previous = set_backend_factory(lambda: backend)
+    try:
+        context = RuntimeContext(env_path=".env", schedule_file=schedule_file)
+        if trace_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        resultados = execute_refresh(context=context)
+        seconds = time.perf_counter() - t0
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        set_backend_factory(previous)
+    return resultados, seconds, backend.stats, peak
+
+
+def _report_cost(resultados):
+    from application.execute_refresh_uc import build_report
+    repeats = max(1, 2000 // max(1, len(resultados)))
+    inicio = datetime.now()
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        build_report(resultados, inicio, inicio)
+    return (time.perf_counter() - t0) / repeats
+
+
+def _rss_max_mb():
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    # Linux lo da en KB, macOS en bytes
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _measure(root, jobs, profile, parallel, seed, rows):
+    schedule_file = _prepare(root, jobs, rows)
+
+    # 1) Sin latencias: el tiempo es todo sobrecarga de Pivoty (cola, plan, validación, historial, reporte)
+    _, overhead_seconds, _, _ = _run_once(schedule_file, PROFILES["sin_latencia"], seed)
+    # 2) Memoria, también sin latencias (tracemalloc enlentece y distorsionaría los tiempos)
+    _, _, _, peak = _run_once(schedule_file, PROFILES["sin_latencia"], seed, trace_memory=True)
+    # 3) Con el perfil elegido
+    resultados, seconds, stats, _ = _run_once(schedule_file, profile, seed)
+
+    estados = {}
+    for r in resultados:
+        estados[r["estado"]] = estados.get(r["estado"], 0) + 1
+    busy = stats["segundos_simulados"]
+    return {
+        "segundos": round(seconds, 4),
+        "archivos_por_segundo": round(jobs / seconds, 3) if seconds else None,
+        "segundos_excel_simulado": round(busy, 4),
+        # Cota inferior: el trabajo de Excel repartido perfecto entre los Excel en paralelo
+        "segundos_sobre_ideal": round(max(0.0, seconds - busy / min(parallel, jobs)), 4),
+        "sobrecarga_ms_por_archivo": round(overhead_seconds / jobs * 1000, 3),
+        "memoria_pico_mb": round(peak / (1024 * 1024), 2),
+        "reporte_ms": round(_report_cost(resultados) * 1000, 3),
+        "estados": estados,
+        "excel": {k: v for k, v in stats.items() if k != "segundos_simulados"},
+    }
+
+
+# --------------------------
+# Comparar con una línea base
+# --------------------------
+def compare(baseline, current, tolerance):
+    """Imprime las diferencias y devuelve la cantidad de métricas que empeoraron más que `tolerance` (%)."""
+    regressions = 0
+    for size, metrics in current["corridas"].items():
+        before = baseline.get("corridas", {}).get(size)
+        if not before:
+            continue
+        print(f"\n{size} archivos:")
+        for name, value in metrics.items():
+            old = before.get(name)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old * 100
+            worse = -change if name in HIGHER_IS_BETTER else change
+            mark = ""
+            if worse > tolerance:
+                mark = "  <-- peor"
+                regressions += 1
+            print(f"  {name:<28} {old:>12} -> {value:<12} ({change:+.1f}%){mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--paralelo", type=int, default=4, help="REFRESH_MAX_PARALLEL")
+    parser.add_argument("--perfil", default="rapido", help=f"{', '.join(PROFILES)} o ruta a un JSON")
+    parser.add_argument("--semilla", type=int, default=1234)
+    parser.add_argument("--filas", type=int, default=200, help="Filas de cada libro de prueba")
+    parser.add_argument("--log-level", default="CRITICAL")
+    parser.add_argument("--output", help="Guardar el resultado en este JSON")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=10.0, help="%% de empeoramiento que se acepta al comparar")
+    args = parser.parse_args()
+
+    if args.perfil in PROFILES:
+        profile = PROFILES[args.perfil]
+    else:
+        with open(args.perfil, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    root = tempfile.mkdtemp(prefix="pivoty_bench_")
+    cwd = os.getcwd()
+    try:
+        # Las rutas relativas del .env (logs, config/) quedan dentro de la carpeta temporal
+        os.chdir(root)
+        _write_env(root, args.paralelo, args.log_level)
+        result = {
+            "meta": {
+                "fecha": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "perfil": args.perfil,
+                "paralelo": args.paralelo,
+                "semilla": args.semilla,
+                "filas": args.filas,
+            },
+            "corridas": {},
+        }
+        for jobs in args.jobs:
+            result["corridas"][str(jobs)] = _measure(root, jobs, profile, args.paralelo, args.semilla, args.filas)
+        result["meta"]["rss_max_mb"] = _rss_max_mb()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), result, args.tolerancia)
+        if regressions:
+            print(f"\n{regressions} métricas empeoraron más de {args.tolerancia}%.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
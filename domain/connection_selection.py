@@ -0,0 +1,65 @@
+# domain/connection_selection.py
+
+from fnmatch import fnmatchcase
+
+# Tipos de WorkbookConnection que traen datos de fuera (OLEDB, ODBC, texto, web, data feed)
+QUERY_CONNECTION_TYPES = (1, 2, 4, 5, 6)
+
+
+class ConnectionSelection:
+    """
+    Qué conexiones refrescar de un libro, según la clave "conexiones" del job:
+
+        "conexiones": {
+            "incluir": ["Ventas*", "Clientes"],
+            "excluir": ["Histórico"],
+            "queries_primero": true,
+            "pivots": true
+        }
+
+    Los nombres no distinguen mayúsculas y aceptan comodines (* ?).
+    Sin "incluir", "excluir" ni "queries_primero" se usa RefreshAll().
+    """
+
+    def __init__(self, incluir=None, excluir=None, queries_primero=False, pivots=True):
+        self.incluir = [n.lower() for n in (incluir or [])]
+        self.excluir = [n.lower() for n in (excluir or [])]
+        self.queries_primero = queries_primero
+        self.pivots = pivots
+
+    @classmethod
+    def from_job(cls, job):
+        data = (job or {}).get("conexiones") or {}
+        return cls(
+            incluir=data.get("incluir"),
+            excluir=data.get("excluir"),
+            queries_primero=bool(data.get("queries_primero", False)),
+            pivots=bool(data.get("pivots", True)),
+        )
+
+    @property
+    def refresh_all(self):
+        return not (self.incluir or self.excluir or self.queries_primero)
+
+    def _matches(self, name, patterns):
+        name = name.lower()
+        return any(fnmatchcase(name, p) for p in patterns)
+
+    def select(self, connections):
+        """
+        Recibe [(nombre, tipo), ...] en el orden del libro y devuelve los nombres
+        a refrescar, en el orden en que deben ejecutarse.
+        """
+        selected = [
+            (name, conn_type) for name, conn_type in connections
+            if (not self.incluir or self._matches(name, self.incluir))
+            and not self._matches(name, self.excluir)
+        ]
+        if self.queries_primero:
+            # sorted() es estable: dentro de cada grupo se respeta el orden del libro
+            selected = sorted(selected, key=lambda c: 0 if c[1] in QUERY_CONNECTION_TYPES else 1)
+        return [name for name, _ in selected]
+
+    def unmatched_includes(self, names):
+        """Patrones de "incluir" que no coinciden con ninguna conexión del libro."""
+        return [p for p in self.incluir if not any(fnmatchcase(n.lower(), p) for n in names)]
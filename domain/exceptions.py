@@ -9,8 +9,20 @@ class ConfigError(Exception):
 class ExcelGatewayError(Exception):
     pass
 
+class FileLockedError(ExcelGatewayError):
+    pass
+
 class EmailNotificationError(Exception):
     pass
 
 class EmailConfigError(Exception):
     pass
+
+class WorkerProcessError(Exception):
+    pass
+
+class RefreshCancelledError(ExcelGatewayError):
+    pass
+
+class ControlChannelError(Exception):
+    pass
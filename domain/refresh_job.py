@@ -8,14 +8,27 @@ class RefreshJob:
     Representa la operación principal: refrescar un archivo Excel.
     """
 
-    def __init__(self, excel_path: str):
+    def __init__(self, excel_path: str, selection=None, retry_policy=None, validation=None, staging=None, cancel_token=None):
         self.excel_path = excel_path
+        self.selection = selection
+        self.retry_policy = retry_policy
+        self.validation = validation
+        self.staging = staging
+        self.cancel_token = cancel_token
 
     def validate_path(self):
         if not os.path.exists(self.excel_path):
             raise RefreshJobError(f"El archivo no existe: {self.excel_path}")
 
-    def execute(self, excel_gateway):
-        self.validate_path()
-        result = excel_gateway.refresh_file(self.excel_path)
+    def execute(self, excel_gateway, timer=None):
+        if timer is not None:
+            with timer.phase("validar_ruta"):
+                self.validate_path()
+        else:
+            self.validate_path()
+        result = excel_gateway.refresh_file(
+            self.excel_path, selection=self.selection, retry_policy=self.retry_policy,
+            timer=timer, validation=self.validation, staging=self.staging,
+            cancel_token=self.cancel_token
+        )
         return result
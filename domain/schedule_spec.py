@@ -0,0 +1,163 @@
+# domain/schedule_spec.py
+
+import re
+from datetime import datetime, timedelta
+
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+MONTH_NAMES = {name: n + 1 for n, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+)}
+DAY_NAMES = {name: n for n, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])}
+MACROS = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+# Cuántos días hacia adelante se busca el próximo disparo (cubre un 29 de febrero)
+SEARCH_DAYS = 366 * 8
+
+
+class CronExpression:
+    """
+    Expresión cron de 5 campos: minuto hora día_del_mes mes día_de_la_semana.
+    Acepta *, listas (1,15), rangos (1-5), pasos (*/10, 8-18/2), nombres
+    (mon, jan) y @hourly/@daily/@weekly/@monthly. Domingo es 0 o 7.
+    Como en cron, si se restringen día del mes y día de la semana, basta con que coincida uno.
+    """
+
+    def __init__(self, expression, label=None):
+        self.expression = expression.strip()
+        self.label = label
+        text = MACROS.get(self.expression.lower(), self.expression)
+        fields = text.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expression}")
+        self.minutes = _parse_field(fields[0], 0, 59, {}, expression)
+        self.hours = _parse_field(fields[1], 0, 23, {}, expression)
+        self.days = _parse_field(fields[2], 1, 31, {}, expression)
+        self.months = _parse_field(fields[3], 1, 12, MONTH_NAMES, expression)
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7, DAY_NAMES, expression)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+        self._sorted_hours = sorted(self.hours)
+        self._sorted_minutes = sorted(self.minutes)
+
+    @classmethod
+    def daily_at(cls, hour, minute):
+        return cls(f"{minute} {hour} * * *", label=f"{hour:02d}:{minute:02d}")
+
+    def __str__(self):
+        return self.label or self.expression
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays # Python: lunes=0; cron: domingo=0
+        if self._any_day and self._any_weekday:
+            return True
+        if self._any_day:
+            return dow
+        if self._any_weekday:
+            return dom
+        return dom or dow
+
+    def next_after(self, moment):
+        """Primer minuto que coincide estrictamente después de `moment` (datetime sin zona)."""
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.replace(hour=0, minute=0)
+        for _ in range(SEARCH_DAYS):
+            if self._day_matches(day):
+                for hour in self._sorted_hours:
+                    for minute in self._sorted_minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        return None
+
+
+def _parse_field(text, low, high, names, expression):
+    values = set()
+    for part in text.lower().split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = _parse_value(step_text, {}, expression)
+            if step <= 0:
+                raise ValueError(f"Paso inválido en la expresión cron: {expression}")
+        if part == "*":
+            first, last = low, high
+        elif "-" in part:
+            a, b = part.split("-", 1)
+            first, last = _parse_value(a, names, expression), _parse_value(b, names, expression)
+        else:
+            first = _parse_value(part, names, expression)
+            last = high if step > 1 else first
+        if first < low or last > high or first > last:
+            raise ValueError(f"Valor fuera de rango ({low}-{high}) en la expresión cron: {expression}")
+        values.update(range(first, last + 1, step))
+    return values
+
+
+def _parse_value(text, names, expression):
+    if text in names:
+        return names[text]
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Valor inválido '{text}' en la expresión cron: {expression}")
+
+
+def parse_trigger(value):
+    """ "HH:MM" (todos los días) o una expresión cron."""
+    match = TIME_PATTERN.match(str(value))
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            raise ValueError(f"Horario inválido: {value}. Formato esperado HH:MM")
+        return CronExpression.daily_at(hour, minute)
+    return CronExpression(str(value))
+
+
+class JobSchedule:
+    """
+    Cuándo se dispara un job de excels.json. Se combinan:
+        "horario": "07:00"                          (como siempre)
+        "horarios": ["07:00", "13:30"]              (varias horas al día)
+        "cron": "0 8-18/2 * * mon-fri"              (o una lista de expresiones)
+    En "horarios" también se aceptan expresiones cron.
+    """
+
+    def __init__(self, triggers):
+        self.triggers = list(triggers)
+
+    @classmethod
+    def from_job(cls, job):
+        values = []
+        if str(job.get("horario") or "").strip(" :"): # La GUI deja ":" si el campo quedó vacío
+            values.append(job["horario"])
+        for key in ("horarios", "cron"):
+            value = job.get(key)
+            if value:
+                values.extend([value] if isinstance(value, str) else value)
+        if not values:
+            raise ValueError("El job no tiene horario")
+        return cls(parse_trigger(v) for v in values)
+
+    @property
+    def key(self):
+        """Texto que identifica el calendario (jobs con el mismo calendario se disparan juntos)."""
+        return " | ".join(sorted({str(t) for t in self.triggers}))
+
+    def __str__(self):
+        return ", ".join(str(t) for t in self.triggers)
+
+    def next_after(self, moment=None):
+        moment = moment or datetime.now()
+        candidates = [c for c in (t.next_after(moment) for t in self.triggers) if c is not None]
+        return min(candidates) if candidates else None
@@ -0,0 +1,74 @@
+# domain/validation_rules.py
+
+from fnmatch import fnmatchcase
+
+
+class ValidationRules:
+    """
+    Reglas para validar un libro después del refresh, según el job:
+
+        "filas_minimas": 100                           -> cada tabla (o el libro si no hay tablas)
+        "filas_minimas": {"TablaVentas": 100, "Hoja1": 10}  -> por tabla u hoja (acepta comodines)
+        "max_celdas_error": 0                          -> tope de celdas #REF!, #N/A, etc.
+
+    Los mínimos por tabla solo se exigen si el job pone "filas_minimas": las
+    tablas vacías a propósito (parámetros, búsquedas, solo encabezado) son comunes.
+    Si el job no lo indica, MIN_ROWS_EXPECTED del .env (si está puesto) es el
+    mínimo de filas con datos del libro entero, y MAX_ERROR_CELLS el tope de errores.
+    """
+
+    def __init__(self, min_rows=None, max_error_cells=None, min_total_rows=None):
+        self.min_rows = min_rows
+        self.max_error_cells = max_error_cells
+        self.min_total_rows = min_total_rows
+
+    @classmethod
+    def from_job(cls, job, config):
+        job = job or {}
+        max_errors = job.get("max_celdas_error", config.get("MAX_ERROR_CELLS"))
+        min_total = config.get("MIN_ROWS_EXPECTED")
+        return cls(
+            min_rows=job.get("filas_minimas"),
+            max_error_cells=int(max_errors) if max_errors not in (None, "") else None,
+            min_total_rows=int(min_total) if min_total not in (None, "") and "filas_minimas" not in job else None,
+        )
+
+    def check(self, report):
+        """Devuelve la lista de problemas encontrados en el reporte del inspector."""
+        problems = []
+        tablas = report.get("tablas", {})
+        hojas = report.get("hojas", {})
+
+        if isinstance(self.min_rows, dict):
+            for pattern, minimum in self.min_rows.items():
+                found = [(n, t["filas"]) for n, t in tablas.items() if fnmatchcase(n.lower(), pattern.lower())]
+                found += [(n, h["filas"]) for n, h in hojas.items() if fnmatchcase(n.lower(), pattern.lower())]
+                if not found:
+                    problems.append(f"No se encontró la tabla u hoja '{pattern}'")
+                for name, rows in found:
+                    if rows < int(minimum):
+                        problems.append(f"'{name}' tiene {rows} filas (mínimo {minimum})")
+        elif self.min_rows:
+            if tablas:
+                for name, t in tablas.items():
+                    if t["filas"] < int(self.min_rows):
+                        problems.append(f"La tabla '{name}' tiene {t['filas']} filas (mínimo {self.min_rows})")
+            else:
+                total = sum(h["filas"] for h in hojas.values())
+                if total < int(self.min_rows):
+                    problems.append(f"El libro tiene {total} filas con datos (mínimo {self.min_rows})")
+        elif self.min_total_rows:
+            total = sum(h["filas"] for h in hojas.values())
+            if total < self.min_total_rows:
+                problems.append(f"El libro tiene {total} filas con datos (mínimo {self.min_total_rows})")
+
+        if self.max_error_cells is not None:
+            errors = {}
+            for h in hojas.values():
+                for value, count in h["errores"].items():
+                    errors[value] = errors.get(value, 0) + count
+            total_errors = sum(errors.values())
+            if total_errors > self.max_error_cells:
+                detail = ", ".join(f"{v}: {c}" for v, c in errors.items())
+                problems.append(f"Hay {total_errors} celdas con error ({detail}), máximo {self.max_error_cells}")
+        return problems
@@ -100,12 +100,16 @@ class ExcelManagerView(QWidget):
     # -------------------------
     def load_data(self):
         self.table.setRowCount(0)
+        self._jobs_by_path = {}
         if not os.path.exists(CONFIG_PATH):
             return
 
         with open(CONFIG_PATH, "r", encoding="utf-8") as f:
             excels = json.load(f).get("excels", [])
 
+        # Guardamos el job completo para no perder opciones avanzadas (p. ej. "conexiones") al guardar
+        self._jobs_by_path = {excel.get("path", ""): excel for excel in excels}
+
         for excel in excels:
             self.add_row(
                 excel.get("path", ""),
@@ -191,12 +195,15 @@ class ExcelManagerView(QWidget):
 
         for row in range(self.table.rowCount()):
             horario_widget = self.table.cellWidget(row, 2)
-            excels.append({
-                "path": self.table.item(row, 0).text(),
+            path = self.table.item(row, 0).text()
+            job = dict(self._jobs_by_path.get(path, {}))
+            job.update({
+                "path": path,
                 "backup": self.table.item(row, 1).text(),
                 "horario": horario_widget.text() if horario_widget else "",
                 "activo": self.table.cellWidget(row, 3).isChecked()
             })
+            excels.append(job)
 
         try:
             os.makedirs("config", exist_ok=True)
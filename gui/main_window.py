@@ -19,6 +19,8 @@ import os
 from gui.excel_manager_gui import ExcelManagerView
 from gui.mail_settings_view import MailSettingsView
 from infrastructure.scheduler_service import SchedulerService
+from infrastructure.control_channel import ControlClient, RemoteScheduler
+from infrastructure.config_loader import ConfigLoader
 from infrastructure.logger_service import LoggerService
 from application.execute_refresh_uc import execute_refresh
 from core.utils import resource_path
@@ -116,8 +118,17 @@ class MainWindow(FluentWindow):
             log_name=self.env.get("LOG_FILE", "pivoty.log")
         )
         self.logger = logger_service.get_logger()
-        
+
+        # Si ya corre un scheduler (--daemon u otra ventana), la GUI se une a ese en vez de iniciar otro
+        config = ConfigLoader()
+        client = ControlClient.from_config(config)
+        if config.get_bool("SCHEDULER_ATTACH", True) and client.is_available():
+            self.scheduler = RemoteScheduler(client, self.logger)
+            self.logger.info("La GUI se unió al scheduler que ya estaba corriendo.")
+            return
+
         self.scheduler = SchedulerService(
+            config=config,
             logger=self.logger,
             execute_fn=execute_refresh,
             status_callback=self.communicator.notify_signal.emit
@@ -0,0 +1,69 @@
+# infrastructure/cancel_token.py
+
+import threading
+from contextlib import contextmanager
+from domain.exceptions import RefreshCancelledError
+
+
+class CancelToken:
+    """
+    Permite cancelar un refresh desde otro hilo.
+
+    El gateway asocia (bind) una acción de corte, por ejemplo matar su Excel,
+    porque una llamada COM en curso no se puede interrumpir de otra forma.
+    Dentro de shield() (guardar, reemplazar el original) el corte se posterga
+    hasta salir, para no dejar un libro a medio escribir.
+    """
+
+    def __init__(self):
+        self.reason = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callback = None
+        self._shield = 0
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason=None):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callback = self._callback if self._shield == 0 else None
+        if callback:
+            callback()
+
+    def bind(self, callback):
+        with self._lock:
+            self._callback = callback
+            run_now = self._event.is_set() and self._shield == 0
+        if run_now:
+            callback()
+
+    def unbind(self):
+        with self._lock:
+            self._callback = None
+
+    @contextmanager
+    def shield(self):
+        with self._lock:
+            self._shield += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._shield -= 1
+                callback = self._callback if self._event.is_set() and self._shield == 0 else None
+            if callback:
+                callback()
+
+    def wait(self, timeout):
+        """Espera hasta `timeout` segundos; devuelve True si se canceló mientras tanto."""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RefreshCancelledError(f"Refresh cancelado: {self.reason or 'sin motivo'}")
@@ -9,8 +9,25 @@ class ConfigLoader:
     """
     def __init__(self, env_path=".env", logger=None):
         self.logger = logger
+        self.env_path = env_path
         load_dotenv(env_path)
         self.config = os.environ
+        self._mtime = self._env_mtime()
+
+    def _env_mtime(self):
+        try:
+            return os.path.getmtime(self.env_path)
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        """Vuelve a leer el .env solo si cambió desde la última lectura. Devuelve True si se recargó."""
+        mtime = self._env_mtime()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        load_dotenv(self.env_path, override=True)
+        return True
 
     def get(self, key, default=None):
         return self.config.get(key, default)
@@ -37,7 +54,7 @@ class ConfigLoader:
     def set(self, key, value):
         """Actualiza la variable en memoria y en el .env"""
         self.config[key] = str(value)
-        env_path = ".env"
+        env_path = self.env_path
         lines = []
         if os.path.exists(env_path):
             with open(env_path, "r", encoding="utf-8") as f:
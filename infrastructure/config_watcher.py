@@ -0,0 +1,78 @@
+# infrastructure/config_watcher.py
+
+import os
+import hashlib
+import threading
+from infrastructure.file_watcher import DirectoryWatcher
+
+
+class ConfigFileWatcher:
+    """
+    Avisa (on_change()) cuando cambia el contenido de un archivo, p. ej.
+    config/excels.json editado a mano o por un script de despliegue.
+
+    - Vigila la carpeta con DirectoryWatcher y filtra por el archivo.
+    - Espera `debounce` segundos sin cambios antes de avisar: un editor que
+      guarda en varias escrituras produce un solo aviso.
+    - Compara el contenido (sha256): guardar sin cambios, o cambios en otros
+      archivos de la carpeta, no avisan.
+    """
+
+    def __init__(self, logger, path, on_change, debounce=0.3, poll_interval=0.25):
+        self.logger = logger
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.debounce = debounce
+        self._watcher = DirectoryWatcher(logger, self._on_directory_change, poll_interval=poll_interval)
+        self._lock = threading.Lock()
+        self._timer = None
+        self._digest = self._current_digest()
+
+    @classmethod
+    def from_config(cls, config, logger, path, on_change):
+        return cls(logger, path, on_change, debounce=config.get_int("SCHEDULER_RELOAD_DEBOUNCE_MS", 300) / 1000)
+
+    def start(self):
+        self._watcher.watch(os.path.dirname(self.path))
+        self._watcher.start()
+
+    def stop(self):
+        self._watcher.stop()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def mark_current(self):
+        """El contenido actual ya se aplicó (p. ej. lo guardó la GUI y recargó por su cuenta)."""
+        with self._lock:
+            self._digest = self._current_digest()
+
+    def _current_digest(self):
+        try:
+            with open(self.path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def _on_directory_change(self, directory):
+        # La carpeta cambió: se reinicia la espera; solo se mira el archivo cuando deja de cambiar
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self._settled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _settled(self):
+        digest = self._current_digest()
+        with self._lock:
+            self._timer = None
+            if digest is None or digest == self._digest:
+                return
+            self._digest = digest
+        self.logger.info(f"{os.path.basename(self.path)} cambió en disco; se aplican los cambios.")
+        try:
+            self.on_change()
+        except Exception as e:
+            self.logger.error(f"Error aplicando los cambios de {os.path.basename(self.path)}: {e}")
@@ -0,0 +1,232 @@
+# infrastructure/control_channel.py
+
+import os
+import sys
+import json
+import getpass
+import secrets
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from domain.exceptions import ControlChannelError
+
+ENDPOINT_FILE = "config/scheduler_control.json"
+
+COMMANDS = ("status", "list-jobs", "trigger-now", "reload", "pause", "resume", "drain-and-stop")
+
+
+def default_address():
+    """Tubería con nombre en Windows, socket Unix en los demás sistemas (uno por usuario)."""
+    if sys.platform == "win32":
+        return rf"\\.\pipe\pivoty-scheduler-{getpass.getuser()}"
+    return os.path.join(tempfile.gettempdir(), f"pivoty-scheduler-{os.getuid()}.sock")
+
+
+def _family(address):
+    return "AF_PIPE" if address.startswith("\\\\") else "AF_UNIX"
+
+
+class ControlServer:
+    """
+    Canal local para manejar el scheduler desde otro proceso (CLI o GUI).
+
+    Escucha con multiprocessing.connection en una tubería con nombre
+    (Windows) o un socket Unix, y anota en `endpoint_file` la dirección,
+    el pid y una clave aleatoria: solo quien puede leer config/ puede
+    conectarse. Cada pedido es {"comando": ..., "args": {...}}; la respuesta
+    {"ok": True, "resultado": ...} o {"ok": False, "error": "..."}.
+    `handlers` es {comando: función(**args)}.
+    """
+
+    def __init__(self, logger, handlers, address=None, endpoint_file=None):
+        self.logger = logger
+        self.handlers = handlers
+        self.address = address or default_address()
+        self.endpoint_file = endpoint_file or ENDPOINT_FILE
+        self._authkey = secrets.token_bytes(32)
+        self._listener = None
+        self._thread = None
+        self._closing = False
+
+    @classmethod
+    def from_config(cls, config, logger, handlers):
+        return cls(
+            logger,
+            handlers,
+            address=config.get("SCHEDULER_CONTROL_ADDRESS") or None,
+            endpoint_file=config.get("SCHEDULER_CONTROL_FILE", ENDPOINT_FILE),
+        )
+
+    def start(self):
+        family = _family(self.address)
+        if family == "AF_UNIX" and os.path.exists(self.address):
+            os.unlink(self.address) # Quedó de un scheduler que no cerró bien (el que llama ya verificó que nadie contesta)
+        self._listener = Listener(self.address, family=family, authkey=self._authkey)
+        self._write_endpoint()
+        self._thread = threading.Thread(target=self._accept_loop, name="pivoty-control", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Canal de control escuchando en {self.address}")
+
+    def stop(self):
+        if self._listener is None:
+            return
+        self._closing = True
+        # accept() no siempre se corta al cerrar el listener: una conexión propia lo despierta
+        try:
+            Client(self.address, family=_family(self.address), authkey=self._authkey).close()
+        except Exception:
+            pass
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        self._listener = None
+        self._remove_endpoint()
+
+    # --------------------------
+    # Archivo de descubrimiento
+    # --------------------------
+    def _write_endpoint(self):
+        data = {"direccion": self.address, "pid": os.getpid(), "clave": self._authkey.hex()}
+        os.makedirs(os.path.dirname(self.endpoint_file) or ".", exist_ok=True)
+        tmp_path = self.endpoint_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.endpoint_file)
+
+    def _remove_endpoint(self):
+        try:
+            with open(self.endpoint_file, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") != os.getpid():
+                    return # Ya lo reemplazó otro scheduler
+            os.remove(self.endpoint_file)
+        except (OSError, ValueError):
+            pass
+
+    # --------------------------
+    # Atender pedidos
+    # --------------------------
+    def _accept_loop(self):
+        while not self._closing:
+            try:
+                conn = self._listener.accept()
+            except Exception as e:
+                if not self._closing:
+                    self.logger.warning(f"Canal de control: conexión rechazada ({e}).")
+                continue
+            if self._closing:
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._dispatch(request))
+
+    def _dispatch(self, request):
+        command = request.get("comando") if isinstance(request, dict) else None
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"Comando desconocido: {command}. Disponibles: {', '.join(self.handlers)}"}
+        self.logger.debug(f"Canal de control: {command}")
+        try:
+            return {"ok": True, "resultado": handler(**(request.get("args") or {}))}
+        except Exception as e:
+            self.logger.warning(f"Canal de control: '{command}' falló: {e}")
+            return {"ok": False, "error": str(e)}
+
+
+class ControlClient:
+    """Cliente del canal de control: lee la dirección y la clave del archivo que deja el scheduler."""
+
+    def __init__(self, endpoint_file=None, timeout=10):
+        self.endpoint_file = endpoint_file or ENDPOINT_FILE
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            endpoint_file=config.get("SCHEDULER_CONTROL_FILE", ENDPOINT_FILE),
+            timeout=config.get_int("SCHEDULER_CONTROL_TIMEOUT_SECONDS", 10),
+        )
+
+    def _endpoint(self):
+        try:
+            with open(self.endpoint_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data["direccion"], bytes.fromhex(data["clave"]), data.get("pid")
+        except (OSError, ValueError, KeyError):
+            raise ControlChannelError("No hay un scheduler corriendo (no se encontró su canal de control).")
+
+    def request(self, command, **args):
+        address, authkey, pid = self._endpoint()
+        try:
+            conn = Client(address, family=_family(address), authkey=authkey)
+        except AuthenticationError:
+            raise ControlChannelError(f"El scheduler (pid {pid}) rechazó la clave de {self.endpoint_file}: el archivo no es de este scheduler.")
+        except (OSError, EOFError) as e:
+            raise ControlChannelError(f"El scheduler (pid {pid}) no responde en {address}: {e}")
+        try:
+            conn.send({"comando": command, "args": args})
+            if not conn.poll(self.timeout):
+                raise ControlChannelError(f"El scheduler no contestó '{command}' en {self.timeout}s.")
+            response = conn.recv()
+        except (OSError, EOFError) as e:
+            raise ControlChannelError(f"Se cortó la conexión con el scheduler: {e}")
+        finally:
+            conn.close()
+        if not response.get("ok"):
+            raise ControlChannelError(response.get("error") or f"'{command}' falló")
+        return response.get("resultado")
+
+    def is_available(self):
+        try:
+            self.request("status")
+            return True
+        except ControlChannelError:
+            return False
+
+
+class RemoteScheduler:
+    """
+    Lo que la GUI necesita de SchedulerService, contra un scheduler que
+    corre en otro proceso. Al cerrar la GUI el scheduler compartido sigue.
+    """
+
+    def __init__(self, client, logger):
+        self.client = client
+        self.logger = logger
+
+    def _call(self, command, **args):
+        try:
+            return self.client.request(command, **args)
+        except ControlChannelError as e:
+            self.logger.warning(f"No se pudo enviar '{command}' al scheduler: {e}")
+            return None
+
+    def reload_jobs(self):
+        return self._call("reload")
+
+    def status(self):
+        return self._call("status")
+
+    def list_jobs(self):
+        return self._call("list-jobs")
+
+    def trigger_now(self, files=None):
+        return self._call("trigger-now", files=files)
+
+    def pause(self):
+        return self._call("pause")
+
+    def resume(self):
+        return self._call("resume")
+
+    def stop(self):
+        pass # El scheduler es de otro proceso: se detiene con drain-and-stop
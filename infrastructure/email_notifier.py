@@ -2,9 +2,7 @@
 import os
 import smtplib
 from email.message import EmailMessage
-import pythoncom
 from dotenv import load_dotenv, dotenv_values
-import win32com.client as win32
 
 
 class EmailNotifier:
@@ -29,7 +27,7 @@ class EmailNotifier:
         return "No se pudo recuperar el fragmento del log."
 
 
-    def send_email(self, subject, body, attachments=None):
+    def send_email(self, subject, body, attachments=None, screenshots=None):
         # Recargar .env para asegurar que tenemos los destinatarios actualizados
         load_dotenv(override=True)
         env = dotenv_values(".env")
@@ -67,17 +65,9 @@ class EmailNotifier:
         if send_attachment and attachments:
             final_attachments.extend(attachments)
 
-        # 2. Capturas de pantalla
-        if include_screenshots:
-            screenshot_dir = env.get("LOG_DIR", "logs") + "/screenshots"
-            if os.path.exists(screenshot_dir):
-                try:
-                    screenshots = [os.path.join(screenshot_dir, f) for f in os.listdir(screenshot_dir) if f.endswith(".png")]
-                    if screenshots:
-                        screenshots.sort(key=os.path.getmtime, reverse=True)
-                        final_attachments.extend(screenshots[:2])
-                except:
-                    pass
+        # 2. Capturas de pantalla: las que nos pasan (de esta corrida), no lo último de la carpeta
+        if include_screenshots and screenshots:
+            final_attachments.extend(path for path in screenshots if os.path.exists(path))
 
         # 3. Logs (solo en error y si ATTACH_LOG_ON_ERROR es true)
         if attach_logs and ("ERROR" in subject.upper() or "FALLÓ" in body.upper()):
@@ -91,7 +81,9 @@ class EmailNotifier:
 
 
         if use_outlook:
-            # Enviar usando Outlook Desktop
+            # Enviar usando Outlook Desktop (pywin32 solo se importa si se usa Outlook)
+            import pythoncom
+            import win32com.client as win32
             try:
                 pythoncom.CoInitialize()
                 outlook = win32.Dispatch("Outlook.Application")
@@ -0,0 +1,188 @@
+# infrastructure/excel_backend.py
+
+import time
+import itertools
+
+
+class ExcelBackend:
+    """
+    Interfaz mínima para crear y gestionar instancias de Excel.
+    El pool (ExcelPool) solo habla con esta interfaz, así se puede
+    probar con el backend falso fuera de Windows.
+    """
+
+    def initialize_thread(self):
+        """Prepara el hilo actual (apartamento COM) antes de crear instancias."""
+        pass
+
+    def uninitialize_thread(self):
+        """Libera el apartamento del hilo actual."""
+        pass
+
+    def create_application(self):
+        raise NotImplementedError
+
+    def reset_application(self, app):
+        """Deja la instancia lista para el siguiente libro (sin libros abiertos)."""
+        raise NotImplementedError
+
+    def quit_application(self, app):
+        raise NotImplementedError
+
+    def get_pid(self, app):
+        return None
+
+    def get_memory_bytes(self, app):
+        return None
+
+    def is_com_error(self, error):
+        return False
+
+
+class ComExcelBackend(ExcelBackend):
+    """Backend real: Excel.Application vía pywin32 (solo Windows)."""
+
+    XL_CALCULATION_AUTOMATIC = -4105
+
+    def initialize_thread(self):
+        import pythoncom
+        pythoncom.CoInitialize()
+
+    def uninitialize_thread(self):
+        import pythoncom
+        pythoncom.CoUninitialize()
+
+    def create_application(self):
+        import win32com.client as win32
+        excel = win32.DispatchEx("Excel.Application")
+        excel.Visible = False
+        excel.DisplayAlerts = False
+        return excel
+
+    def reset_application(self, app):
+        # Cerrar cualquier libro que haya quedado abierto sin guardar cambios
+        for wb in list(app.Workbooks):
+            wb.Close(SaveChanges=False)
+        app.Visible = False
+        app.DisplayAlerts = False
+        app.ScreenUpdating = True
+        app.EnableEvents = True
+        app.CutCopyMode = False
+        app.Calculation = self.XL_CALCULATION_AUTOMATIC
+
+    def quit_application(self, app):
+        app.Quit()
+
+    def get_pid(self, app):
+        try:
+            import win32process
+            return win32process.GetWindowThreadProcessId(app.Hwnd)[1]
+        except Exception:
+            return None
+
+    def get_memory_bytes(self, app):
+        pid = self.get_pid(app)
+        if not pid:
+            return None
+        try:
+            import win32api
+            import win32con
+            import win32process
+            handle = win32api.OpenProcess(
+                win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ, False, pid
+            )
+            try:
+                return win32process.GetProcessMemoryInfo(handle)["WorkingSetSize"]
+            finally:
+                win32api.CloseHandle(handle)
+        except Exception:
+            return None
+
+    def is_com_error(self, error):
+        try:
+            import pywintypes
+        except ImportError:
+            return False
+        return isinstance(error, pywintypes.com_error)
+
+
+# El backend que usan la corrida y el gateway al crear sus pools.
+# Los benchmarks lo cambian por el Excel simulado (fake_excel_com).
+_BACKEND_FACTORY = ComExcelBackend
+
+
+def set_backend_factory(factory):
+    """Cambia la fábrica de backends del proceso y devuelve la anterior (para restaurarla)."""
+    global _BACKEND_FACTORY
+    previous, _BACKEND_FACTORY = _BACKEND_FACTORY, factory
+    return previous
+
+
+def create_backend():
+    return _BACKEND_FACTORY()
+
+
+# ==========================================================
+# Backend falso (en proceso) para pruebas y benchmarks en Linux
+# ==========================================================
+
+class FakeComError(Exception):
+    """Equivalente a pywintypes.com_error para el backend falso."""
+    pass
+
+
+class FakeWorkbooks(list):
+    pass
+
+
+class FakeExcelApplication:
+    _pids = itertools.count(10000)
+
+    def __init__(self, memory_bytes=0):
+        self.pid = next(self._pids)
+        self.Visible = False
+        self.DisplayAlerts = False
+        self.Workbooks = FakeWorkbooks()
+        self.memory_bytes = memory_bytes
+        self.quit_called = False
+
+
+class FakeExcelBackend(ExcelBackend):
+    """
+    Backend en memoria: simula el costo de arranque de Excel con un sleep
+    y cuenta cuántas instancias se crearon y cerraron.
+    """
+
+    def __init__(self, startup_seconds=0.0, memory_bytes=0, memory_growth_bytes=0):
+        self.startup_seconds = startup_seconds
+        self.memory_bytes = memory_bytes
+        self.memory_growth_bytes = memory_growth_bytes
+        self.created = 0
+        self.quit = 0
+        self.resets = 0
+
+    def create_application(self):
+        if self.startup_seconds:
+            time.sleep(self.startup_seconds)
+        self.created += 1
+        return FakeExcelApplication(memory_bytes=self.memory_bytes)
+
+    def reset_application(self, app):
+        if app.quit_called:
+            raise FakeComError("La instancia ya no existe")
+        app.Workbooks.clear()
+        app.memory_bytes += self.memory_growth_bytes
+        self.resets += 1
+
+    def quit_application(self, app):
+        app.quit_called = True
+        self.quit += 1
+
+    def get_pid(self, app):
+        return app.pid
+
+    def get_memory_bytes(self, app):
+        return app.memory_bytes
+
+    def is_com_error(self, error):
+        return isinstance(error, FakeComError)
@@ -1,60 +1,35 @@
 # infrastructure/excel_gateway.py
 
 import time
-import pythoncom
-import win32com.client as win32
-import win32gui
-import win32ui
-import win32con
-import win32api
 import os
-from datetime import datetime
-from domain.exceptions import ExcelGatewayError
+from contextlib import nullcontext
+from domain.exceptions import ExcelGatewayError, FileLockedError, RefreshCancelledError
+from infrastructure.file_lock import is_file_locked
+from infrastructure.excel_backend import create_backend
+from infrastructure.excel_pool import ExcelPool
+from infrastructure.excel_supervisor import get_excel_supervisor
+from infrastructure.process_control import default_process_control
+from infrastructure.retry_policy import RetryPolicy, PERMANENT
+from infrastructure.phase_timer import NULL_RECORDER
+from infrastructure.screenshot_service import NULL_SCREENSHOTS
+from infrastructure.xlsx_inspector import inspect_xlsx, total_errors
+from domain.validation_rules import ValidationRules
+from infrastructure.refresh_waiter import RefreshCompletionWaiter, ComRefreshEventSource, RefreshEventSource
+
+XL_DATABASE = 1 # PivotCache.SourceType de un rango de hoja
 
 class ExcelGateway:
-    def __init__(self, logger, config):
+    def __init__(self, logger, config, pool=None, screenshots=None):
         self.logger = logger
         self.config = config
-        self.max_retries = config.get_int("MAX_RETRIES", 3)
-        self.retry_interval = config.get_int("RETRY_INTERVAL_SECONDS", 15)
+        # Si no nos pasan un pool, usamos uno propio que se cierra al terminar cada archivo
+        self.pool = pool
+        self._owns_pool = pool is None
         self.validate_rows = config.get_bool("VALIDATE_ROWS_AFTER_REFRESH", True)
-        self.screenshot_on_error = config.get_bool("SCREENSHOT_ON_ERROR", True)
-
-    def _take_screenshot(self, name_prefix="error"):
-        try:
-            os.makedirs("logs/screenshots", exist_ok=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"logs/screenshots/{name_prefix}_{timestamp}.png"
-            
-            # Use win32 for screenshot to avoid external deps if possible
-            hdesktop = win32gui.GetDesktopWindow()
-            width = win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN)
-            height = win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN)
-            left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
-            top = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
-
-            desktop_dc = win32gui.GetWindowDC(hdesktop)
-            img_dc = win32ui.CreateDCFromHandle(desktop_dc)
-            mem_dc = img_dc.CreateCompatibleDC()
-
-            screenshot = win32ui.CreateBitmap()
-            screenshot.CreateCompatibleBitmap(img_dc, width, height)
-            mem_dc.SelectObject(screenshot)
-            mem_dc.BitBlt((0, 0), (width, height), img_dc, (left, top), win32con.SRCCOPY)
-            
-            screenshot.SaveBitmapFile(mem_dc, filename)
-            
-            # Clean up
-            mem_dc.DeleteDC()
-            win32gui.DeleteObject(screenshot.GetHandle())
-            img_dc.DeleteDC()
-            win32gui.ReleaseDC(hdesktop, desktop_dc)
-            
-            self.logger.info(f"Captura de pantalla guardada: {filename}")
-            return filename
-        except Exception as e:
-            self.logger.warning(f"No se pudo tomar la captura de pantalla: {e}")
-            return None
+        # Las capturas las guarda un servicio aparte (ScreenshotService), indexadas por corrida
+        self.screenshots = screenshots or NULL_SCREENSHOTS
+        self.refresh_timeout = config.get_int("REFRESH_TIMEOUT_SECONDS", 7200)
+        self.use_refresh_events = config.get_bool("REFRESH_EVENTS_ENABLED", True)
 
     def _check_excel_health(self):
         """Verifica si hay diálogos abiertos o estados que bloqueen Excel."""
@@ -63,120 +38,239 @@ class ExcelGateway:
         return True
 
     def file_is_locked(self, path):
-        try:
-            with open(path, "a"):
-                return False
-        except PermissionError:
-            return True
+        return is_file_locked(path)
 
-    def refresh_file(self, excel_path):
+    def refresh_file(self, excel_path, selection=None, retry_policy=None, timer=None, validation=None, staging=None,
+                     cancel_token=None):
         self.logger.info(f"Iniciando refresh del archivo: {excel_path}")
 
         # --- MANEJO DE CONFLICTOS CON EL USUARIO ---
-        # Si el usuario tiene el archivo abierto, intentamos esperar un poco
-        max_lock_attempts = 5
-        for lock_attempt in range(1, max_lock_attempts + 1):
-            if not self.file_is_locked(excel_path):
-                break
-            if lock_attempt < max_lock_attempts:
-                self.logger.warning(f"Archivo en uso por el usuario. Reintento {lock_attempt} en 30s...")
-                time.sleep(30)
-            else:
-                raise ExcelGatewayError(f"El archivo sigue bloqueado después de {max_lock_attempts} intentos. Por favor, ciérrelo para que el bot pueda trabajar.")
+        # Si el usuario tiene el archivo abierto no esperamos aquí: quien nos llama
+        # decide si lo aparca y sigue con otros archivos. Con staging no hace falta:
+        # se trabaja sobre una copia y el bloqueo solo importa al reemplazar el original
+        if staging is None and self.file_is_locked(excel_path):
+            raise FileLockedError(f"El archivo está abierto por otra persona. Por favor, ciérrelo para que el bot pueda trabajar: {excel_path}")
+
+        pool = self.pool or ExcelPool.from_config(
+            create_backend(), self.logger, self.config, supervisor=get_excel_supervisor(self.config, self.logger)
+        )
+        try:
+            return self._refresh_with_retries(
+                pool, excel_path, selection,
+                retry_policy or RetryPolicy.from_job(None, self.config),
+                timer or NULL_RECORDER.job(excel_path),
+                validation or ValidationRules.from_job(None, self.config),
+                staging,
+                cancel_token,
+            )
+        finally:
+            if self._owns_pool:
+                pool.shutdown()
 
+    def _refresh_with_retries(self, pool, excel_path, selection, policy, timer, validation, staging=None, cancel_token=None):
+        # Lo que no se debe cortar a la mitad (guardar, reemplazar el original) va protegido
+        shield = cancel_token.shield if cancel_token is not None else nullcontext
         attempt = 1
-        while attempt <= self.max_retries:
-            excel = None
+        while True:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            instance = None
             wb = None
+            staged = None
+            att = timer.attempt(attempt)
             try:
-                self.logger.info(f"Intento {attempt} de {self.max_retries}...")
+                # Con staging, Excel trabaja sobre una copia local y el original se reemplaza al final
+                work_path = excel_path
+                if staging is not None:
+                    with att.phase("copiar"):
+                        staged = staging.stage(excel_path)
+                    work_path = staged.path
+
+                self.logger.info(f"Intento {attempt} de {policy.max_retries}...")
                 self._check_excel_health()
-                pythoncom.CoInitialize()
-                excel = win32.DispatchEx("Excel.Application")
-                excel.Visible = False
-                excel.DisplayAlerts = False
+                with att.phase("instancia"):
+                    instance = pool.acquire(job=excel_path)
+                excel = instance.app
+                if cancel_token is not None:
+                    # Una llamada COM en curso no se interrumpe: cancelar es cerrar este Excel a la fuerza
+                    cancel_token.bind(lambda pid=instance.pid: self._kill_excel(pid))
 
-                wb = excel.Workbooks.Open(excel_path)
+                with att.phase("abrir"):
+                    wb = excel.Workbooks.Open(work_path)
 
                 # --- CONFIGURACIÓN PARA POWER QUERY PESADO ---
                 # Deshabilitamos el refresco en segundo plano de todas las conexiones
                 # Esto obliga a que wb.RefreshAll() sea sincrónico y espere de verdad.
-                try:
-                    for conn in wb.Connections:
-                        if conn.Type == 1: # OLEDB (Power Query)
-                            conn.OLEDBConnection.BackgroundQuery = False
-                        elif conn.Type == 2: # ODBC
-                            conn.ODBCConnection.BackgroundQuery = False
-                except Exception as e:
-                    self.logger.warning(f"No se pudieron ajustar todas las conexiones: {e}")
+                with att.phase("conexiones"):
+                    try:
+                        for conn in wb.Connections:
+                            if conn.Type == 1: # OLEDB (Power Query)
+                                conn.OLEDBConnection.BackgroundQuery = False
+                            elif conn.Type == 2: # ODBC
+                                conn.ODBCConnection.BackgroundQuery = False
+                    except Exception as e:
+                        self.logger.warning(f"No se pudieron ajustar todas las conexiones: {e}")
 
                 t_start = time.time()
-                self.logger.info("Ejecutando RefreshAll()...")
-                wb.RefreshAll()
-                
-                # Aumentamos el timeout de espera a 2 horas (7200s) por seguridad
-                self._wait_for_refresh(excel, timeout=7200)
+                if selection is None or selection.refresh_all:
+                    # Nos suscribimos a los eventos antes de lanzar el refresh
+                    waiter = self._create_waiter(excel, wb)
+                    waiter.start()
+
+                    self.logger.info("Ejecutando RefreshAll()...")
+                    with att.phase("refresh"):
+                        wb.RefreshAll()
+                    
+                    # Timeout configurable (por defecto 2 horas) por seguridad
+                    with att.phase("espera_calculo"):
+                        conexiones = waiter.wait()
+                else:
+                    with att.phase("refresh"):
+                        conexiones = self._refresh_selected(excel, wb, selection)
                 t_end = time.time()
 
-                wb.Save()
-                # Clean exit on success
-                wb.Close()
-                wb = None
-                excel.Quit()
-                excel = None
+                with att.phase("guardar"), shield():
+                    wb.Save()
+                # Clean exit on success: la instancia vuelve al pool para el siguiente libro
+                with att.phase("cerrar"):
+                    wb.Close()
+                    wb = None
+                    if cancel_token is not None:
+                        cancel_token.unbind()
+                    pool.release(instance)
+                    instance = None
 
+                validacion = None
                 if self.validate_rows:
-                    self._validate_excel_after_refresh(excel_path)
+                    with att.phase("validar"):
+                        validacion = self._validate_excel_after_refresh(work_path, validation)
+
+                if staged is not None:
+                    with att.phase("reemplazar"), shield():
+                        if cancel_token is not None:
+                            cancel_token.raise_if_cancelled()
+                        staged.commit()
+                    staged.discard()
+                    self.logger.info(f"Copia refrescada reemplazó al original: {excel_path}")
 
+                att.finish("ok")
                 return {
                     "status": "ok",
                     "message": "Archivo actualizado correctamente",
-                    "refresh_time": round(t_end - t_start, 2)
+                    "refresh_time": round(t_end - t_start, 2),
+                    "conexiones": conexiones,
+                    "validacion": validacion
                 }
 
             except Exception as e:
                 self.logger.error(f"Error en intento {attempt}: {str(e)}")
+                att.finish("error", str(e))
                 
-                if self.screenshot_on_error:
-                    self._take_screenshot(f"error_intento_{attempt}")
+                cancelled = cancel_token is not None and cancel_token.cancelled
+                if cancel_token is not None:
+                    cancel_token.unbind()
+                if not isinstance(e, FileLockedError) and not cancelled:
+                    self.screenshots.capture(excel_path, attempt)
                 
                 # Force cleanup on error
                 try:
                     if wb: wb.Close(SaveChanges=False)
                 except: pass
                 
-                try:
-                    if excel: excel.Quit()
-                except: pass
+                # El pool decide si la instancia se puede reutilizar o hay que reciclarla
+                if instance:
+                    pool.release(instance, error=e)
+
+                # La copia fallida se descarta: el original sigue igual que antes
+                if staged is not None:
+                    staged.discard()
+
+                # Abrieron el original durante el refresh: quien nos llama lo aparca
+                if isinstance(e, FileLockedError):
+                    raise
+                if cancelled:
+                    raise RefreshCancelledError(f"Refresh cancelado: {cancel_token.reason}")
                 
-                if attempt == self.max_retries:
+                if not policy.should_retry(attempt, e):
+                    if policy.classifier(e) == PERMANENT:
+                        raise ExcelGatewayError(f"Error que no se arregla reintentando: {str(e)}")
                     raise ExcelGatewayError(f"Todos los intentos fallaron: {str(e)}")
                 
-                self.logger.info(f"Esperando {self.retry_interval}s antes del próximo intento...")
-                time.sleep(self.retry_interval)
-
-            finally:
-                pythoncom.CoUninitialize()
+                delay = policy.delay(attempt)
+                self.logger.info(f"Esperando {round(delay, 1)}s antes del próximo intento...")
+                if cancel_token is not None:
+                    cancel_token.wait(delay) # Se despierta antes si cancelan
+                else:
+                    policy.sleep(delay)
 
             attempt += 1
 
-    def _wait_for_refresh(self, excel_app, timeout=120):
-        self.logger.info("Esperando a que Excel termine el cálculo...")
-        start_time = time.time()
-        while True:
-            try:
-                state = excel_app.CalculateState
-            except:
-                break
-            if state == 0:
-                break
-            time.sleep(0.5)
-            if time.time() - start_time > timeout:
-                self.logger.warning("Timeout esperando a que Excel termine el cálculo.")
-                break
-
-    def _validate_excel_after_refresh(self, path):
+    def _kill_excel(self, pid):
+        if not pid:
+            return
+        self.logger.info(f"Refresh cancelado: se cierra Excel (PID {pid}).")
+        try:
+            default_process_control().kill(pid)
+        except Exception as e:
+            self.logger.warning(f"No se pudo cerrar Excel (PID {pid}): {e}")
+
+    def _refresh_selected(self, excel_app, wb, selection):
+        """Refresca solo las conexiones elegidas, una por una y midiendo cada una."""
+        available = [(conn.Name, conn.Type) for conn in wb.Connections]
+        names = selection.select(available)
+
+        missing = selection.unmatched_includes([name for name, _ in available])
+        if missing:
+            self.logger.warning(f"Estas conexiones no existen en el libro: {', '.join(missing)}")
+        self.logger.info(f"Refrescando {len(names)} de {len(available)} conexiones: {', '.join(names)}")
+
+        conexiones = []
+        for name in names:
+            t0 = time.time()
+            wb.Connections(name).Refresh()
+            seconds = round(time.time() - t0, 2)
+            self.logger.info(f"Conexión '{name}' terminó en {seconds}s.")
+            conexiones.append({"nombre": name, "ok": True, "segundos": seconds})
+
+        if selection.pivots:
+            # Las tablas dinámicas que leen rangos de hoja van al final: dependen de lo que cargaron las consultas
+            for idx in range(1, wb.PivotCaches().Count + 1):
+                cache = wb.PivotCaches(idx)
+                if cache.SourceType != XL_DATABASE:
+                    continue
+                t0 = time.time()
+                cache.Refresh()
+                seconds = round(time.time() - t0, 2)
+                conexiones.append({"nombre": f"PivotCache {idx}", "ok": True, "segundos": seconds})
+
+        waiter = RefreshCompletionWaiter(self.logger, excel_app, timeout=self.refresh_timeout)
+        waiter.start()
+        waiter.wait()
+        return conexiones
+
+    def _create_waiter(self, excel_app, wb):
+        event_source = ComRefreshEventSource(excel_app, wb, self.logger) if self.use_refresh_events else RefreshEventSource()
+        return RefreshCompletionWaiter(self.logger, excel_app, wb, event_source=event_source, timeout=self.refresh_timeout)
+
+    def _validate_excel_after_refresh(self, path, rules):
         file_size = os.path.getsize(path)
         if file_size <= 0:
             raise ExcelGatewayError("El archivo quedó vacío después del refresh.")
-        self.logger.info(f"Validación OK: archivo final tiene {file_size} bytes.")
+
+        if not path.lower().endswith((".xlsx", ".xlsm")):
+            self.logger.info(f"Validación OK: archivo final tiene {file_size} bytes (no se revisan filas en este formato).")
+            return None
+
+        # Leemos el archivo ya guardado sin Excel y sin cargar hojas enteras en memoria
+        report = inspect_xlsx(path)
+        errors = total_errors(report)
+        if errors:
+            self.logger.warning(f"El archivo tiene {errors} celdas con error (#REF!, #N/A...).")
+
+        problems = rules.check(report)
+        if problems:
+            raise ExcelGatewayError("La validación después del refresh falló: " + "; ".join(problems))
+
+        filas = ", ".join(f"{n}={t['filas']}" for n, t in report["tablas"].items())
+        self.logger.info(f"Validación OK: archivo final tiene {file_size} bytes. Filas por tabla: {filas or 'sin tablas'}")
+        return report
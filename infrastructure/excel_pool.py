@@ -0,0 +1,168 @@
+# infrastructure/excel_pool.py
+
+import threading
+from contextlib import contextmanager
+
+
+class PooledExcel:
+    """Una instancia de Excel administrada por el pool."""
+
+    def __init__(self, app, pid=None):
+        self.app = app
+        self.pid = pid
+        self.uses = 0
+        self.broken = False
+
+
+class ExcelPool:
+    """
+    Mantiene instancias de Excel "calientes" para no pagar el arranque
+    de Excel en cada archivo.
+
+    - acquire()/release() (o lease()) prestan una instancia por refresh.
+    - Entre libros la instancia se resetea (se cierran los libros abiertos).
+    - Se recicla tras `max_uses` usos, ante cualquier error COM o si
+      supera `max_memory_mb`.
+
+    Las instancias COM pertenecen al apartamento del hilo que las creó:
+    cada hilo de trabajo debe tener su propio pool.
+
+    Si se pasa un `supervisor` (ExcelSupervisor), se le avisa de cada proceso
+    creado, de qué libro está trabajando y de cuándo se cierra.
+    """
+
+    def __init__(self, backend, logger, max_idle=1, max_uses=10, max_memory_mb=0, supervisor=None):
+        self.backend = backend
+        self.logger = logger
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else 0
+        self.supervisor = supervisor
+        self._idle = []
+        self._lock = threading.Lock()
+        self._thread_initialized = False
+        self.stats = {"created": 0, "reused": 0, "closed": 0}
+
+    @classmethod
+    def from_config(cls, backend, logger, config, supervisor=None):
+        enabled = config.get_bool("EXCEL_POOL_ENABLED", True)
+        return cls(
+            backend,
+            logger,
+            max_idle=1 if enabled else 0,
+            max_uses=config.get_int("EXCEL_POOL_MAX_USES", 10),
+            max_memory_mb=config.get_int("EXCEL_POOL_MAX_MEMORY_MB", 1500),
+            supervisor=supervisor,
+        )
+
+    # --------------------------
+    # Prestar una instancia
+    # --------------------------
+    def acquire(self, job=None):
+        with self._lock:
+            instance = self._idle.pop() if self._idle else None
+
+        # Sin PID (el backend no lo sabe) no hay forma de comprobarlo: se usa igual
+        if instance is not None and self.supervisor and instance.pid is not None and not self.supervisor.is_alive(instance.pid):
+            # El supervisor la mató mientras esperaba en el pool
+            self.logger.info(f"La instancia de Excel (PID {instance.pid}) ya no existe, se abre otra.")
+            self.stats["closed"] += 1
+            instance = None
+
+        if instance is not None:
+            self.stats["reused"] += 1
+            self._assign(instance, job)
+            return instance
+
+        if not self._thread_initialized:
+            self.backend.initialize_thread()
+            self._thread_initialized = True
+
+        self.logger.info("Abriendo una nueva instancia de Excel...")
+        app = self.backend.create_application()
+        self.stats["created"] += 1
+        instance = PooledExcel(app, pid=self.backend.get_pid(app))
+        if self.supervisor:
+            self.supervisor.register(instance.pid)
+        self._assign(instance, job)
+        return instance
+
+    # --------------------------
+    # Devolver la instancia
+    # --------------------------
+    def release(self, instance, error=None):
+        instance.uses += 1
+        reason = self._recycle_reason(instance, error)
+
+        if reason is None:
+            try:
+                self.backend.reset_application(instance.app)
+            except Exception as e:
+                reason = f"no se pudo reiniciar ({e})"
+
+        if reason is None and self.max_memory_bytes:
+            memory = self.backend.get_memory_bytes(instance.app)
+            if memory and memory > self.max_memory_bytes:
+                reason = f"usa {memory // (1024 * 1024)} MB de memoria"
+
+        if reason is None:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(instance)
+                    self._assign(instance, None)
+                    return
+            reason = "el pool ya está lleno"
+
+        self.logger.info(f"Cerrando instancia de Excel (PID {instance.pid}): {reason}.")
+        self._quit(instance)
+
+    @contextmanager
+    def lease(self, job=None):
+        instance = self.acquire(job)
+        try:
+            yield instance.app
+        except Exception as e:
+            self.release(instance, error=e)
+            raise
+        else:
+            self.release(instance)
+
+    def _recycle_reason(self, instance, error):
+        if instance.broken:
+            return "quedó marcada como dañada"
+        if error is not None and self.backend.is_com_error(error):
+            return f"error COM ({error})"
+        if self.max_uses and instance.uses >= self.max_uses:
+            return f"alcanzó {instance.uses} usos"
+        if self.max_idle <= 0:
+            return "el pool está deshabilitado"
+        return None
+
+    def _assign(self, instance, job):
+        if self.supervisor:
+            self.supervisor.assign(instance.pid, job)
+
+    def _quit(self, instance):
+        try:
+            self.backend.quit_application(instance.app)
+        except Exception as e:
+            self.logger.warning(f"No se pudo cerrar Excel limpiamente (PID {instance.pid}): {e}")
+        # Si Quit falló (o Excel no termina), el supervisor lo mata pasado un rato
+        if self.supervisor:
+            self.supervisor.retire(instance.pid)
+        self.stats["closed"] += 1
+
+    # --------------------------
+    # Cerrar todo
+    # --------------------------
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for instance in idle:
+            self._quit(instance)
+        if self._thread_initialized:
+            try:
+                self.backend.uninitialize_thread()
+            except Exception:
+                pass
+            self._thread_initialized = False
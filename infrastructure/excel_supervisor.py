@@ -0,0 +1,260 @@
+# infrastructure/excel_supervisor.py
+
+import os
+import json
+import time
+import threading
+from infrastructure.process_control import default_process_control
+
+
+class ExcelSupervisor:
+    """
+    Vigila los procesos EXCEL.EXE que abre el bot y mata los que quedan mal:
+    - Los que siguen vivos `retire_grace` segundos después de cerrarlos (Quit falló).
+    - Los que llevan con un mismo libro más que `job_deadline` segundos.
+    - Opcional: los que superan `max_memory_mb` o no responden durante `hang_seconds`
+      sin consumir CPU.
+
+    Los PID se guardan en un archivo por proceso del bot dentro de `registry_dir`;
+    al arrancar, sweep_orphans() mata los Excel que dejó un bot que ya no existe.
+    """
+
+    def __init__(self, logger, registry_dir, control=None, job_deadline=8100, retire_grace=30,
+                 max_memory_mb=0, hang_seconds=0, check_interval=15, clock=time.time):
+        self.logger = logger
+        self.registry_dir = registry_dir
+        self.control = control or default_process_control()
+        self.job_deadline = job_deadline
+        self.retire_grace = retire_grace
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else 0
+        self.hang_seconds = hang_seconds
+        self.check_interval = check_interval
+        self.clock = clock
+        self.owner_pid = os.getpid()
+        self._entries = {} # pid -> datos del proceso (se guardan en el registro)
+        self._watch = {} # pid -> {"cpu", "sin_respuesta_desde"} (solo en memoria)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, logger):
+        return cls(
+            logger,
+            config.get("EXCEL_REGISTRY_DIR", os.path.join("config", "excel_processes")),
+            job_deadline=config.get_int("EXCEL_JOB_DEADLINE_SECONDS", config.get_int("REFRESH_TIMEOUT_SECONDS", 7200) + 900),
+            retire_grace=config.get_int("EXCEL_RETIRE_GRACE_SECONDS", 30),
+            max_memory_mb=config.get_int("EXCEL_KILL_MEMORY_MB", 0),
+            hang_seconds=config.get_int("EXCEL_HANG_KILL_SECONDS", 0),
+            check_interval=config.get_int("EXCEL_SUPERVISOR_INTERVAL_SECONDS", 15),
+        )
+
+    # --------------------------
+    # Avisos del pool
+    # --------------------------
+    def register(self, pid):
+        """Una instancia nueva de Excel, creada por este proceso."""
+        if not pid:
+            return
+        with self._lock:
+            self._entries[pid] = {
+                "nombre": self.control.name(pid),
+                "creado": self.control.create_time(pid),
+                "job": None,
+                "job_inicio": None,
+                "retirado": None,
+            }
+            self._save()
+        self.start()
+
+    def assign(self, pid, job):
+        """La instancia empieza (job) o termina (None) de trabajar con un libro."""
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is None:
+                return
+            entry["job"] = job
+            entry["job_inicio"] = self.clock() if job else None
+            self._save()
+
+    def retire(self, pid):
+        """Se pidió cerrar la instancia: si no termina sola en retire_grace, se mata."""
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is None:
+                return
+            entry["job"] = None
+            entry["retirado"] = self.clock()
+            self._save()
+
+    def is_alive(self, pid):
+        with self._lock:
+            if pid not in self._entries:
+                return False
+        return self.control.exists(pid)
+
+    # --------------------------
+    # Limpieza al arrancar
+    # --------------------------
+    def sweep_orphans(self):
+        """Mata los Excel registrados por procesos del bot que ya terminaron (cuelgues, cierres forzados)."""
+        if not os.path.isdir(self.registry_dir):
+            return 0
+        killed = 0
+        for item in os.scandir(self.registry_dir):
+            if not item.name.endswith(".json"):
+                continue
+            try:
+                with open(item.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            owner = data.get("owner", {})
+            if owner.get("pid") == self.owner_pid or self._same_process(owner.get("pid"), owner.get("creado")):
+                continue # Ese bot sigue vivo: sus Excel no son huérfanos
+
+            for pid, entry in data.get("procesos", {}).items():
+                pid = int(pid)
+                if self._same_process(pid, entry.get("creado"), entry.get("nombre")):
+                    self.logger.warning(f"Cerrando Excel huérfano (PID {pid}) que quedó de una corrida anterior.")
+                    if self._kill(pid):
+                        killed += 1
+            try:
+                os.remove(item.path)
+            except OSError:
+                pass
+        return killed
+
+    def _same_process(self, pid, created, name=None):
+        """El PID existe y es el mismo proceso que registramos (no uno nuevo con el PID reutilizado)."""
+        if not pid or not self.control.exists(pid):
+            return False
+        if created is not None and self.control.create_time(pid) != created:
+            return False
+        if name is not None and self.control.name(pid) != name:
+            return False
+        return True
+
+    # --------------------------
+    # Vigilancia periódica
+    # --------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="pivoty-excel-supervisor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.warning(f"Error revisando los procesos de Excel: {e}")
+
+    def check(self):
+        """Revisa cada instancia registrada y mata las que hay que matar. Devuelve los PID matados."""
+        with self._lock:
+            entries = {pid: dict(entry) for pid, entry in self._entries.items()}
+
+        now = self.clock()
+        killed = []
+        gone = []
+        for pid, entry in entries.items():
+            if not self.control.exists(pid):
+                gone.append(pid)
+                continue
+            reason = self._kill_reason(pid, entry, now)
+            if reason:
+                self.logger.warning(f"Matando Excel (PID {pid}): {reason}.")
+                if self._kill(pid):
+                    killed.append(pid)
+                    gone.append(pid)
+
+        if gone:
+            with self._lock:
+                for pid in gone:
+                    self._entries.pop(pid, None)
+                    self._watch.pop(pid, None)
+                self._save()
+        return killed
+
+    def _kill_reason(self, pid, entry, now):
+        if entry["retirado"] and now - entry["retirado"] > self.retire_grace:
+            return f"sigue abierto {round(now - entry['retirado'])}s después de cerrarlo"
+        if entry["job"] and self.job_deadline and now - entry["job_inicio"] > self.job_deadline:
+            return f"lleva {round(now - entry['job_inicio'])}s con {entry['job']} (límite {self.job_deadline}s)"
+
+        if self.max_memory_bytes:
+            memory = self.control.memory_bytes(pid)
+            if memory and memory > self.max_memory_bytes:
+                return f"usa {memory // (1024 * 1024)} MB de memoria"
+
+        if self.hang_seconds:
+            # Colgado = no contesta mensajes y tampoco usa CPU (un refresh largo sí la usa)
+            watch = self._watch.setdefault(pid, {"cpu": None, "sin_respuesta_desde": None})
+            cpu = self.control.cpu_seconds(pid)
+            busy = cpu is not None and watch["cpu"] is not None and cpu > watch["cpu"]
+            watch["cpu"] = cpu
+            if busy or self.control.is_responding(pid):
+                watch["sin_respuesta_desde"] = None
+            elif watch["sin_respuesta_desde"] is None:
+                watch["sin_respuesta_desde"] = now
+            elif now - watch["sin_respuesta_desde"] > self.hang_seconds:
+                return f"no responde desde hace {round(now - watch['sin_respuesta_desde'])}s"
+        return None
+
+    def _kill(self, pid):
+        try:
+            self.control.kill(pid)
+            return True
+        except Exception as e:
+            self.logger.warning(f"No se pudo matar el proceso {pid}: {e}")
+            return False
+
+    # --------------------------
+    # Registro en disco
+    # --------------------------
+    def _registry_path(self):
+        return os.path.join(self.registry_dir, f"{self.owner_pid}.json")
+
+    def _save(self):
+        data = {
+            "owner": {"pid": self.owner_pid, "creado": self.control.create_time(self.owner_pid)},
+            "procesos": {str(pid): entry for pid, entry in self._entries.items()},
+        }
+        try:
+            os.makedirs(self.registry_dir, exist_ok=True)
+            tmp_path = self._registry_path() + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._registry_path())
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar el registro de procesos de Excel: {e}")
+
+
+# Un supervisor por proceso: lo comparten todos los pools (uno por hilo)
+DEFAULT_SUPERVISOR = None
+_SUPERVISOR_LOCK = threading.Lock()
+
+
+def get_excel_supervisor(config, logger):
+    """Supervisor del proceso (None si EXCEL_SUPERVISOR_ENABLED=false). La primera vez limpia huérfanos."""
+    global DEFAULT_SUPERVISOR
+    if not config.get_bool("EXCEL_SUPERVISOR_ENABLED", True):
+        return None
+    with _SUPERVISOR_LOCK:
+        if DEFAULT_SUPERVISOR is None:
+            supervisor = ExcelSupervisor.from_config(config, logger)
+            killed = supervisor.sweep_orphans()
+            if killed:
+                logger.info(f"Se cerraron {killed} procesos de Excel huérfanos.")
+            DEFAULT_SUPERVISOR = supervisor
+        return DEFAULT_SUPERVISOR
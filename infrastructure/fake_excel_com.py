@@ -0,0 +1,348 @@
+# infrastructure/fake_excel_com.py
+"""
+Excel simulado con la misma forma que el objeto COM que usa el gateway
+(Workbooks.Open, Connections, RefreshAll, CalculateState, Save...), con
+latencias y fallos configurables. Sirve para medir el pipeline completo en
+Linux, sin Excel ni libros reales (ver benchmarks/).
+
+Perfil (dict, p. ej. leído de JSON):
+
+    {
+        "escala": 1.0,                       multiplica todas las latencias
+        "latencias": {                       segundos; número o distribución
+            "arranque": 2.0,
+            "abrir": {"dist": "lognormal", "media": 1.5, "sigma": 0.4},
+            "conexion": {"dist": "uniforme", "min": 1, "max": 8},
+            "calculo": {"dist": "normal", "media": 3, "desvio": 1},
+            "guardar": 0.8,
+            "cerrar": 0.1
+        },
+        "conexiones": 3,
+        "tablas_dinamicas": 0,
+        "fallos": {                          probabilidad por llamada
+            "arranque": 0.0, "abrir": 0.01, "refresh": 0.02,
+            "calculo": 0.0, "guardar": 0.0
+        },
+        "proporcion_permanentes": 0.2        parte de los fallos que no se arreglan reintentando
+    }
+"""
+
+import os
+import math
+import time
+import random
+import itertools
+import threading
+from infrastructure.excel_backend import ExcelBackend, FakeComError
+
+XL_CALCULATION_DONE = 0
+XL_CALCULATING = 1
+
+# HRESULT que se usan para los fallos simulados (ver retry_policy)
+RPC_E_SERVERCALL_RETRYLATER = 0x8001010A
+CO_E_SERVER_EXEC_FAILURE = 0x80080005
+FILE_NOT_FOUND = 0x80070002
+INVALID_DATA = 0x8007000D
+
+PHASES = ("arranque", "abrir", "conexion", "calculo", "guardar", "cerrar")
+
+
+class LatencyDistribution:
+    """Una latencia en segundos: fija, uniforme, normal o lognormal (nunca negativa)."""
+
+    def __init__(self, dist="fija", media=0.0, desvio=0.0, sigma=0.0, minimo=0.0, maximo=0.0):
+        self.dist = dist
+        self.media = media
+        self.desvio = desvio
+        self.sigma = sigma
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @classmethod
+    def from_value(cls, value):
+        if value is None:
+            return cls()
+        if isinstance(value, (int, float)):
+            return cls(media=float(value))
+        return cls(
+            dist=value.get("dist", "fija"),
+            media=float(value.get("media", 0.0)),
+            desvio=float(value.get("desvio", 0.0)),
+            sigma=float(value.get("sigma", 0.0)),
+            minimo=float(value.get("min", 0.0)),
+            maximo=float(value.get("max", 0.0)),
+        )
+
+    def sample(self, rng):
+        if self.dist == "uniforme":
+            return rng.uniform(self.minimo, self.maximo)
+        if self.dist == "normal":
+            return max(0.0, rng.gauss(self.media, self.desvio))
+        if self.dist == "lognormal":
+            if self.media <= 0:
+                return 0.0
+            # media es la media de la distribución, no la del logaritmo
+            mu = math.log(self.media) - self.sigma ** 2 / 2
+            return rng.lognormvariate(mu, self.sigma)
+        return self.media
+
+
+class FakeExcelProfile:
+    def __init__(self, latencies=None, connections=3, pivots=0, failures=None, permanent_share=0.2, scale=1.0):
+        self.latencies = {phase: (latencies or {}).get(phase, LatencyDistribution()) for phase in PHASES}
+        self.connections = connections
+        self.pivots = pivots
+        self.failures = dict(failures or {})
+        self.permanent_share = permanent_share
+        self.scale = scale
+
+    @classmethod
+    def from_dict(cls, data):
+        data = data or {}
+        return cls(
+            latencies={k: LatencyDistribution.from_value(v) for k, v in (data.get("latencias") or {}).items()},
+            connections=int(data.get("conexiones", 3)),
+            pivots=int(data.get("tablas_dinamicas", 0)),
+            failures={k: float(v) for k, v in (data.get("fallos") or {}).items()},
+            permanent_share=float(data.get("proporcion_permanentes", 0.2)),
+            scale=float(data.get("escala", 1.0)),
+        )
+
+
+class _Simulation:
+    """Estado compartido por todos los objetos de un backend: azar, latencias, fallos y contadores."""
+
+    def __init__(self, profile, seed=None, sleep=time.sleep):
+        self.profile = profile
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {
+            "instancias": 0, "libros_abiertos": 0, "refresh": 0, "guardados": 0,
+            "fallos_inyectados": 0, "segundos_simulados": 0.0,
+        }
+
+    def latency(self, phase):
+        with self._lock:
+            seconds = self.profile.latencies[phase].sample(self._rng) * self.profile.scale
+            self.stats["segundos_simulados"] += seconds
+        return seconds
+
+    def wait(self, phase):
+        seconds = self.latency(phase)
+        if seconds > 0:
+            self.sleep(seconds)
+
+    def maybe_fail(self, phase, what):
+        probability = self.profile.failures.get(phase, 0.0)
+        if probability <= 0:
+            return
+        with self._lock:
+            failed = self._rng.random() < probability
+            permanent = failed and self._rng.random() < self.profile.permanent_share
+            if failed:
+                self.stats["fallos_inyectados"] += 1
+        if not failed:
+            return
+        if permanent:
+            raise FakeComError(INVALID_DATA, f"{what}: el archivo está dañado (simulado)", None, None)
+        code = CO_E_SERVER_EXEC_FAILURE if phase == "arranque" else RPC_E_SERVERCALL_RETRYLATER
+        raise FakeComError(code, f"{what}: Excel está ocupado (simulado)", None, None)
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+# ==========================================================
+# Objetos con la forma del modelo COM de Excel
+# ==========================================================
+
+class _FakeOLEDBConnection:
+    def __init__(self):
+        self.BackgroundQuery = True
+        self.Refreshing = False
+
+
+class FakeWorkbookConnection:
+    Type = 1 # OLEDB (Power Query)
+
+    def __init__(self, sim, name):
+        self._sim = sim
+        self.Name = name
+        self.OLEDBConnection = _FakeOLEDBConnection()
+
+    def Refresh(self):
+        self.OLEDBConnection.Refreshing = True
+        try:
+            self._sim.wait("conexion")
+            self._sim.maybe_fail("refresh", f"Conexión '{self.Name}'")
+        finally:
+            self.OLEDBConnection.Refreshing = False
+
+
+class _FakeCollection:
+    """Colección COM: se recorre, tiene Count y se indexa con coll(nombre) o coll(1..n)."""
+
+    def __init__(self, items):
+        self._items = list(items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def Count(self):
+        return len(self._items)
+
+    def __call__(self, key):
+        if isinstance(key, int):
+            return self._items[key - 1]
+        for item in self._items:
+            if getattr(item, "Name", None) == key:
+                return item
+        raise FakeComError(INVALID_DATA, f"No existe el elemento '{key}'", None, None)
+
+
+class FakePivotCache:
+    SourceType = 1 # xlDatabase
+
+    def __init__(self, sim):
+        self._sim = sim
+
+    def Refresh(self):
+        self._sim.wait("conexion")
+
+
+class FakeWorkbook:
+    def __init__(self, app, path):
+        self._app = app
+        self._sim = app._sim
+        self.FullName = path
+        self.Name = os.path.basename(path)
+        self.Connections = _FakeCollection(
+            FakeWorkbookConnection(self._sim, f"Consulta - {n + 1}") for n in range(self._sim.profile.connections)
+        )
+        self._pivots = _FakeCollection(FakePivotCache(self._sim) for _ in range(self._sim.profile.pivots))
+        self.Worksheets = _FakeCollection([])
+        self.closed = False
+
+    def PivotCaches(self, index=None):
+        return self._pivots if index is None else self._pivots(index)
+
+    def RefreshAll(self):
+        # Las conexiones con BackgroundQuery=False se refrescan dentro de la llamada (el gateway las pone así)
+        for conn in self.Connections:
+            conn.Refresh()
+        self._sim.count("refresh")
+        # El recálculo sigue después: CalculateState queda "calculando" un rato
+        self._app._calculating_until = time.monotonic() + self._sim.latency("calculo")
+
+    def Save(self):
+        self._sim.wait("guardar")
+        self._sim.maybe_fail("guardar", f"Guardar {self.Name}")
+        os.utime(self.FullName)
+        self._sim.count("guardados")
+
+    def Close(self, SaveChanges=None):
+        if self.closed:
+            return
+        self._sim.wait("cerrar")
+        self.closed = True
+        self._app.Workbooks._remove(self)
+
+
+class FakeWorkbooks(_FakeCollection):
+    def __init__(self, app):
+        super().__init__([])
+        self._app = app
+
+    def Open(self, path):
+        sim = self._app._sim
+        self._app._check_alive()
+        if not os.path.exists(path):
+            raise FakeComError(FILE_NOT_FOUND, f"No se encontró '{path}'", None, None)
+        sim.wait("abrir")
+        sim.maybe_fail("abrir", f"Abrir {os.path.basename(path)}")
+        wb = FakeWorkbook(self._app, path)
+        self._items.append(wb)
+        # Como el Excel real, la memoria no vuelve del todo al cerrar el libro (el pool recicla por memoria)
+        self._app.memory_bytes += self._app.memory_per_workbook
+        sim.count("libros_abiertos")
+        return wb
+
+    def _remove(self, wb):
+        if wb in self._items:
+            self._items.remove(wb)
+
+
+class FakeComExcelApplication:
+    _pids = itertools.count(20000)
+
+    def __init__(self, sim, memory_bytes=150 * 1024 * 1024, memory_per_workbook=20 * 1024 * 1024):
+        self._sim = sim
+        self.pid = next(self._pids)
+        self.Hwnd = self.pid
+        self.Visible = False
+        self.DisplayAlerts = False
+        self.ScreenUpdating = True
+        self.EnableEvents = True
+        self.CutCopyMode = False
+        self.Calculation = -4105
+        self.Workbooks = FakeWorkbooks(self)
+        self.memory_bytes = memory_bytes
+        self.memory_per_workbook = memory_per_workbook
+        self.quit_called = False
+        self._calculating_until = 0.0
+
+    def _check_alive(self):
+        if self.quit_called:
+            raise FakeComError(0x80010108, "La instancia de Excel ya no existe", None, None) # RPC_E_DISCONNECTED
+
+    @property
+    def CalculateState(self):
+        self._check_alive()
+        self._sim.maybe_fail("calculo", "CalculateState")
+        return XL_CALCULATING if time.monotonic() < self._calculating_until else XL_CALCULATION_DONE
+
+    def Quit(self):
+        self.quit_called = True
+
+
+class FakeComExcelBackend(ExcelBackend):
+    """
+    Backend para ExcelPool con el Excel simulado. Cuenta instancias, libros,
+    refresh y guardados, y cuántos segundos de trabajo de Excel se simularon.
+    """
+
+    def __init__(self, profile=None, seed=None, sleep=time.sleep):
+        self._sim = _Simulation(profile or FakeExcelProfile(), seed=seed, sleep=sleep)
+
+    @property
+    def stats(self):
+        return dict(self._sim.stats)
+
+    def create_application(self):
+        self._sim.wait("arranque")
+        self._sim.maybe_fail("arranque", "Iniciar Excel")
+        self._sim.count("instancias")
+        return FakeComExcelApplication(self._sim)
+
+    def reset_application(self, app):
+        app._check_alive()
+        for wb in list(app.Workbooks):
+            wb.Close(SaveChanges=False)
+
+    def quit_application(self, app):
+        app.Quit()
+
+    def get_pid(self, app):
+        return app.pid
+
+    def get_memory_bytes(self, app):
+        return app.memory_bytes
+
+    def is_com_error(self, error):
+        return isinstance(error, FakeComError)
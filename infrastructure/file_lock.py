@@ -0,0 +1,42 @@
+# infrastructure/file_lock.py
+
+import os
+
+ERROR_SHARING_VIOLATION = 32
+ERROR_LOCK_VIOLATION = 33
+
+
+def owner_file_path(path):
+    """Archivo "~$libro.xlsx" que Excel crea mientras alguien tiene el libro abierto."""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, "~$" + name)
+
+
+def is_file_locked(path):
+    """
+    Indica si otro proceso tiene el archivo abierto para escritura.
+    No modifica el archivo: en Windows se abre solo en lectura y sin permitir
+    escritura compartida, lo que falla si alguien (p. ej. Excel) lo tiene abierto.
+    """
+    try:
+        import win32file
+        import pywintypes
+    except ImportError:
+        # Fuera de Windows solo podemos mirar el archivo de bloqueo de Excel
+        return os.path.exists(owner_file_path(path))
+
+    try:
+        handle = win32file.CreateFile(
+            path,
+            win32file.GENERIC_READ,
+            win32file.FILE_SHARE_READ,
+            None,
+            win32file.OPEN_EXISTING,
+            win32file.FILE_ATTRIBUTE_NORMAL,
+            None,
+        )
+    except pywintypes.error as e:
+        # Otros errores (no existe, sin permisos...) los reportará Excel al abrirlo
+        return e.winerror in (ERROR_SHARING_VIOLATION, ERROR_LOCK_VIOLATION)
+    handle.Close()
+    return False
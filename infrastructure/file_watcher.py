@@ -0,0 +1,131 @@
+# infrastructure/file_watcher.py
+
+import os
+import threading
+
+
+class DirectoryWatcher:
+    """
+    Avisa (callback(carpeta)) cuando cambia algo dentro de las carpetas vigiladas.
+    En Windows usa FindFirstChangeNotification; en otros sistemas, o si falla,
+    compara el contenido de la carpeta cada `poll_interval` segundos.
+    """
+
+    def __init__(self, logger, callback, poll_interval=1.0):
+        self.logger = logger
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self._dirs = set()
+        self._lock = threading.Lock()
+        self._changed = threading.Event() # El conjunto de carpetas cambió
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def watch(self, directory):
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory in self._dirs:
+                return
+            self._dirs.add(directory)
+        self._changed.set()
+
+    def unwatch(self, directory):
+        with self._lock:
+            self._dirs.discard(os.path.abspath(directory))
+        self._changed.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="pivoty-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        try:
+            import win32file  # noqa: F401
+            import win32event  # noqa: F401
+            self._run_win32()
+        except ImportError:
+            self._run_polling()
+        except Exception as e:
+            self.logger.warning(f"Vigilancia de carpetas por notificación falló ({e}), se usará sondeo.")
+            self._run_polling()
+
+    # --------------------------
+    # Notificaciones de Windows
+    # --------------------------
+    def _run_win32(self):
+        import win32file
+        import win32event
+        import win32con
+
+        flags = win32con.FILE_NOTIFY_CHANGE_FILE_NAME | win32con.FILE_NOTIFY_CHANGE_LAST_WRITE | win32con.FILE_NOTIFY_CHANGE_SIZE
+        handles = {}
+        try:
+            while not self._stop_event.is_set():
+                if self._changed.is_set():
+                    self._changed.clear()
+                    with self._lock:
+                        wanted = set(self._dirs)
+                    for directory in set(handles) - wanted:
+                        win32file.FindCloseChangeNotification(handles.pop(directory))
+                    for directory in wanted - set(handles):
+                        try:
+                            handles[directory] = win32file.FindFirstChangeNotification(directory, False, flags)
+                        except Exception as e:
+                            self.logger.warning(f"No se puede vigilar {directory}: {e}")
+
+                if not handles:
+                    self._changed.wait(self.poll_interval)
+                    continue
+
+                dirs = list(handles)
+                # WaitForMultipleObjects admite como máximo 64 handles
+                rc = win32event.WaitForMultipleObjects([handles[d] for d in dirs[:64]], False, 500)
+                if win32event.WAIT_OBJECT_0 <= rc < win32event.WAIT_OBJECT_0 + len(dirs[:64]):
+                    directory = dirs[rc - win32event.WAIT_OBJECT_0]
+                    win32file.FindNextChangeNotification(handles[directory])
+                    self._notify(directory)
+        finally:
+            for handle in handles.values():
+                try:
+                    win32file.FindCloseChangeNotification(handle)
+                except Exception:
+                    pass
+
+    # --------------------------
+    # Sondeo portable
+    # --------------------------
+    def _snapshot(self, directory):
+        try:
+            return {e.name: (e.stat().st_mtime, e.stat().st_size) for e in os.scandir(directory)}
+        except OSError:
+            return None
+
+    def _run_polling(self):
+        snapshots = {}
+        while not self._stop_event.is_set():
+            with self._lock:
+                dirs = set(self._dirs)
+            for directory in set(snapshots) - dirs:
+                snapshots.pop(directory)
+            for directory in dirs:
+                current = self._snapshot(directory)
+                if directory in snapshots and snapshots[directory] != current:
+                    self._notify(directory)
+                snapshots[directory] = current
+            self._stop_event.wait(self.poll_interval)
+
+    def _notify(self, directory):
+        try:
+            self.callback(directory)
+        except Exception as e:
+            self.logger.warning(f"Error procesando cambio en {directory}: {e}")
@@ -0,0 +1,188 @@
+# infrastructure/fingerprint_cache.py
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+FINGERPRINT_FILE = "config/fingerprints.json"
+
+
+class AdoWatermarkRunner:
+    """Ejecuta consultas "watermark" (p. ej. SELECT MAX(fecha) ...) vía ADODB."""
+
+    def run(self, connection_string, sql):
+        import pythoncom
+        import win32com.client as win32
+        pythoncom.CoInitialize()
+        try:
+            conn = win32.Dispatch("ADODB.Connection")
+            conn.Open(connection_string)
+            try:
+                rs = conn.Execute(sql)[0]
+                value = None if rs.EOF else rs.Fields(0).Value
+                rs.Close()
+            finally:
+                conn.Close()
+            return str(value)
+        finally:
+            pythoncom.CoUninitialize()
+
+
+class FingerprintCache:
+    """
+    Huellas de las fuentes de cada libro, guardadas por ruta del libro.
+
+    Un job puede declarar en excels.json:
+        "fuentes": ["C:/datos/ventas.csv", ...]        -> mtime, tamaño y sha256
+        "watermarks": [{"nombre": "ventas", "conexion": "...", "sql": "SELECT MAX(...)"}]
+
+    Si nada cambió desde el último refresh exitoso (y el libro tampoco fue
+    modificado), el refresh se puede omitir.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, logger, path=None, watermark_runner=None):
+        self.logger = logger
+        self.path = path or FINGERPRINT_FILE
+        self.watermark_runner = watermark_runner or AdoWatermarkRunner()
+        self._lock = threading.Lock()
+        self._mtime = self._file_mtime()
+        self._data = self._load()
+
+    # --------------------------
+    # Persistencia
+    # --------------------------
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except Exception as e:
+            self.logger.warning(f"No se pudo leer la caché de huellas ({e}), se empieza de cero.")
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._mtime = self._file_mtime()
+
+    def _file_mtime(self):
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def reload_if_changed(self):
+        """Si otro proceso cambió el archivo (p. ej. --invalidate-cache), se vuelve a leer."""
+        with self._lock:
+            mtime = self._file_mtime()
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            self._data = self._load()
+            return True
+
+    @staticmethod
+    def _key(workbook_path):
+        return os.path.normcase(os.path.abspath(workbook_path))
+
+    @staticmethod
+    def is_tracked(job):
+        return bool(job.get("fuentes") or job.get("watermarks"))
+
+    # --------------------------
+    # Calcular la huella actual
+    # --------------------------
+    def compute(self, job):
+        previous = self._data.get(self._key(job["path"]), {})
+        fuentes = {}
+        for source in job.get("fuentes") or []:
+            fuentes[source] = self._file_fingerprint(source, previous.get("fuentes", {}).get(source))
+
+        watermarks = {}
+        for wm in job.get("watermarks") or []:
+            name = wm.get("nombre") or wm.get("sql")
+            try:
+                watermarks[name] = self.watermark_runner.run(wm["conexion"], wm["sql"])
+            except Exception as e:
+                # Si no podemos consultar la marca de agua, asumimos que cambió
+                self.logger.warning(f"No se pudo consultar la marca de agua '{name}': {e}")
+                watermarks[name] = None
+
+        return {"fuentes": fuentes, "watermarks": watermarks}
+
+    def _file_fingerprint(self, path, previous=None):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        # Si mtime y tamaño no cambiaron reutilizamos el hash anterior y no leemos el archivo
+        if previous and previous.get("mtime") == st.st_mtime and previous.get("size") == st.st_size:
+            return previous
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return {"mtime": st.st_mtime, "size": st.st_size, "sha256": sha.hexdigest()}
+
+    @staticmethod
+    def _workbook_stat(path):
+        try:
+            st = os.stat(path)
+            return {"mtime": st.st_mtime, "size": st.st_size}
+        except OSError:
+            return None
+
+    # --------------------------
+    # Comparar contra la última corrida
+    # --------------------------
+    def check(self, job):
+        """
+        Devuelve (sin_cambios, huella_actual, ultima_actualizacion).
+        Fuentes que faltan o marcas de agua que fallan cuentan como cambio.
+        """
+        current = self.compute(job)
+        previous = self._data.get(self._key(job["path"]))
+        if not previous:
+            return False, current, None
+
+        same_sources = current["fuentes"] == previous.get("fuentes") and None not in current["fuentes"].values()
+        same_watermarks = current["watermarks"] == previous.get("watermarks") and None not in current["watermarks"].values()
+        same_workbook = self._workbook_stat(job["path"]) == previous.get("libro")
+
+        refreshed_at = previous.get("actualizado")
+        max_hours = job.get("max_horas_sin_refresh")
+        if max_hours and refreshed_at:
+            age_hours = (datetime.now() - datetime.fromisoformat(refreshed_at)).total_seconds() / 3600
+            if age_hours >= float(max_hours):
+                return False, current, refreshed_at
+
+        return same_sources and same_watermarks and same_workbook, current, refreshed_at
+
+    def update(self, workbook_path, fingerprint):
+        """Guarda la huella tras un refresh exitoso (junto con el estado del libro ya guardado)."""
+        with self._lock:
+            entry = dict(fingerprint)
+            entry["libro"] = self._workbook_stat(workbook_path)
+            entry["actualizado"] = datetime.now().isoformat(timespec="seconds")
+            self._data[self._key(workbook_path)] = entry
+            self._save()
+
+    def invalidate(self, workbook_path=None):
+        """Borra la huella de un libro (o de todos). Devuelve cuántas se borraron."""
+        with self._lock:
+            if workbook_path is None:
+                count = len(self._data)
+                self._data = {}
+            else:
+                count = 1 if self._data.pop(self._key(workbook_path), None) is not None else 0
+            self._save()
+        return count
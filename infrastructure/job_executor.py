@@ -0,0 +1,175 @@
+# infrastructure/job_executor.py
+
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+OVERLAP_JOIN = "unir"
+OVERLAP_DROP = "descartar"
+
+
+class _Run:
+    def __init__(self, number, files, times=1):
+        self.number = number
+        self.files = list(files)
+        self.times = times # Veces seguidas que se ejecuta (recuperar todas las corridas perdidas)
+        self.queued_at = datetime.now()
+        self.started_at = None
+        self.joined = 0 # Disparos que se sumaron a esta corrida en vez de lanzar otra
+
+    @property
+    def state(self):
+        return "en curso" if self.started_at else "en cola"
+
+
+class JobExecutor:
+    """
+    Ejecuta las corridas del scheduler con un número fijo de hilos y una cola
+    acotada, en lugar de un hilo nuevo por disparo.
+
+    - Como mucho `size` corridas a la vez. Si ya hay `queue_size` corridas
+      esperando, un disparo nuevo se rechaza y queda en el log.
+    - Un libro no se actualiza dos veces a la vez. Si un disparo trae un libro
+      que ya está en cola o en curso, según `overlap_policy`:
+        "unir": el disparo se suma a esa corrida (no se repite el refresh)
+        "descartar": el disparo se descarta con un aviso
+      Los demás libros del disparo siguen su curso.
+    - Los hilos son de larga vida; al detener, terminan la corrida que tengan
+      si el proceso sigue vivo. Son daemon: un refresh colgado no impide cerrar
+      la app (drain-and-stop sí espera con join()).
+    """
+
+    def __init__(self, logger, run_fn, size=1, queue_size=8, overlap_policy=OVERLAP_JOIN):
+        self.logger = logger
+        self.run_fn = run_fn # run_fn(files)
+        self.size = max(1, size)
+        self.queue_size = max(0, queue_size)
+        self.overlap_policy = overlap_policy if overlap_policy in (OVERLAP_JOIN, OVERLAP_DROP) else OVERLAP_JOIN
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._in_flight = {} # archivo -> _Run
+        self._threads = []
+        self._runs = 0
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, config, logger, run_fn, default_size=1):
+        return cls(
+            logger,
+            run_fn,
+            size=config.get_int("SCHEDULER_MAX_CONCURRENT_RUNS", default_size),
+            queue_size=config.get_int("SCHEDULER_QUEUE_SIZE", 8),
+            overlap_policy=config.get("SCHEDULER_OVERLAP_POLICY", OVERLAP_JOIN).strip().lower(),
+        )
+
+    # --------------------------
+    # Encolar
+    # --------------------------
+    def submit(self, files, times=1):
+        """
+        Encola una corrida con los libros de `files` que no estén ya en vuelo
+        (ejecutada `times` veces seguidas). Devuelve los encolados.
+        """
+        with self._cond:
+            if self._closed:
+                self.logger.warning(f"Scheduler detenido: no se ejecuta {_names(files)}.")
+                return []
+            fresh = []
+            for f in files:
+                run = self._in_flight.get(f)
+                if run is None:
+                    if f not in fresh:
+                        fresh.append(f)
+                    continue
+                if self.overlap_policy == OVERLAP_JOIN:
+                    run.joined += 1
+                    self.logger.info(f"{os.path.basename(f)} ya está {run.state} (corrida {run.number}): el disparo se une a esa corrida.")
+                else:
+                    self.logger.warning(f"Se descarta el disparo de {os.path.basename(f)}: ya está {run.state} (corrida {run.number}).")
+            if not fresh:
+                return []
+            if len(self._queue) >= self.queue_size and not self._has_idle_thread():
+                self.logger.warning(f"Cola del scheduler llena ({len(self._queue)} corridas esperando): se descarta {_names(fresh)}.")
+                return []
+            self._runs += 1
+            run = _Run(self._runs, fresh, max(1, times))
+            for f in fresh:
+                self._in_flight[f] = run
+            self._queue.append(run)
+            self._ensure_threads()
+            self._cond.notify()
+        self.logger.debug(f"Corrida {run.number} en cola: {_names(fresh)}.")
+        return fresh
+
+    def _has_idle_thread(self):
+        busy = {id(r) for r in self._in_flight.values() if r.started_at}
+        return len(busy) + len(self._queue) < self.size
+
+    def _ensure_threads(self):
+        self._threads = [t for t in self._threads if t.is_alive()] # Se sueltan los hilos que ya terminaron
+        while len(self._threads) < self.size:
+            t = threading.Thread(target=self._worker, name=f"Scheduler-{len(self._threads) + 1}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # --------------------------
+    # Hilos
+    # --------------------------
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return # Detenido y sin trabajo pendiente
+                run = self._queue.popleft()
+                run.started_at = datetime.now()
+            try:
+                for n in range(run.times):
+                    if n and self._closed:
+                        break # Al detener no se siguen repitiendo
+                    if run.times > 1:
+                        self.logger.info(f"Corrida {run.number}: repetición {n + 1} de {run.times}.")
+                    try:
+                        self.run_fn(run.files)
+                    except Exception as e:
+                        self.logger.error(f"FALLO CRÍTICO en la corrida {run.number} ({_names(run.files)}): {e}")
+            finally:
+                # Aunque el hilo muera, sus libros dejan de figurar en vuelo (si no, los disparos se unirían para siempre)
+                with self._cond:
+                    for f in run.files:
+                        if self._in_flight.get(f) is run:
+                            del self._in_flight[f]
+            if run.joined:
+                self.logger.info(f"Corrida {run.number} terminada; cubrió además {run.joined} disparos que llegaron mientras estaba en vuelo.")
+
+    # --------------------------
+    # Estado y cierre
+    # --------------------------
+    def in_flight(self):
+        """{archivo: "en cola" | "en curso"}"""
+        with self._cond:
+            return {f: run.state for f, run in self._in_flight.items()}
+
+    def shutdown(self, cancel_pending=True):
+        """No acepta más corridas; las que están en cola se descartan (o se ejecutan con cancel_pending=False)."""
+        with self._cond:
+            self._closed = True
+            dropped = list(self._queue) if cancel_pending else []
+            if cancel_pending:
+                self._queue.clear()
+                for run in dropped:
+                    for f in run.files:
+                        self._in_flight.pop(f, None)
+            self._cond.notify_all()
+        for run in dropped:
+            self.logger.warning(f"Se descarta la corrida {run.number} en cola al detener el scheduler: {_names(run.files)}.")
+
+    def join(self, timeout=None):
+        for t in list(self._threads):
+            t.join(timeout)
+
+
+def _names(files):
+    return ", ".join(os.path.basename(f) for f in files)
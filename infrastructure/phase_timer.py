@@ -0,0 +1,183 @@
+# infrastructure/phase_timer.py
+
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+
+
+def new_run_id():
+    """Id de corrida: fecha y hora más pid y un sufijo al azar (varias corridas pueden empezar en el mismo segundo)."""
+    return f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+
+
+class _PhaseContext:
+    __slots__ = ("_phases", "_name", "_t0")
+
+    def __init__(self, phases, name):
+        self._phases = phases
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Si una fase se repite (p. ej. varias conexiones), se acumula
+        elapsed = time.perf_counter() - self._t0
+        self._phases[self._name] = self._phases.get(self._name, 0.0) + elapsed
+        return False
+
+
+class AttemptTimer:
+    """Tiempos por fase de un intento de refresh."""
+
+    def __init__(self, job_timer, attempt):
+        self.job_timer = job_timer
+        self.attempt = attempt
+        self.started = datetime.now()
+        self.phases = {}
+
+    def phase(self, name):
+        return _PhaseContext(self.phases, name)
+
+    def finish(self, estado, error=None):
+        record = {
+            "run_id": self.job_timer.recorder.run_id,
+            "archivo": self.job_timer.archivo,
+            "intento": self.attempt,
+            "inicio": self.started.isoformat(timespec="seconds"),
+            "estado": estado,
+            "fases": {k: round(v, 3) for k, v in self.phases.items()},
+        }
+        if error:
+            record["error"] = error
+        self.job_timer.attempts.append(record)
+        self.job_timer.recorder.emit(record)
+        return record
+
+
+class JobTimer:
+    """Agrupa los intentos de un archivo y las fases previas (validar ruta, huellas...)."""
+
+    def __init__(self, recorder, archivo):
+        self.recorder = recorder
+        self.archivo = archivo
+        self.phases = {}
+        self.attempts = []
+
+    def phase(self, name):
+        return _PhaseContext(self.phases, name)
+
+    def attempt(self, number):
+        return AttemptTimer(self, number)
+
+    def summary(self):
+        return {
+            "fases": {k: round(v, 3) for k, v in self.phases.items()},
+            "intentos": self.attempts,
+        }
+
+
+class PhaseRecorder:
+    """
+    Registra la duración de cada fase de cada intento y la envía al log y a un
+    archivo JSON Lines (uno por línea, fácil de procesar).
+
+        job = recorder.job(ruta)
+        att = job.attempt(1)
+        with att.phase("abrir"):
+            ...
+        att.finish("ok")
+    """
+
+    def __init__(self, logger, output_path=None, run_id=None):
+        self.logger = logger
+        self.output_path = output_path
+        self.run_id = run_id or new_run_id()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, logger, run_id=None):
+        if not config.get_bool("TIMING_ENABLED", True):
+            return NULL_RECORDER
+        default_path = os.path.join(config.get("LOG_DIR", "logs"), "timings.jsonl")
+        return cls(logger, config.get("TIMINGS_FILE", default_path), run_id=run_id)
+
+    def job(self, archivo):
+        return JobTimer(self, archivo)
+
+    def emit(self, record):
+        fases = ", ".join(f"{k}={v}s" for k, v in record["fases"].items())
+        self.logger.info(f"Tiempos intento {record['intento']} ({record['estado']}): {fases}")
+        if not self.output_path:
+            return
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+                with open(self.output_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            self.logger.warning(f"No se pudieron guardar los tiempos: {e}")
+
+
+# ==========================================================
+# Versión deshabilitada: objetos compartidos que no hacen nada
+# ==========================================================
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _NullAttempt:
+    attempt = 0
+    phases = {}
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def finish(self, estado, error=None):
+        return None
+
+
+_NULL_ATTEMPT = _NullAttempt()
+
+
+class _NullJob:
+    attempts = []
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def attempt(self, number):
+        return _NULL_ATTEMPT
+
+    def summary(self):
+        return None
+
+
+_NULL_JOB = _NullJob()
+
+
+class _NullRecorder:
+    run_id = None
+
+    def job(self, archivo):
+        return _NULL_JOB
+
+    def emit(self, record):
+        pass
+
+
+NULL_RECORDER = _NullRecorder()
@@ -0,0 +1,201 @@
+# infrastructure/process_control.py
+
+import os
+import signal
+
+
+class ProcessControl:
+    """
+    Operaciones sobre procesos del sistema que usa el supervisor de Excel.
+    Hay una versión para Windows y otra POSIX (/proc), así el supervisor se
+    puede probar en Linux con procesos hijos cualquiera.
+    """
+
+    def exists(self, pid):
+        raise NotImplementedError
+
+    def name(self, pid):
+        return None
+
+    def create_time(self, pid):
+        """Identifica al proceso junto con el PID (los PID se reutilizan)."""
+        return None
+
+    def memory_bytes(self, pid):
+        return None
+
+    def cpu_seconds(self, pid):
+        return None
+
+    def is_responding(self, pid):
+        return True
+
+    def kill(self, pid):
+        raise NotImplementedError
+
+
+class Win32ProcessControl(ProcessControl):
+    STILL_ACTIVE = 259
+    SMTO_ABORTIFHUNG = 0x0002
+    RESPONSE_TIMEOUT_MS = 5000
+
+    def _open(self, pid, access=None):
+        import win32api
+        import win32con
+        if access is None:
+            access = win32con.PROCESS_QUERY_INFORMATION | win32con.PROCESS_VM_READ
+        return win32api.OpenProcess(access, False, pid)
+
+    def exists(self, pid):
+        import win32api
+        import win32process
+        try:
+            handle = self._open(pid)
+        except Exception:
+            return False
+        try:
+            return win32process.GetExitCodeProcess(handle) == self.STILL_ACTIVE
+        finally:
+            win32api.CloseHandle(handle)
+
+    def name(self, pid):
+        import win32api
+        import win32process
+        try:
+            handle = self._open(pid)
+            try:
+                return os.path.basename(win32process.GetModuleFileNameEx(handle, 0))
+            finally:
+                win32api.CloseHandle(handle)
+        except Exception:
+            return None
+
+    def _times(self, pid):
+        import win32api
+        import win32process
+        handle = self._open(pid)
+        try:
+            return win32process.GetProcessTimes(handle)
+        finally:
+            win32api.CloseHandle(handle)
+
+    def create_time(self, pid):
+        try:
+            return round(self._times(pid)["CreationTime"].timestamp(), 3)
+        except Exception:
+            return None
+
+    def cpu_seconds(self, pid):
+        try:
+            times = self._times(pid)
+            return (times["KernelTime"] + times["UserTime"]) / 10_000_000 # Unidades de 100 ns
+        except Exception:
+            return None
+
+    def memory_bytes(self, pid):
+        import win32api
+        import win32process
+        try:
+            handle = self._open(pid)
+            try:
+                return win32process.GetProcessMemoryInfo(handle)["WorkingSetSize"]
+            finally:
+                win32api.CloseHandle(handle)
+        except Exception:
+            return None
+
+    def is_responding(self, pid):
+        """Manda WM_NULL a las ventanas del proceso; si ninguna contesta, está colgado."""
+        import win32gui
+        import win32con
+        import win32process
+
+        windows = []
+
+        def collect(hwnd, _):
+            if win32process.GetWindowThreadProcessId(hwnd)[1] == pid:
+                windows.append(hwnd)
+            return True
+
+        try:
+            win32gui.EnumWindows(collect, None)
+        except Exception:
+            return True
+        if not windows:
+            return True # Sin ventanas no podemos saberlo
+        for hwnd in windows:
+            try:
+                win32gui.SendMessageTimeout(hwnd, win32con.WM_NULL, 0, 0, self.SMTO_ABORTIFHUNG, self.RESPONSE_TIMEOUT_MS)
+                return True
+            except Exception:
+                continue
+        return False
+
+    def kill(self, pid):
+        import win32api
+        import win32con
+        handle = self._open(pid, win32con.PROCESS_TERMINATE)
+        try:
+            win32api.TerminateProcess(handle, 1)
+        finally:
+            win32api.CloseHandle(handle)
+
+
+class PosixProcessControl(ProcessControl):
+    """Versión basada en /proc (Linux)."""
+
+    def _stat(self, pid):
+        with open(f"/proc/{pid}/stat", "r") as f:
+            data = f.read()
+        # El nombre va entre paréntesis y puede tener espacios: se corta en el último ")"
+        return data[data.rindex(")") + 2:].split()
+
+    def exists(self, pid):
+        try:
+            return self._stat(pid)[0] not in ("Z", "X") # Un zombi ya terminó
+        except (OSError, ValueError, IndexError):
+            return False
+
+    def name(self, pid):
+        try:
+            with open(f"/proc/{pid}/comm", "r") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def create_time(self, pid):
+        try:
+            # starttime (campo 22) en ticks desde el arranque del equipo
+            return int(self._stat(pid)[19]) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def cpu_seconds(self, pid):
+        try:
+            fields = self._stat(pid)
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def memory_bytes(self, pid):
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def is_responding(self, pid):
+        # Un proceso detenido (SIGSTOP) hace de "colgado" en las pruebas
+        try:
+            return self._stat(pid)[0] not in ("T", "t")
+        except (OSError, ValueError, IndexError):
+            return True
+
+    def kill(self, pid):
+        os.kill(pid, signal.SIGKILL)
+
+
+def default_process_control():
+    if os.name == "nt":
+        return Win32ProcessControl()
+    return PosixProcessControl()
@@ -0,0 +1,275 @@
+# infrastructure/refresh_waiter.py
+
+import time
+from domain.exceptions import ExcelGatewayError
+
+XL_CALCULATION_DONE = 0
+
+
+class RefreshEventSource:
+    """
+    Fuente de eventos de refresco. subscribe() devuelve False si los eventos
+    no están disponibles; en ese caso el waiter vuelve al sondeo.
+    """
+
+    def subscribe(self, on_start, on_end, on_calculated):
+        return False
+
+    def pump(self, timeout):
+        """Entrega los eventos pendientes esperando como máximo `timeout` segundos."""
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+
+# ==========================================================
+# Eventos reales de Excel (QueryTable.AfterRefresh, Application.AfterCalculate)
+# ==========================================================
+
+class _QueryTableEvents:
+    def OnBeforeRefresh(self, Cancel):
+        self.pivoty_source._emit("start", self.pivoty_name)
+
+    def OnAfterRefresh(self, Success):
+        self.pivoty_source._emit("end", self.pivoty_name, bool(Success))
+
+
+class _ApplicationEvents:
+    def OnAfterCalculate(self):
+        self.pivoty_source._emit("calculated")
+
+
+class ComRefreshEventSource(RefreshEventSource):
+    """Se suscribe a los QueryTable del libro y al AfterCalculate de la aplicación."""
+
+    def __init__(self, excel_app, workbook, logger):
+        self.excel_app = excel_app
+        self.workbook = workbook
+        self.logger = logger
+        self._handlers = []
+        self._callbacks = None
+        self._wake = None
+
+    def subscribe(self, on_start, on_end, on_calculated):
+        try:
+            import win32event
+            from win32com.client import WithEvents
+        except ImportError:
+            return False
+
+        self._callbacks = {"start": on_start, "end": on_end, "calculated": on_calculated}
+        self._wake = win32event.CreateEvent(None, 0, 0, None)
+
+        for name, query_table in self._query_tables():
+            try:
+                handler = WithEvents(query_table, _QueryTableEvents)
+                handler.pivoty_source = self
+                handler.pivoty_name = name
+                self._handlers.append(handler)
+            except Exception as e:
+                self.logger.debug(f"No se pudo escuchar eventos de '{name}': {e}")
+
+        try:
+            # AfterCalculate existe desde Excel 2010
+            handler = WithEvents(self.excel_app, _ApplicationEvents)
+            handler.pivoty_source = self
+            self._handlers.append(handler)
+        except Exception as e:
+            self.logger.debug(f"AfterCalculate no disponible: {e}")
+
+        return bool(self._handlers)
+
+    def _query_tables(self):
+        for ws in self.workbook.Worksheets:
+            for lo in ws.ListObjects:
+                try:
+                    query_table = lo.QueryTable
+                except Exception:
+                    continue # Tabla normal, sin consulta
+                yield self._connection_name(query_table, lo.Name), query_table
+            for query_table in ws.QueryTables:
+                yield self._connection_name(query_table, query_table.Name), query_table
+
+    @staticmethod
+    def _connection_name(query_table, default):
+        try:
+            return query_table.WorkbookConnection.Name
+        except Exception:
+            return default
+
+    def _emit(self, kind, *args):
+        self._callbacks[kind](*args)
+
+    def pump(self, timeout):
+        import pythoncom
+        import win32event
+        win32event.MsgWaitForMultipleObjects([self._wake], False, int(timeout * 1000), win32event.QS_ALLINPUT)
+        pythoncom.PumpWaitingMessages()
+
+    def close(self):
+        for handler in self._handlers:
+            try:
+                handler.close()
+            except Exception:
+                pass
+        self._handlers = []
+
+
+# ==========================================================
+# Fuente falsa para pruebas en Linux
+# ==========================================================
+
+class FakeRefreshEventSource(RefreshEventSource):
+    """
+    Reproduce un guion de eventos contados desde la suscripción:
+    (segundos, "start", nombre), (segundos, "end", nombre, ok) o (segundos, "calculated").
+    """
+
+    def __init__(self, script, available=True):
+        self.script = sorted(script, key=lambda e: e[0])
+        self.available = available
+        self._callbacks = None
+        self._t0 = None
+
+    def subscribe(self, on_start, on_end, on_calculated):
+        if not self.available:
+            return False
+        self._callbacks = {"start": on_start, "end": on_end, "calculated": on_calculated}
+        self._t0 = time.monotonic()
+        return True
+
+    def pump(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            elapsed = time.monotonic() - self._t0
+            due = [e for e in self.script if e[0] <= elapsed]
+            if due:
+                self.script = self.script[len(due):]
+                for _, kind, *args in due:
+                    self._callbacks[kind](*args)
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            next_due = self.script[0][0] - elapsed if self.script else remaining
+            time.sleep(max(0.0, min(remaining, next_due)))
+
+
+# ==========================================================
+# Motor de espera
+# ==========================================================
+
+class RefreshCompletionWaiter:
+    """
+    Espera a que Excel termine de refrescar. Usa eventos cuando hay, y si no,
+    sondea CalculateState con espera adaptativa (empieza en `poll_min` y crece
+    hasta `poll_max`). Registra el inicio y fin de cada conexión.
+    """
+
+    def __init__(self, logger, excel_app, workbook=None, event_source=None, timeout=7200,
+                 poll_min=0.05, poll_max=2.0, max_read_failures=3):
+        self.logger = logger
+        self.excel_app = excel_app
+        self.workbook = workbook
+        self.event_source = event_source or RefreshEventSource()
+        self.timeout = timeout
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.max_read_failures = max_read_failures
+        self.using_events = False
+        self._running = {}
+        self._connections = []
+        self._read_failures = 0
+
+    # --------------------------
+    # Suscribirse antes de RefreshAll()
+    # --------------------------
+    def start(self):
+        self.using_events = self.event_source.subscribe(self._on_start, self._on_end, self._on_calculated)
+        if not self.using_events:
+            self.logger.info("Eventos de refresco no disponibles, se usará sondeo adaptativo.")
+
+    def _on_start(self, name):
+        self._running[name] = time.time()
+        self.logger.info(f"Conexión '{name}' empezó a actualizarse.")
+
+    def _on_end(self, name, success=True):
+        started = self._running.pop(name, None)
+        ended = time.time()
+        seconds = round(ended - started, 2) if started else None
+        self._connections.append({"nombre": name, "ok": success, "segundos": seconds})
+        if success:
+            self.logger.info(f"Conexión '{name}' terminó en {seconds}s.")
+        else:
+            self.logger.warning(f"Conexión '{name}' terminó con errores ({seconds}s).")
+
+    def _on_calculated(self):
+        pass # Solo despierta a pump(); el estado se confirma con CalculateState
+
+    # --------------------------
+    # Esperar a que todo termine
+    # --------------------------
+    def wait(self):
+        self.logger.info("Esperando a que Excel termine el cálculo...")
+        start_time = time.time()
+        delay = self.poll_min
+        try:
+            while True:
+                if not self.using_events:
+                    self._poll_connections()
+                if not self._running and self._calculation_done():
+                    break
+                if time.time() - start_time > self.timeout:
+                    self.logger.warning("Timeout esperando a que Excel termine el cálculo.")
+                    break
+                if self.using_events:
+                    self.event_source.pump(self.poll_max)
+                else:
+                    time.sleep(delay)
+                    delay = min(delay * 1.5, self.poll_max)
+        finally:
+            self.event_source.close()
+        return self._connections
+
+    def _calculation_done(self):
+        state = self._read(lambda: self.excel_app.CalculateState, "CalculateState")
+        return state == XL_CALCULATION_DONE
+
+    def _poll_connections(self):
+        if self.workbook is None:
+            return
+        connections = self._read(lambda: list(self.workbook.Connections), "Connections")
+        for conn in connections or []:
+            refreshing = self._is_refreshing(conn)
+            if refreshing is None:
+                continue
+            name = conn.Name
+            if refreshing and name not in self._running:
+                self._on_start(name)
+            elif not refreshing and name in self._running:
+                self._on_end(name)
+
+    @staticmethod
+    def _is_refreshing(conn):
+        try:
+            if conn.Type == 1:
+                return bool(conn.OLEDBConnection.Refreshing)
+            if conn.Type == 2:
+                return bool(conn.ODBCConnection.Refreshing)
+        except Exception:
+            pass
+        return None
+
+    def _read(self, getter, what):
+        """Lee una propiedad de Excel. Fallos repetidos ya no cuentan como 'terminado'."""
+        try:
+            value = getter()
+            self._read_failures = 0
+            return value
+        except Exception as e:
+            self._read_failures += 1
+            if self._read_failures >= self.max_read_failures:
+                raise ExcelGatewayError(f"No se pudo leer {what} de Excel tras {self._read_failures} intentos: {e}")
+            self.logger.warning(f"No se pudo leer {what} ({e}), reintentando...")
+            return None
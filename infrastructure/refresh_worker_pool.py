@@ -0,0 +1,250 @@
+# infrastructure/refresh_worker_pool.py
+
+import time
+import logging
+import threading
+import traceback
+import multiprocessing
+from domain.exceptions import WorkerProcessError
+
+LOGGER_NAME = "BotExcelLogger"
+
+
+# ==========================================================
+# Lado del proceso hijo
+# ==========================================================
+
+class _PipeLogHandler(logging.Handler):
+    """En el hijo, los mensajes del log viajan al padre (un solo archivo de log, lo escribe el padre)."""
+
+    def __init__(self, send):
+        super().__init__()
+        self._send = send
+
+    def emit(self, record):
+        try:
+            self._send(("log", record.levelno, record.getMessage()))
+        except Exception:
+            pass
+
+
+def _worker_main(conn, target):
+    """Bucle del proceso trabajador: importa una vez y atiende pedidos hasta que el padre cierra."""
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            conn.send(message)
+
+    # Con este handler ya puesto, LoggerService no agrega archivo ni consola en el hijo
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.addHandler(_PipeLogHandler(send))
+    logger.setLevel(logging.DEBUG) # El nivel real lo pone LoggerService en cada corrida
+    logger.propagate = False
+
+    send(("ready",))
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return # El padre se fue
+        if message[0] == "stop":
+            return
+        _, job_id, kwargs = message
+
+        def progress(event, job_id=job_id):
+            send(("progress", job_id, event))
+
+        try:
+            result = target(progress=progress, **kwargs)
+            send(("result", job_id, result))
+        except BaseException as e:
+            send(("error", job_id, f"{type(e).__name__}: {e}", traceback.format_exc()))
+
+
+# ==========================================================
+# Lado del padre
+# ==========================================================
+
+class _Worker:
+    def __init__(self, number, process, conn):
+        self.number = number
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+
+
+class RefreshWorkerPool:
+    """
+    Procesos trabajadores de larga vida para ejecutar los refresh fuera del
+    proceso del scheduler/GUI: un cuelgue o crash de COM mata al trabajador,
+    no a la aplicación.
+
+    - run(**kwargs) llama a `target(progress=..., **kwargs)` en un trabajador libre
+      y devuelve su resultado; los eventos de progreso y el log llegan por el pipe.
+    - Si el trabajador muere o se pasa de `job_timeout`, se mata, se reemplaza y
+      run() lanza WorkerProcessError.
+    - Los trabajadores se reutilizan: Python y pywin32 se importan una sola vez.
+    """
+
+    def __init__(self, logger, target, size=1, job_timeout=4 * 3600, start_timeout=120, on_restart=None):
+        self.logger = logger
+        self.target = target
+        self.size = max(1, size)
+        self.job_timeout = job_timeout
+        self.start_timeout = start_timeout
+        self.on_restart = on_restart # Se llama tras matar un trabajador (p. ej. limpiar sus Excel)
+        # "spawn" también en Linux: un fork con hilos y COM a medias no es seguro
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._count = 0
+        self._next_number = 1
+        self._job_ids = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config, logger, target, on_restart=None):
+        return cls(
+            logger,
+            target,
+            size=config.get_int("REFRESH_WORKER_PROCESSES", 1),
+            job_timeout=config.get_int("REFRESH_WORKER_TIMEOUT_SECONDS", 4 * 3600),
+            on_restart=on_restart,
+        )
+
+    # --------------------------
+    # Ejecutar un pedido
+    # --------------------------
+    def run(self, on_progress=None, timeout=None, **kwargs):
+        worker = self._checkout()
+        with self._cond:
+            self._job_ids += 1
+            job_id = self._job_ids
+        deadline = time.monotonic() + (timeout or self.job_timeout)
+        healthy = False
+        try:
+            worker.conn.send(("run", job_id, kwargs))
+            worker.jobs += 1
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkerProcessError(f"El trabajador {worker.number} superó el tiempo máximo de {timeout or self.job_timeout}s.")
+                if not worker.conn.poll(min(remaining, 1.0)):
+                    if not worker.process.is_alive():
+                        raise WorkerProcessError(f"El trabajador {worker.number} terminó inesperadamente (código {worker.process.exitcode}).")
+                    continue
+                message = worker.conn.recv()
+                kind = message[0]
+                if kind == "log":
+                    self.logger.log(message[1], message[2])
+                elif kind == "progress":
+                    if on_progress:
+                        try:
+                            on_progress(message[2])
+                        except Exception as e:
+                            self.logger.warning(f"Error procesando el progreso: {e}")
+                elif kind == "result":
+                    healthy = True
+                    return message[2]
+                elif kind == "error":
+                    healthy = True # El trabajador sigue vivo, el error fue del refresh
+                    self.logger.debug(message[3])
+                    raise WorkerProcessError(message[2])
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            raise WorkerProcessError(f"El trabajador {worker.number} terminó inesperadamente (código {worker.process.exitcode}).")
+        finally:
+            self._checkin(worker, healthy)
+
+    # --------------------------
+    # Administración de trabajadores
+    # --------------------------
+    def _checkout(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise WorkerProcessError("El pool de trabajadores está cerrado.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._count < self.size:
+                    self._count += 1
+                    number = self._next_number
+                    self._next_number += 1
+                    break
+                self._cond.wait()
+        try:
+            return self._spawn(number)
+        except Exception:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+
+    def _checkin(self, worker, healthy):
+        if not healthy:
+            self._terminate(worker)
+            self.logger.warning(f"Trabajador {worker.number} reiniciado; el próximo pedido abrirá uno nuevo.")
+            if self.on_restart:
+                try:
+                    self.on_restart()
+                except Exception as e:
+                    self.logger.warning(f"Error limpiando tras reiniciar el trabajador: {e}")
+        stop = False
+        with self._cond:
+            if healthy and not self._closed:
+                self._idle.append(worker)
+            else:
+                self._count -= 1
+                stop = healthy
+            self._cond.notify()
+        if stop:
+            self._stop(worker)
+
+    def _spawn(self, number):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.target), name=f"pivoty-worker-{number}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(number, process, parent_conn)
+        try:
+            ready = parent_conn.poll(self.start_timeout) and parent_conn.recv() == ("ready",)
+        except (EOFError, OSError):
+            ready = False
+        if not ready:
+            self._terminate(worker)
+            raise WorkerProcessError(f"El trabajador {number} no arrancó (código {process.exitcode}).")
+        self.logger.info(f"Trabajador {number} listo (PID {process.pid}).")
+        return worker
+
+    def _stop(self, worker):
+        try:
+            worker.conn.send(("stop",))
+        except Exception:
+            pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            self._terminate(worker)
+        worker.conn.close()
+
+    def _terminate(self, worker):
+        try:
+            worker.process.kill()
+            worker.process.join(timeout=5)
+        except Exception:
+            pass
+        try:
+            worker.conn.close()
+        except Exception:
+            pass
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._cond.notify_all()
+        for worker in idle:
+            self._stop(worker)
@@ -0,0 +1,170 @@
+# infrastructure/retry_policy.py
+
+import time
+import random
+import threading
+from domain.exceptions import RefreshJobError, FileLockedError
+
+TRANSIENT = "transitorio"
+PERMANENT = "permanente"
+
+# HRESULT de COM/RPC que suelen resolverse solos (Excel ocupado, servidor caído, etc.)
+TRANSIENT_HRESULTS = {
+    0x80010001, # RPC_E_CALL_REJECTED
+    0x8001010A, # RPC_E_SERVERCALL_RETRYLATER
+    0x80010108, # RPC_E_DISCONNECTED
+    0x800706BA, # RPC_S_SERVER_UNAVAILABLE
+    0x800706BE, # RPC_S_CALL_FAILED
+    0x80080005, # CO_E_SERVER_EXEC_FAILURE
+    0x800AC472, # VBA_E_IGNORE (Excel ocupado)
+}
+
+# HRESULT que no se arreglan reintentando
+PERMANENT_HRESULTS = {
+    0x80070002, # Archivo no encontrado
+    0x80070003, # Ruta no encontrada
+    0x80070005, # Acceso denegado
+    0x8007000D, # Datos no válidos
+    0x80004001, # No implementado
+}
+
+PERMANENT_MESSAGES = (
+    "no se encuentra", "no se encontró", "could not be found", "couldn't find", "cannot find",
+    "dañado", "corrupt", "no se puede leer", "formato", "file format",
+    "credencial", "credential", "contraseña", "password", "login failed", "inicio de sesión",
+    "acceso denegado", "access denied", "permission",
+)
+
+
+def _hresults(error):
+    """HRESULT del error COM y, si viene, el scode de excepinfo (errores propios de Excel)."""
+    args = getattr(error, "args", ())
+    codes = []
+    if args and isinstance(args[0], int):
+        codes.append(args[0] & 0xFFFFFFFF)
+    if len(args) > 2 and isinstance(args[2], tuple) and len(args[2]) > 5 and isinstance(args[2][5], int):
+        codes.append(args[2][5] & 0xFFFFFFFF)
+    return codes
+
+
+def classify_error(error):
+    """Clasifica un error como TRANSIENT (vale la pena reintentar) o PERMANENT."""
+    if isinstance(error, (FileNotFoundError, RefreshJobError)):
+        return PERMANENT
+    if isinstance(error, FileLockedError):
+        return TRANSIENT
+
+    codes = _hresults(error)
+    if any(code in PERMANENT_HRESULTS for code in codes):
+        return PERMANENT
+    if any(code in TRANSIENT_HRESULTS for code in codes):
+        return TRANSIENT
+
+    message = str(error).lower()
+    if any(m in message for m in PERMANENT_MESSAGES):
+        return PERMANENT
+    # Ante la duda reintentamos, como se hacía antes
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """
+    Reintentos con espera exponencial y jitter. Los errores permanentes no se reintentan.
+
+    Se puede ajustar por job en excels.json:
+        "reintentos": {"max": 5, "espera_base": 10, "espera_max": 300, "jitter": true}
+    """
+
+    def __init__(self, max_retries=3, base_delay=15, max_delay=300, jitter=True,
+                 classifier=classify_error, sleep=time.sleep, rng=random.random):
+        self.max_retries = max(1, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.classifier = classifier
+        self.sleep = sleep
+        self.rng = rng
+
+    @classmethod
+    def from_job(cls, job, config):
+        data = (job or {}).get("reintentos") or {}
+        return cls(
+            max_retries=int(data.get("max", config.get_int("MAX_RETRIES", 3))),
+            base_delay=float(data.get("espera_base", config.get_int("RETRY_INTERVAL_SECONDS", 15))),
+            max_delay=float(data.get("espera_max", config.get_int("RETRY_MAX_DELAY_SECONDS", 300))),
+            jitter=bool(data.get("jitter", config.get_bool("RETRY_JITTER", True))),
+        )
+
+    def should_retry(self, attempt, error):
+        if attempt >= self.max_retries:
+            return False
+        return self.classifier(error) == TRANSIENT
+
+    def delay(self, attempt):
+        """Espera antes del intento attempt + 1: base * 2^(attempt-1), con tope y jitter."""
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        if self.jitter:
+            # "Equal jitter": la mitad fija y la otra mitad aleatoria
+            delay = delay / 2 + self.rng() * delay / 2
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Corta los intentos a un libro que falla una y otra vez: tras `failure_threshold`
+    fallos seguidos, no se vuelve a intentar durante `cooldown_seconds`.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown_seconds=1800, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.clock = clock
+        self._state = {} # ruta -> {"fallos", "abierto_hasta"}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            failure_threshold=config.get_int("CIRCUIT_BREAKER_FAILURES", 3),
+            cooldown_seconds=config.get_int("CIRCUIT_BREAKER_COOLDOWN_SECONDS", 1800),
+        )
+
+    def open_until(self, key):
+        """Momento (epoch) hasta el que el circuito está abierto, o None si se puede intentar."""
+        with self._lock:
+            state = self._state.get(key)
+            if not state or not state["abierto_hasta"]:
+                return None
+            if self.clock() >= state["abierto_hasta"]:
+                # Enfriamiento cumplido: se permite un intento de prueba
+                state["abierto_hasta"] = None
+                state["fallos"] = self.failure_threshold - 1
+                return None
+            return state["abierto_hasta"]
+
+    def record_success(self, key):
+        with self._lock:
+            self._state.pop(key, None)
+
+    def record_failure(self, key):
+        """Devuelve True si este fallo abrió el circuito."""
+        if self.failure_threshold <= 0:
+            return False
+        with self._lock:
+            state = self._state.setdefault(key, {"fallos": 0, "abierto_hasta": None})
+            state["fallos"] += 1
+            if state["fallos"] >= self.failure_threshold:
+                state["abierto_hasta"] = self.clock() + self.cooldown_seconds
+                return True
+            return False
+
+
+# Un solo breaker por proceso: así recuerda los fallos entre corridas programadas
+DEFAULT_CIRCUIT_BREAKER = None
+
+
+def get_circuit_breaker(config):
+    global DEFAULT_CIRCUIT_BREAKER
+    if DEFAULT_CIRCUIT_BREAKER is None:
+        DEFAULT_CIRCUIT_BREAKER = CircuitBreaker.from_config(config)
+    return DEFAULT_CIRCUIT_BREAKER
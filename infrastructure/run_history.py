@@ -0,0 +1,351 @@
+# infrastructure/run_history.py
+
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS corridas (
+    run_id      TEXT PRIMARY KEY,
+    inicio      REAL NOT NULL,
+    fin         REAL,
+    archivos    INTEGER,
+    ok          INTEGER,
+    errores     INTEGER
+);
+CREATE TABLE IF NOT EXISTS trabajos (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id        TEXT NOT NULL,
+    archivo       TEXT NOT NULL,
+    inicio        REAL NOT NULL,
+    estado        TEXT NOT NULL,
+    duracion      REAL,
+    refresh_time  REAL,
+    intentos      INTEGER,
+    fallback      INTEGER NOT NULL DEFAULT 0,
+    backup_path   TEXT,
+    tamano_bytes  INTEGER,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trabajos_archivo ON trabajos (archivo, inicio);
+CREATE INDEX IF NOT EXISTS idx_trabajos_inicio ON trabajos (inicio);
+CREATE TABLE IF NOT EXISTS intentos (
+    trabajo_id  INTEGER NOT NULL REFERENCES trabajos (id) ON DELETE CASCADE,
+    archivo     TEXT NOT NULL,
+    intento     INTEGER,
+    estado      TEXT,
+    duracion    REAL,
+    fases       TEXT,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_intentos_trabajo ON intentos (trabajo_id);
+CREATE TABLE IF NOT EXISTS resumen_diario (
+    archivo   TEXT NOT NULL,
+    dia       TEXT NOT NULL,
+    n         INTEGER NOT NULL,
+    ok        INTEGER NOT NULL,
+    p50       REAL,
+    p95       REAL,
+    maximo    REAL,
+    PRIMARY KEY (archivo, dia)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    clave  TEXT PRIMARY KEY,
+    valor  TEXT
+);
+"""
+
+
+class RunHistory:
+    """
+    Historial de corridas en SQLite: una fila por corrida, por archivo y por intento
+    (con los tiempos de cada fase). Permite preguntar cuánto tarda un libro
+    (p50/p95/máximo) y si se está poniendo más lento.
+
+    Retención (compact):
+    - El detalle por intento se borra pasados `detail_days`.
+    - Los trabajos más viejos que `keep_days` se resumen por día (resumen_diario)
+      y se borran; el resumen se conserva para ver tendencias.
+    """
+
+    def __init__(self, path, detail_days=90, keep_days=400, clock=time.time):
+        self.path = path
+        self.detail_days = detail_days
+        self.keep_days = keep_days
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.get_bool("RUN_HISTORY_ENABLED", True):
+            return None
+        return cls(
+            config.get("RUN_HISTORY_DB", os.path.join("config", "run_history.db")),
+            detail_days=config.get_int("RUN_HISTORY_DETAIL_DAYS", 90),
+            keep_days=config.get_int("RUN_HISTORY_RETENTION_DAYS", 400),
+        )
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # timeout alto: varios procesos trabajadores pueden escribir a la vez
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    # --------------------------
+    # Guardar una corrida
+    # --------------------------
+    def record_run(self, run_id, inicio, fin, resultados):
+        """Guarda la corrida con los resultados de execute_refresh (inicio/fin son datetimes)."""
+        t_inicio = inicio.timestamp()
+        ok = sum(1 for r in resultados if r["estado"].startswith("OK"))
+        errores = sum(1 for r in resultados if r["estado"] == "ERROR")
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO corridas (run_id, inicio, fin, archivos, ok, errores) VALUES (?, ?, ?, ?, ?, ?)",
+                        (run_id, t_inicio, fin.timestamp(), len(resultados), ok, errores),
+                    )
+                    for r in resultados:
+                        self._insert_job(conn, run_id, t_inicio, r)
+            finally:
+                conn.close()
+
+    def _insert_job(self, conn, run_id, t_inicio, r):
+        tiempos = r.get("tiempos") or {}
+        tiempos_backup = r.get("tiempos_backup") or {}
+        attempts = [(r["archivo"], a) for a in tiempos.get("intentos", [])]
+        attempts += [(r.get("backup_path") or r["archivo"], a) for a in tiempos_backup.get("intentos", [])]
+
+        cursor = conn.execute(
+            "INSERT INTO trabajos (run_id, archivo, inicio, estado, duracion, refresh_time, intentos, fallback,"
+            " backup_path, tamano_bytes, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, r["archivo"], t_inicio, r["estado"], r.get("duracion"), r.get("refresh_time"),
+                len(attempts) if tiempos else None, 1 if r.get("fallback") else 0, r.get("backup_path"),
+                _file_size(r["archivo"]), r.get("error"),
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO intentos (trabajo_id, archivo, intento, estado, duracion, fases, error) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (cursor.lastrowid, archivo, a.get("intento"), a.get("estado"), round(sum(a.get("fases", {}).values()), 3),
+                 json.dumps(a.get("fases", {})), a.get("error"))
+                for archivo, a in attempts
+            ],
+        )
+
+    # --------------------------
+    # Consultas
+    # --------------------------
+    def stats(self, archivo=None, days=30):
+        """
+        p50/p95/máximo de la duración de los refresh exitosos de cada libro en los
+        últimos `days` días, más la cantidad de corridas, fallos y usos del backup.
+        """
+        since = self.clock() - days * 86400
+        sql = "SELECT archivo, estado, duracion, fallback FROM trabajos WHERE inicio >= ?"
+        params = [since]
+        if archivo:
+            sql += " AND archivo = ?"
+            params.append(archivo)
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+
+        grouped = {}
+        for name, estado, duracion, fallback in rows:
+            g = grouped.setdefault(name, {"archivo": name, "corridas": 0, "errores": 0, "backup": 0, "duraciones": []})
+            g["corridas"] += 1
+            if estado == "ERROR":
+                g["errores"] += 1
+            if fallback:
+                g["backup"] += 1
+            if estado.startswith("OK") and duracion is not None:
+                g["duraciones"].append(duracion)
+
+        result = []
+        for g in grouped.values():
+            durations = g.pop("duraciones")
+            g["p50"] = percentile(durations, 50)
+            g["p95"] = percentile(durations, 95)
+            g["max"] = max(durations) if durations else None
+            result.append(g)
+        return sorted(result, key=lambda g: g["archivo"])
+
+    def durations(self, archivo, limit=50):
+        """Duraciones de los últimos `limit` refresh exitosos (para p95 y planificación)."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT duracion FROM trabajos WHERE archivo = ? AND estado LIKE 'OK%' AND duracion IS NOT NULL"
+                    " ORDER BY inicio DESC LIMIT ?",
+                    (archivo, limit),
+                ).fetchall()
+            finally:
+                conn.close()
+        return [row[0] for row in rows]
+
+    def daily(self, archivo, days=90):
+        """Tendencia por día: [(dia, n, p50, p95, max)], del detalle o del resumen si ya se compactó."""
+        since = self.clock() - days * 86400
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT inicio, duracion FROM trabajos WHERE archivo = ? AND inicio >= ? AND estado LIKE 'OK%'"
+                    " AND duracion IS NOT NULL",
+                    (archivo, since),
+                ).fetchall()
+                summary = conn.execute(
+                    "SELECT dia, n, p50, p95, maximo FROM resumen_diario WHERE archivo = ? AND dia >= ?",
+                    (archivo, _day(since)),
+                ).fetchall()
+            finally:
+                conn.close()
+
+        by_day = {}
+        for inicio, duracion in rows:
+            by_day.setdefault(_day(inicio), []).append(duracion)
+        result = {dia: (n, p50, p95, maximo) for dia, n, p50, p95, maximo in summary}
+        for dia, values in by_day.items():
+            detail = (len(values), percentile(values, 50), percentile(values, 95), max(values))
+            # Un día puede estar en parte resumido y en parte en detalle: se combinan
+            result[dia] = _merge_summary(result[dia], detail) if dia in result else detail
+        return [(dia,) + result[dia] for dia in sorted(result)]
+
+    # --------------------------
+    # Retención
+    # --------------------------
+    def compact(self, force=False):
+        """Aplica la retención. Sin force, como mucho una vez al día. Devuelve los trabajos borrados."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT valor FROM meta WHERE clave = 'ultima_compactacion'").fetchone()
+                if not force and row and now - float(row[0]) < 86400:
+                    return 0
+
+                detail_limit = now - self.detail_days * 86400
+                # Se corta a medianoche: cada día se resume entero, en una sola compactación
+                keep_limit = _midnight(now - self.keep_days * 86400)
+                with conn:
+                    conn.execute(
+                        "DELETE FROM intentos WHERE trabajo_id IN (SELECT id FROM trabajos WHERE inicio < ?)", (detail_limit,)
+                    )
+                    old = conn.execute(
+                        "SELECT archivo, inicio, estado, duracion FROM trabajos WHERE inicio < ?", (keep_limit,)
+                    ).fetchall()
+                    for archivo, dia, n, ok, p50, p95, maximo in _daily_rollup(old):
+                        # Si el día ya tenía resumen (p. ej. cambió RUN_HISTORY_RETENTION_DAYS) se suma, no se pisa
+                        previous = conn.execute(
+                            "SELECT n, ok, p50, p95, maximo FROM resumen_diario WHERE archivo = ? AND dia = ?", (archivo, dia)
+                        ).fetchone()
+                        if previous:
+                            ok += previous[1]
+                            n, p50, p95, maximo = _merge_summary(
+                                (previous[0], previous[2], previous[3], previous[4]), (n, p50, p95, maximo)
+                            )
+                        conn.execute(
+                            "INSERT OR REPLACE INTO resumen_diario (archivo, dia, n, ok, p50, p95, maximo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (archivo, dia, n, ok, p50, p95, maximo),
+                        )
+                    conn.execute("DELETE FROM trabajos WHERE inicio < ?", (keep_limit,))
+                    conn.execute("DELETE FROM corridas WHERE inicio < ?", (keep_limit,))
+                    conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES ('ultima_compactacion', ?)", (str(now),))
+                if old:
+                    conn.execute("VACUUM")
+                return len(old)
+            finally:
+                conn.close()
+
+
+def percentile(values, q):
+    """Percentil q (0-100) por rango más cercano; None si no hay datos."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _day(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def _midnight(timestamp):
+    return datetime.fromtimestamp(timestamp).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def _merge_summary(a, b):
+    """
+    Junta dos resúmenes (n, p50, p95, máximo) del mismo día. n y máximo son
+    exactos; p50/p95 se aproximan con el promedio ponderado por n (los
+    valores originales ya no existen).
+    """
+    n = a[0] + b[0]
+
+    def weighted(x, y):
+        if x is None or y is None:
+            return x if y is None else y
+        return (x * a[0] + y * b[0]) / n if n else None
+
+    maximos = [m for m in (a[3], b[3]) if m is not None]
+    return n, weighted(a[1], b[1]), weighted(a[2], b[2]), max(maximos) if maximos else None
+
+
+def _daily_rollup(rows):
+    groups = {}
+    for archivo, inicio, estado, duracion in rows:
+        g = groups.setdefault((archivo, _day(inicio)), {"n": 0, "ok": 0, "duraciones": []})
+        g["n"] += 1
+        if estado.startswith("OK"):
+            g["ok"] += 1
+            if duracion is not None:
+                g["duraciones"].append(duracion)
+    return [
+        (archivo, dia, g["n"], g["ok"], percentile(g["duraciones"], 50), percentile(g["duraciones"], 95),
+         max(g["duraciones"]) if g["duraciones"] else None)
+        for (archivo, dia), g in groups.items()
+    ]
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def format_stats(stats, days):
+    """Tabla de texto para la línea de comandos."""
+    if not stats:
+        return f"No hay corridas registradas en los últimos {days} días."
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}s"
+
+    lines = [f"Duración de los refresh exitosos, últimos {days} días:", ""]
+    lines.append(f"{'Archivo':<50} {'Corridas':>8} {'Errores':>8} {'Backup':>7} {'p50':>9} {'p95':>9} {'Máx':>9}")
+    for s in stats:
+        name = s["archivo"] if len(s["archivo"]) <= 50 else "..." + s["archivo"][-47:]
+        lines.append(
+            f"{name:<50} {s['corridas']:>8} {s['errores']:>8} {s['backup']:>7} {fmt(s['p50']):>9} {fmt(s['p95']):>9} {fmt(s['max']):>9}"
+        )
+    return "\n".join(lines)
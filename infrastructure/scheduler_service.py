@@ -1,15 +1,26 @@
 # infrastructure/scheduler_service.py
 
 import os
-import time
-
 import threading
-from datetime import datetime
-import schedule
+from datetime import datetime, timedelta
 from application.scheduler_uc import SchedulerUseCase
 from application.execute_refresh_uc import execute_refresh
+from application.refresh_graph import RefreshGraph
+from domain.exceptions import ConfigError
+from domain.schedule_spec import JobSchedule
 from infrastructure.logger_service import LoggerService
 from infrastructure.config_loader import ConfigLoader
+from infrastructure.refresh_worker_pool import RefreshWorkerPool
+from infrastructure.timer_core import TimerCore
+from infrastructure.trigger_coalescer import TriggerCoalescer
+from infrastructure.job_executor import JobExecutor
+from infrastructure.scheduler_state import SchedulerState
+from infrastructure.config_watcher import ConfigFileWatcher
+from infrastructure.control_channel import ControlServer, ControlClient
+
+CATCHUP_ONCE = "una_vez"
+CATCHUP_ALL = "todas"
+CATCHUP_SKIP = "omitir"
 
 class SchedulerService:
     """
@@ -17,78 +28,255 @@ class SchedulerService:
     en excels.json (SchedulerUseCase).
     """
 
-    def __init__(self, config=None, logger=None, execute_fn=None, status_callback=None):
+    def __init__(self, config=None, logger=None, execute_fn=None, status_callback=None, clock=datetime.now):
         self.config = config or ConfigLoader()
         self.logger = logger or LoggerService(self.config.get("LOG_LEVEL", "INFO")).get_logger()
         self.execute_fn = execute_fn or execute_refresh
         self.status_callback = status_callback
+        # Los refresh corren en procesos aparte: si COM se cuelga o revienta, el scheduler sigue vivo
+        self.worker_pool = None
+        if self.config.get_bool("REFRESH_IN_SUBPROCESS", True):
+            self.worker_pool = RefreshWorkerPool.from_config(
+                self.config, self.logger, self.execute_fn, on_restart=self._sweep_orphan_excels
+            )
         self.scheduler_uc = SchedulerUseCase()
-        self.jobs_threads = []
+        # Duerme hasta el próximo disparo (no sondea cada segundo); reload/stop lo despiertan
+        self.timer = TimerCore(
+            self.logger,
+            clock=clock,
+            max_sleep=self.config.get_int("SCHEDULER_MAX_SLEEP_SECONDS", 60),
+            on_clock_jump=self._on_clock_jump,
+        )
+        # Último/próximo disparo en disco: al volver de una suspensión o reinicio se recupera lo perdido
+        self.state = SchedulerState.from_config(self.config, self.logger)
+        self.catchup_policy = self.config.get("SCHEDULER_CATCHUP_POLICY", CATCHUP_ONCE).strip().lower()
+        self.catchup_grace = self.config.get_int("SCHEDULER_CATCHUP_GRACE_SECONDS", 120)
+        self.catchup_stagger = self.config.get_int("SCHEDULER_CATCHUP_STAGGER_SECONDS", 60)
+        self.catchup_max_runs = self.config.get_int("SCHEDULER_CATCHUP_MAX_RUNS", 3)
+        self._catchup_slot = None
+        self._catchup_lock = threading.Lock()
+        self._jobs_by_path = {}
+        # Hilos fijos y cola acotada; un libro que ya está en vuelo no se lanza de nuevo
+        self.executor = JobExecutor.from_config(
+            self.config, self.logger, self._run_batch,
+            default_size=self.worker_pool.size if self.worker_pool else 1,
+        )
+        # Disparos que caen a pocos segundos entre sí se ejecutan en una sola corrida (un pool de Excel, un correo)
+        self.coalescer = TriggerCoalescer.from_config(self.config, self.timer, self.executor.submit, self.logger)
+        self._groups = {} # clave del calendario -> (JobSchedule, libros del horario, libros a ejecutar)
+        self._reload_lock = threading.Lock()
+        # Cambios en excels.json (a mano, por script o desde la GUI) se aplican solos
+        self.config_watcher = None
+        if self.config.get_bool("SCHEDULER_WATCH_CONFIG", True):
+            self.config_watcher = ConfigFileWatcher.from_config(
+                self.config, self.logger, self.scheduler_uc.schedule_file, self.reload_jobs
+            )
         self.is_running = False
+        self.paused = False
+        self.draining = False
         self._stop_event = threading.Event()
+        # Canal local (status, trigger-now, pause...) para la CLI y para otras GUI que se unan a este scheduler
+        self.control = None
+        if self.config.get_bool("SCHEDULER_CONTROL_ENABLED", True):
+            self.control = ControlServer.from_config(self.config, self.logger, self.control_handlers())
 
     # --------------------------
-    # Registrar jobs en schedule
+    # Registrar jobs en el timer
     # --------------------------
     def _register_jobs(self):
-        active_jobs = self.scheduler_uc.get_active_jobs()
-
-        if not active_jobs:
+        if not self.scheduler_uc.get_active_jobs():
             self.logger.warning("No tienes archivos marcados como activos para actualizar.")
-            return
+        self._apply_groups(self._build_groups(), resume=True)
 
-        for job in active_jobs:
+    def _build_groups(self):
+        """Agrupa los jobs activos por calendario y suma los libros que dependen de cada grupo."""
+        # Los libros que dependen de otro se refrescan en la misma corrida, justo después
+        graph = RefreshGraph.from_tasks(
+            self.scheduler_uc.jobs, self.logger, detect_links=self.config.get_bool("DEPENDENCY_DETECT_LINKS", True)
+        )
+        # Jobs con el mismo calendario ("horario", "horarios" o "cron") se disparan juntos
+        groups = {}
+        active_paths = []
+        self._jobs_by_path = {}
+        for job in self.scheduler_uc.get_active_jobs():
             excel_path = job.get("path") or job.get("excel_path")
-            horario = job.get("horario")
-            backup_path = job.get("backup") or job.get("backup_path")
+            try:
+                job_schedule = JobSchedule.from_job(job)
+            except ValueError as e:
+                self.logger.error(f"No se programó {excel_path}: {e}")
+                continue
+            active_paths.append(excel_path)
+            self._jobs_by_path[excel_path] = job
+            groups.setdefault(job_schedule.key, (job_schedule, []))[1].append(excel_path)
+
+        result = {}
+        for key, (job_schedule, paths) in groups.items():
+            dependientes = [p for p in graph.descendants(paths) if p in active_paths and p not in paths]
+            result[key] = (job_schedule, paths, paths + dependientes)
+        return result
 
-            self.logger.info(f"Tarea programada: {excel_path} a las {horario}")
+    def _apply_groups(self, groups, resume=False):
+        """
+        Lleva el timer de los grupos actuales a `groups`: quita los que ya no
+        están, agrega los nuevos y a los que cambiaron de libros solo les
+        cambia qué ejecutan (su próximo disparo sigue igual).
+        Con resume=True (al arrancar) los nuevos retoman desde el último
+        disparo guardado y recuperan lo perdido; en una recarga arrancan desde ahora.
+        """
+        for key in set(self._groups) - set(groups):
+            self.timer.cancel(key)
+            self.logger.info(f"Horario quitado: {key}")
 
-            # schedule.every().day.at(horario) ejecuta execute_refresh
-            schedule.every().day.at(horario).do(self._run_job_threaded, excel_path=excel_path, backup_path=backup_path)
+        for key, (job_schedule, paths, files) in groups.items():
+            callback = lambda planned, actual, key=key, s=job_schedule, paths=paths, files=files: \
+                self._on_trigger(key, s, paths, files, planned, actual)
+            previous = self._groups.get(key)
+            if previous is not None:
+                if previous[2] != files:
+                    self.timer.replace_callback(key, callback)
+                    self.state.set_next_due(paths, key, self.timer.next_due(key))
+                    self._log_group(job_schedule, paths, files, self.timer.next_due(key))
+                continue
+            # Se retoma desde el último disparo guardado: si se perdió alguno, sale enseguida con atraso
+            due = self.timer.add(key, job_schedule, callback, after=self.state.resume_after(paths) if resume else None)
+            self.state.set_next_due(paths, key, due) # Los dependientes guardan el estado de su propio horario
+            self._log_group(job_schedule, paths, files, due)
+
+        self._groups = groups
+
+    def _log_group(self, job_schedule, paths, files, due):
+        proxima = "nunca" if due is None else ("atrasada, se recupera" if due <= self.timer.clock() else f"{due:%Y-%m-%d %H:%M}")
+        for excel_path in paths:
+            self.logger.info(f"Tarea programada: {excel_path} a las {job_schedule} (próxima: {proxima})")
+        for excel_path in files[len(paths):]:
+            self.logger.info(f"Tarea programada: {excel_path} a las {job_schedule}, después de los libros de los que depende")
 
     # --------------------------
-    # Ejecutar job en hilo separado
+    # Disparos y recuperación de corridas perdidas
     # --------------------------
-    def _run_job_threaded(self, excel_path, backup_path=None):
-        def task():
-            import os
-            try:
-                self.logger.info(f"=== INICIO DE TAREA AUTOMÁTICA: {excel_path} ===")
-                file_name = os.path.basename(excel_path)
-                
-                if self.status_callback:
-                    self.status_callback("Actualizando Datos", f"Procesando: {file_name}. Por favor, no abras el Excel.")
-
-                # Pass the specific file to only refresh this one
-                self.execute_fn(files=[excel_path])
-                
-                if self.status_callback:
-                    self.status_callback("Excel Actualizado", f"Tarea completada: {file_name}")
-                
-                self.logger.info(f"=== FIN JOB PROGRAMADO: {excel_path} ===")
-            except Exception as e:
-                self.logger.error(f"FALLO CRÍTICO en hilo de ejecución {excel_path}: {str(e)}")
-                if self.status_callback:
-                    self.status_callback("Aviso de Error", f"No se pudo completar {os.path.basename(excel_path)}: {str(e)}")
+    def _on_trigger(self, key, job_schedule, paths, files, planned, actual):
+        if self.paused or self.draining:
+            # Se anota igual: al reanudar no se "recupera" lo que se saltó a propósito
+            self.state.record(paths, key, planned, actual, self.timer.next_due(key))
+            self.logger.info(f"Scheduler en pausa: se omite el disparo de las {planned:%H:%M} ({', '.join(os.path.basename(p) for p in files)}).")
+            return
+        if (actual - planned).total_seconds() <= self.catchup_grace:
+            self.state.record(paths, key, planned, actual, self.timer.next_due(key))
+            self.coalescer.submit(files)
+            return
+        missed, last_missed = self._missed_slots(job_schedule, planned, actual)
+        # Se anota el último horario perdido: al reiniciar no se vuelve a recuperar lo mismo
+        self.state.record(paths, key, last_missed, actual, self.timer.next_due(key), caught_up=True)
+        self._catch_up(files, planned, min(missed, self.catchup_max_runs), actual)
 
+    @staticmethod
+    def _missed_slots(job_schedule, planned, actual, limit=10000):
+        """Cuántos horarios se perdieron entre `planned` y `actual`, y el último de ellos."""
+        missed, last = 1, planned
+        while missed < limit:
+            moment = job_schedule.next_after(last)
+            if moment is None or moment > actual:
+                break
+            missed, last = missed + 1, moment
+        return missed, last
 
-        t = threading.Thread(target=task)
-        t.start()
-        self.jobs_threads.append(t)
+    def _catch_up(self, files, planned, missed, actual):
+        """
+        Corridas perdidas (app cerrada, suspensión o hibernación). Según
+        SCHEDULER_CATCHUP_POLICY o "recuperar" del job:
+            "una_vez": una corrida ahora
+            "todas": una por cada horario perdido (hasta SCHEDULER_CATCHUP_MAX_RUNS)
+            "omitir": nada, se espera al próximo horario
+        Las recuperaciones se escalonan cada SCHEDULER_CATCHUP_STAGGER_SECONDS
+        para no abrir todos los Excel a la vez al despertar.
+        """
+        by_policy = {}
+        for f in files:
+            policy = str(self._jobs_by_path.get(f, {}).get("recuperar") or self.catchup_policy).strip().lower()
+            by_policy.setdefault(policy, []).append(f)
+
+        for policy, paths in by_policy.items():
+            nombres = ", ".join(os.path.basename(p) for p in paths)
+            if policy == CATCHUP_SKIP:
+                self.logger.info(f"Se omite la corrida perdida de las {planned:%Y-%m-%d %H:%M} ({nombres}): política '{CATCHUP_SKIP}'.")
+                continue
+            times = missed if policy == CATCHUP_ALL else 1
+            start_at = self._next_catchup_slot(actual)
+            self.logger.info(
+                f"Corrida perdida de las {planned:%Y-%m-%d %H:%M} ({nombres}): se recupera "
+                f"{'ahora' if start_at <= actual else f'a las {start_at:%H:%M:%S}'}"
+                f"{f' ({times} veces)' if times > 1 else ''}."
+            )
+            if start_at <= actual:
+                self.executor.submit(paths, times=times)
+            else:
+                self.timer.add_once(
+                    f"recuperar:{start_at.isoformat()}:{nombres}", start_at,
+                    lambda p, a, paths=paths, times=times: self.executor.submit(paths, times=times),
+                )
+
+    def _next_catchup_slot(self, now):
+        with self._catchup_lock:
+            slot = now if self._catchup_slot is None or self._catchup_slot < now else self._catchup_slot
+            self._catchup_slot = slot + timedelta(seconds=self.catchup_stagger)
+        return slot
+
+    def _on_clock_jump(self, before, after):
+        if after > before and self.status_callback:
+            self.status_callback("Scheduler reanudado", "El equipo estuvo suspendido; se recuperan las actualizaciones pendientes.")
+
+    # --------------------------
+    # Ejecutar una corrida (en un hilo del executor)
+    # --------------------------
+    def _run_batch(self, files):
+        nombres = ", ".join(os.path.basename(f) for f in files)
+        try:
+            self.logger.info(f"=== INICIO DE TAREA AUTOMÁTICA: {nombres} ===")
+
+            if self.status_callback:
+                self.status_callback("Actualizando Datos", f"Procesando: {nombres}. Por favor, no abras el Excel.")
+
+            # Solo los archivos de este horario (y los que dependen de ellos)
+            if self.worker_pool:
+                self.worker_pool.run(files=files, on_progress=self._on_progress)
+            else:
+                self.execute_fn(files=files)
+
+            if self.status_callback:
+                self.status_callback("Excel Actualizado", f"Tarea completada: {nombres}")
+
+            self.logger.info(f"=== FIN JOB PROGRAMADO: {nombres} ===")
+        except Exception as e:
+            self.logger.error(f"FALLO CRÍTICO en hilo de ejecución {nombres}: {str(e)}")
+            if self.status_callback:
+                self.status_callback("Aviso de Error", f"No se pudo completar {nombres}: {str(e)}")
 
     # --------------------------
     # Iniciar el scheduler
     # --------------------------
     def start(self):
+        if self.control and ControlClient.from_config(self.config).is_available():
+            self.logger.error("Ya hay un scheduler corriendo en este equipo; no se inicia otro (usa --ctl para manejarlo).")
+            return
         self.logger.info("El reloj de tareas está ENCENDIDO")
-        self._register_jobs()
+        with self._reload_lock:
+            self._register_jobs()
+        if self.config_watcher:
+            self.config_watcher.start()
+        if self.control:
+            try:
+                self.control.start()
+            except Exception as e:
+                self.logger.warning(f"No se pudo abrir el canal de control: {e}")
+                self.control = None
         self.is_running = True
 
-        while not self._stop_event.is_set():
-            schedule.run_pending()
-            time.sleep(1)
-        
+        try:
+            self.timer.run(self._stop_event)
+        finally:
+            # Lo que estaba en cola no se ejecuta; la corrida en curso termina
+            self.executor.shutdown()
+
         self.logger.info("El reloj de tareas se ha DETENIDO limpiamente.")
         self.is_running = False
 
@@ -96,6 +284,116 @@ class SchedulerService:
         """Detiene el bucle del scheduler."""
         self.logger.info("Solicitando detención del scheduler...")
         self._stop_event.set()
+        if self.config_watcher:
+            self.config_watcher.stop()
+        if self.control:
+            self.control.stop()
+        self.coalescer.discard()
+        self.executor.shutdown()
+        self.timer.wake()
+        if self.worker_pool:
+            self.worker_pool.shutdown()
+
+    # --------------------------
+    # Control (canal local y GUI)
+    # --------------------------
+    def control_handlers(self):
+        return {
+            "status": self.status,
+            "list-jobs": self.list_jobs,
+            "trigger-now": self.trigger_now,
+            "reload": self.reload_jobs,
+            "pause": self.pause,
+            "resume": self.resume,
+            "drain-and-stop": self.drain_and_stop,
+        }
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "en_marcha": self.is_running,
+            "pausado": self.paused,
+            "drenando": self.draining,
+            "jobs": len(self._jobs_by_path),
+            "proximo": self.timer.next_due(),
+            "en_vuelo": self.executor.in_flight(),
+            "lote_pendiente": self.coalescer.pending(),
+            "atrasos": self.firing_stats(),
+        }
+
+    def list_jobs(self):
+        """Un elemento por libro programado: horario, próximo y último disparo."""
+        in_flight = self.executor.in_flight()
+        jobs = []
+        for key, (job_schedule, paths, files) in self._groups.items():
+            for excel_path in files:
+                entry = self.state.entry(excel_path) if excel_path in paths else {}
+                jobs.append({
+                    "archivo": excel_path,
+                    "horario": str(job_schedule),
+                    "dependiente": excel_path not in paths,
+                    "proximo": self.timer.next_due(key),
+                    "ultimo_disparo": entry.get("ultimo_disparo"),
+                    "estado": in_flight.get(excel_path, ""),
+                })
+        return sorted(jobs, key=lambda j: (j["proximo"] is None, j["proximo"] or datetime.max, j["archivo"]))
+
+    def trigger_now(self, files=None):
+        """Ejecuta ya los libros indicados (ruta o nombre de archivo) o todos los activos."""
+        known = list(self._jobs_by_path)
+        if not files:
+            selected = known
+        else:
+            selected = []
+            for name in files:
+                matches = [p for p in known if p == name or os.path.basename(p).lower() == os.path.basename(name).lower()]
+                if not matches:
+                    raise ValueError(f"No hay un job activo para '{name}'.")
+                selected.extend(m for m in matches if m not in selected)
+        if self.draining:
+            raise ValueError("El scheduler se está deteniendo; no se aceptan corridas nuevas.")
+        self.logger.info(f"Ejecución manual pedida: {', '.join(os.path.basename(p) for p in selected)}")
+        return self.executor.submit(selected)
+
+    def pause(self):
+        self.paused = True
+        self.logger.info("Scheduler en PAUSA: los horarios se omiten hasta reanudar (lo que está en curso sigue).")
+        return self.status()
+
+    def resume(self):
+        self.paused = False
+        self.logger.info("Scheduler REANUDADO.")
+        return self.status()
+
+    def drain_and_stop(self):
+        """No acepta disparos nuevos, termina el lote abierto y lo que está en cola o en curso, y se detiene."""
+        if self.draining:
+            return self.status()
+        self.draining = True
+        self.logger.info("Deteniendo el scheduler cuando terminen las corridas pendientes...")
+        self.coalescer.flush()
+        self.executor.shutdown(cancel_pending=False)
+
+        def finish():
+            self.executor.join()
+            self.stop()
+
+        threading.Thread(target=finish, name="pivoty-drain", daemon=True).start()
+        return self.status()
+
+    def firing_stats(self):
+        """Atraso entre la hora planificada y el inicio real de cada disparo (p50/p95/máx, en segundos)."""
+        return self.timer.latency_stats()
+
+    def _on_progress(self, evento):
+        if evento.get("evento") == "en_espera" and self.status_callback:
+            self.status_callback("Archivo en uso", f"{os.path.basename(evento['archivo'])} está abierto; se reintentará al cerrarlo.")
+
+    def _sweep_orphan_excels(self):
+        # El trabajador murió: sus EXCEL.EXE quedaron huérfanos y el supervisor los puede cerrar
+        from infrastructure.excel_supervisor import ExcelSupervisor
+        if self.config.get_bool("EXCEL_SUPERVISOR_ENABLED", True):
+            ExcelSupervisor.from_config(self.config, self.logger).sweep_orphans()
 
     # --------------------------
     # Método para ejecutar desde GUI (no bloqueante)
@@ -106,10 +404,33 @@ class SchedulerService:
         return t
 
     def reload_jobs(self):
-        """Limpia los jobs actuales y vuelve a cargar desde el archivo."""
-        self.logger.info("Actualizando tus horarios de actualización...")
-        schedule.clear()
-        self.scheduler_uc = SchedulerUseCase() # Forzar recarga de disco
-        self._register_jobs()
-        self.logger.info("Scheduler recargado correctamente.")
+        """
+        Vuelve a leer excels.json y aplica solo las diferencias: jobs nuevos,
+        quitados o cambiados. Las corridas en curso y los próximos disparos de
+        lo que no cambió no se tocan. Si el archivo es inválido se sigue con lo anterior.
+        """
+        with self._reload_lock:
+            try:
+                scheduler_uc = SchedulerUseCase(self.scheduler_uc.schedule_file) # Forzar recarga de disco
+            except ConfigError as e:
+                self.logger.error(f"No se aplicaron los cambios de horarios: {e}")
+                return
+            if self.config_watcher:
+                self.config_watcher.mark_current()
+
+            if scheduler_uc.jobs == self.scheduler_uc.jobs:
+                self.logger.debug("excels.json no cambió: no hay nada que recargar.")
+                return
+            old_jobs = {(j.get("path") or j.get("excel_path")): j for j in self.scheduler_uc.get_active_jobs()}
+            new_jobs = {(j.get("path") or j.get("excel_path")): j for j in scheduler_uc.get_active_jobs()}
+            added = [p for p in new_jobs if p not in old_jobs]
+            removed = [p for p in old_jobs if p not in new_jobs]
+            changed = [p for p in new_jobs if p in old_jobs and new_jobs[p] != old_jobs[p]]
+            self.scheduler_uc = scheduler_uc
+            for label, paths in (("agregados", added), ("quitados", removed), ("cambiados", changed)):
+                if paths:
+                    self.logger.info(f"Jobs {label}: {', '.join(os.path.basename(p) for p in paths)}")
 
+            # Un lote ya abierto y las corridas en curso siguen con lo que tenían
+            self._apply_groups(self._build_groups())
+            self.logger.info("Scheduler recargado correctamente.")
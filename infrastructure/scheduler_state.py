@@ -0,0 +1,108 @@
+# infrastructure/scheduler_state.py
+
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+
+STATE_FILE = "config/scheduler_state.json"
+
+
+class SchedulerState:
+    """
+    Último disparo y próximo disparo de cada libro programado, guardados en
+    disco para que, al volver a abrir la app, se sepa qué corridas se perdieron.
+
+        {"c:\\reportes\\ventas.xlsx": {"horario": "07:00",
+                                     "ultimo_disparo": "2024-05-06T07:00:00",
+                                     "inicio_real": "2024-05-06T07:00:01",
+                                     "proximo": "2024-05-07T07:00:00",
+                                     "recuperado": false}}
+    """
+
+    def __init__(self, logger, path=None):
+        self.logger = logger
+        self.path = path or STATE_FILE
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    @classmethod
+    def from_config(cls, config, logger):
+        return cls(logger, path=config.get("SCHEDULER_STATE_FILE", STATE_FILE))
+
+    # --------------------------
+    # Persistencia
+    # --------------------------
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except Exception as e:
+            self.logger.warning(f"No se pudo leer el estado del scheduler ({e}), se empieza de cero.")
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _save_quietly(self):
+        try:
+            self._save()
+        except OSError as e:
+            self.logger.warning(f"No se pudo guardar el estado del scheduler: {e}")
+
+    @staticmethod
+    def _key(workbook_path):
+        return os.path.normcase(os.path.abspath(workbook_path))
+
+    # --------------------------
+    # Consultar y registrar
+    # --------------------------
+    def resume_after(self, paths):
+        """
+        Desde cuándo buscar el próximo disparo de `paths`: el último disparo
+        guardado o, si nunca se dispararon, justo antes del próximo que se
+        había anotado. None si no hay nada guardado.
+        """
+        with self._lock:
+            entries = [self._data.get(self._key(p), {}) for p in paths]
+        fired = [datetime.fromisoformat(e["ultimo_disparo"]) for e in entries if e.get("ultimo_disparo")]
+        if fired:
+            return max(fired)
+        pending = [datetime.fromisoformat(e["proximo"]) for e in entries if e.get("proximo")]
+        return min(pending) - timedelta(seconds=1) if pending else None
+
+    def set_next_due(self, paths, schedule_key, next_due):
+        """Anota el próximo disparo al programar (sin tocar el último)."""
+        with self._lock:
+            for path in paths:
+                entry = self._data.setdefault(self._key(path), {})
+                entry["horario"] = schedule_key
+                entry["proximo"] = next_due.isoformat(timespec="seconds") if next_due else None
+            self._save_quietly()
+
+    def record(self, paths, schedule_key, planned, actual, next_due, caught_up=False):
+        with self._lock:
+            for path in paths:
+                self._data[self._key(path)] = {
+                    "horario": schedule_key,
+                    "ultimo_disparo": planned.isoformat(timespec="seconds"),
+                    "inicio_real": actual.isoformat(timespec="seconds"),
+                    "proximo": next_due.isoformat(timespec="seconds") if next_due else None,
+                    "recuperado": caught_up,
+                }
+            self._save_quietly()
+
+    def entry(self, workbook_path):
+        with self._lock:
+            return dict(self._data.get(self._key(workbook_path), {}))
+
+    def snapshot(self):
+        with self._lock:
+            return {path: dict(entry) for path, entry in self._data.items()}
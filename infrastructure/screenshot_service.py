@@ -0,0 +1,341 @@
+# infrastructure/screenshot_service.py
+
+import os
+import re
+import json
+import time
+import zlib
+import queue
+import struct
+import threading
+from infrastructure.phase_timer import new_run_id
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "index.lock"
+
+
+# ==========================================================
+# Codificación PNG (solo zlib, sin dependencias externas)
+# ==========================================================
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(width, height, bgra, scale=1, level=6):
+    """
+    Convierte píxeles BGRA (como los entrega GetBitmapBits, de arriba a abajo) en
+    un PNG RGB comprimido. Con scale=N se toma un píxel de cada N en cada eje.
+    """
+    step = max(1, int(scale))
+    out_w = (width + step - 1) // step
+    out_h = (height + step - 1) // step
+    stride = width * 4
+    pixels = memoryview(bgra)
+
+    compressor = zlib.compressobj(level)
+    idat = []
+    row_out = bytearray(1 + out_w * 3) # El primer byte es el filtro PNG (0 = ninguno)
+    for y in range(0, height, step):
+        row = pixels[y * stride:(y + 1) * stride]
+        row_out[1::3] = row[2::4 * step]
+        row_out[2::3] = row[1::4 * step]
+        row_out[3::3] = row[0::4 * step]
+        idat.append(compressor.compress(row_out))
+    idat.append(compressor.flush())
+
+    header = struct.pack(">IIBBBBB", out_w, out_h, 8, 2, 0, 0, 0)
+    return b"".join([
+        PNG_SIGNATURE,
+        _png_chunk(b"IHDR", header),
+        _png_chunk(b"IDAT", b"".join(idat)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+# ==========================================================
+# Captura de pantalla
+# ==========================================================
+
+class Win32ScreenCapturer:
+    """Copia el escritorio virtual (todas las pantallas) con BitBlt."""
+
+    def grab(self):
+        import win32gui
+        import win32ui
+        import win32con
+        import win32api
+
+        width = win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN)
+        height = win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN)
+        left = win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN)
+        top = win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN)
+
+        hdesktop = win32gui.GetDesktopWindow()
+        desktop_dc = win32gui.GetWindowDC(hdesktop)
+        img_dc = win32ui.CreateDCFromHandle(desktop_dc)
+        mem_dc = img_dc.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        try:
+            bitmap.CreateCompatibleBitmap(img_dc, width, height)
+            mem_dc.SelectObject(bitmap)
+            mem_dc.BitBlt((0, 0), (width, height), img_dc, (left, top), win32con.SRCCOPY)
+            return width, height, bitmap.GetBitmapBits(True)
+        finally:
+            mem_dc.DeleteDC()
+            win32gui.DeleteObject(bitmap.GetHandle())
+            img_dc.DeleteDC()
+            win32gui.ReleaseDC(hdesktop, desktop_dc)
+
+
+def _slug(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", name)[:40] or "archivo"
+
+
+class ScreenshotService:
+    """
+    Capturas de pantalla de los errores:
+    - La foto de la pantalla se toma en el momento (milisegundos); la compresión a
+      PNG y la escritura se hacen en un hilo aparte para no frenar el intento.
+    - Cada captura queda indexada por corrida, archivo e intento (index.jsonl), así
+      el correo adjunta exactamente las de esta corrida sin recorrer la carpeta.
+    - Se respeta un tope de tamaño total y de antigüedad; lo que sobra se borra.
+    """
+
+    def __init__(self, logger, directory, run_id=None, capturer=None, scale=1,
+                 max_bytes=50 * 1024 * 1024, max_age_days=14):
+        self.logger = logger
+        self.directory = directory
+        self.run_id = run_id or new_run_id()
+        self.capturer = capturer or Win32ScreenCapturer()
+        self.scale = scale
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, logger, run_id=None):
+        if not config.get_bool("SCREENSHOT_ON_ERROR", True):
+            return NULL_SCREENSHOTS
+        default_dir = os.path.join(config.get("LOG_DIR", "logs"), "screenshots")
+        return cls(
+            logger,
+            config.get("SCREENSHOT_DIR", default_dir),
+            run_id=run_id,
+            scale=config.get_int("SCREENSHOT_SCALE", 1),
+            max_bytes=config.get_int("SCREENSHOT_MAX_MB", 50) * 1024 * 1024,
+            max_age_days=config.get_int("SCREENSHOT_MAX_AGE_DAYS", 14),
+        )
+
+    # --------------------------
+    # Pedir una captura
+    # --------------------------
+    def capture(self, archivo, attempt, prefix="error"):
+        """Toma la foto ahora y la encola para guardarla. Devuelve la ruta que tendrá el PNG."""
+        try:
+            width, height, bits = self.capturer.grab()
+        except Exception as e:
+            self.logger.warning(f"No se pudo tomar la captura de pantalla: {e}")
+            return None
+
+        filename = f"{self.run_id}_{_slug(archivo)}_{prefix}_intento{attempt}_{time.time_ns() % 10**6:06d}.png"
+        entry = {
+            "run_id": self.run_id,
+            "archivo": archivo,
+            "intento": attempt,
+            "ruta": os.path.join(self.directory, filename),
+            "creado": time.time(),
+        }
+        self._start()
+        self._queue.put((entry, width, height, bits))
+        return entry["ruta"]
+
+    def captures(self, archivo=None, run_id=None):
+        """Capturas ya guardadas de una corrida (por defecto, la actual), en orden."""
+        run_id = run_id or self.run_id
+        try:
+            with self._lock, _IndexLock(self.directory):
+                index = self._load_index()
+        except TimeoutError as e:
+            self.logger.warning(f"No se pudo leer el índice de capturas: {e}")
+            return []
+        return [e for e in index if e["run_id"] == run_id and (archivo is None or e["archivo"] == archivo)]
+
+    def flush(self, timeout=30):
+        """Espera a que se terminen de guardar las capturas pendientes."""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def close(self, timeout=30):
+        self.flush(timeout)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    # --------------------------
+    # Hilo de guardado
+    # --------------------------
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pivoty-screenshots", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._save(*item)
+            except Exception as e:
+                self.logger.warning(f"No se pudo guardar la captura de pantalla: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _save(self, entry, width, height, bits):
+        data = encode_png(width, height, bits, scale=self.scale)
+        entry["bytes"] = len(data)
+
+        # Otros procesos (trabajadores, otras corridas) escriben el mismo índice: siempre se
+        # relee del disco y se modifica con el candado de archivo tomado. El PNG se escribe
+        # también con el candado, así nunca hay capturas sin indexar que se adopten dos veces
+        with self._lock, _IndexLock(self.directory):
+            index = self._load_index()
+            tmp_path = entry["ruta"] + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, entry["ruta"])
+            index.append(entry)
+            removed = self._enforce_retention(index)
+            if removed:
+                self._write_index(index)
+            else:
+                with open(self._index_path(), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.logger.info(f"Captura de pantalla guardada: {entry['ruta']} ({len(data) // 1024} KB)")
+
+    # --------------------------
+    # Índice y retención
+    # --------------------------
+    def _index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _load_index(self):
+        """Lee el índice del disco (llamar con el candado tomado)."""
+        index = []
+        path = self._index_path()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        index.append(json.loads(line))
+                    except ValueError:
+                        continue
+        elif os.path.isdir(self.directory):
+            # Primera vez con índice: se adoptan las capturas antiguas para que la retención las alcance
+            for item in os.scandir(self.directory):
+                if item.is_file() and item.name.endswith(".png"):
+                    stat = item.stat()
+                    index.append({"run_id": None, "archivo": None, "intento": None, "ruta": item.path,
+                                  "creado": stat.st_mtime, "bytes": stat.st_size})
+            index.sort(key=lambda e: e["creado"])
+            self._write_index(index)
+        return index
+
+    def _write_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in index:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._index_path())
+
+    def _enforce_retention(self, index):
+        """Borra las capturas más viejas que max_age_days y, si hace falta, las más antiguas hasta entrar en max_bytes."""
+        min_created = time.time() - self.max_age_days * 86400 if self.max_age_days > 0 else None
+        total = sum(e.get("bytes", 0) for e in index)
+        removed = 0
+        # El índice está en orden de creación: se recorta desde el principio (sin borrar la recién guardada)
+        while len(index) > 1:
+            oldest = index[0]
+            expired = min_created is not None and oldest["creado"] < min_created
+            over_budget = self.max_bytes > 0 and total > self.max_bytes
+            if not (expired or over_budget):
+                break
+            index.pop(0)
+            total -= oldest.get("bytes", 0)
+            removed += 1
+            try:
+                os.remove(oldest["ruta"])
+            except OSError:
+                pass
+        return removed
+
+
+class _IndexLock:
+    """
+    Candado entre procesos para index.jsonl: un archivo creado en exclusiva.
+    Si quedó de un proceso que murió (más viejo que `stale_seconds`), se rompe.
+    """
+
+    def __init__(self, directory, timeout=10, stale_seconds=60):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.directory = directory
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self._fd = None
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_seconds:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue # Lo soltó justo ahora
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"El índice de capturas está bloqueado: {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        os.close(self._fd)
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+class _NullScreenshots:
+    """Capturas deshabilitadas (SCREENSHOT_ON_ERROR=false)."""
+    run_id = None
+
+    def capture(self, archivo, attempt, prefix="error"):
+        return None
+
+    def captures(self, archivo=None, run_id=None):
+        return []
+
+    def flush(self, timeout=30):
+        pass
+
+    def close(self, timeout=30):
+        pass
+
+
+NULL_SCREENSHOTS = _NullScreenshots()
@@ -0,0 +1,91 @@
+# infrastructure/staging.py
+
+import os
+import shutil
+import tempfile
+from domain.exceptions import ExcelGatewayError, FileLockedError
+from infrastructure.file_lock import is_file_locked
+
+
+class StagedWorkbook:
+    """
+    Copia de trabajo de un libro. Excel abre y guarda `path` (la copia local);
+    el original solo se toca en commit(), con un reemplazo atómico.
+    """
+
+    def __init__(self, original_path, path, folder, original_stat):
+        self.original_path = original_path
+        self.path = path
+        self._folder = folder
+        self._original_stat = original_stat
+
+    def commit(self):
+        """
+        Reemplaza el original por la copia refrescada. Si algo falla, el
+        original queda intacto.
+        """
+        # Última comprobación justo antes de tocar el archivo real
+        if is_file_locked(self.original_path):
+            raise FileLockedError(f"El archivo se abrió durante el refresh, no se puede reemplazar: {self.original_path}")
+        current = os.stat(self.original_path)
+        if (current.st_mtime_ns, current.st_size) != self._original_stat:
+            raise ExcelGatewayError(f"Alguien guardó {self.original_path} durante el refresh; no se sobrescriben sus cambios.")
+
+        # Primero se copia junto al original (mismo disco) y luego se renombra encima:
+        # os.replace es atómico, así nunca queda un libro a medio escribir
+        folder, name = os.path.split(os.path.abspath(self.original_path))
+        fd, tmp_path = tempfile.mkstemp(prefix="~pivoty_", suffix=os.path.splitext(name)[1], dir=folder)
+        os.close(fd)
+        try:
+            shutil.copyfile(self.path, tmp_path)
+            os.replace(tmp_path, self.original_path)
+        except Exception as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            # En Windows cualquiera que tenga el original abierto (aunque sea solo lectura)
+            # impide el reemplazo: se trata como archivo en uso y el job se aparca
+            if isinstance(e, PermissionError):
+                raise FileLockedError(f"El archivo se abrió justo antes de reemplazarlo: {self.original_path}") from e
+            raise
+
+    def discard(self):
+        shutil.rmtree(self._folder, ignore_errors=True)
+
+
+class StagingArea:
+    """
+    Refresco sobre una copia local: el libro real solo se lee al principio y se
+    reemplaza al final, así no queda abierto por el bot durante todo el refresh.
+
+    Se activa con REFRESH_STAGING_ENABLED o por job en excels.json:
+        "staging": true
+    """
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or os.path.join(tempfile.gettempdir(), "pivoty_staging")
+
+    @classmethod
+    def from_job(cls, job, config):
+        """Devuelve None si el job no usa staging."""
+        enabled = (job or {}).get("staging", config.get_bool("REFRESH_STAGING_ENABLED", False))
+        if not enabled:
+            return None
+        return cls(config.get("STAGING_DIR"))
+
+    def stage(self, path):
+        os.makedirs(self.base_dir, exist_ok=True)
+        # Una carpeta por copia: el libro conserva su nombre (Excel no abre dos libros con el mismo nombre)
+        folder = tempfile.mkdtemp(prefix="job_", dir=self.base_dir)
+        original = os.stat(path)
+        staged_path = os.path.join(folder, os.path.basename(path))
+        try:
+            shutil.copyfile(path, staged_path)
+        except PermissionError as e:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise FileLockedError(f"No se pudo copiar el archivo, está bloqueado: {path}") from e
+        except Exception:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+        return StagedWorkbook(path, staged_path, folder, (original.st_mtime_ns, original.st_size))
@@ -0,0 +1,205 @@
+# infrastructure/timer_core.py
+
+import heapq
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from infrastructure.run_history import percentile
+
+
+class _Entry:
+    def __init__(self, key, schedule, callback, due):
+        self.key = key
+        self.schedule = schedule # Algo con next_after(datetime), p. ej. JobSchedule
+        self.callback = callback
+        self.due = due
+        self.cancelled = False
+
+
+class _OneShot:
+    """Calendario de un solo disparo (ver TimerCore.add_once)."""
+
+    def __init__(self, when):
+        self.when = when
+
+    def next_after(self, moment):
+        return self.when if moment < self.when else None
+
+
+class TimerCore:
+    """
+    Núcleo de tiempo del scheduler: un heap con el próximo disparo de cada
+    entrada y un solo hilo que duerme con Event.wait hasta el más cercano.
+    add/cancel/clear/stop lo despiertan antes para recalcular.
+
+    - La espera se corta cada `max_sleep` segundos para notar cambios de hora
+      del reloj de pared (la espera de Event.wait es monotónica).
+    - Si entre dos vueltas el reloj de pared avanza (o retrocede) mucho más de
+      lo que se durmió, el equipo estuvo suspendido o cambió la hora: se avisa
+      a `on_clock_jump(antes, ahora)`. Los disparos vencidos salen con su hora
+      planificada, así quien los recibe ve cuánto atraso traen.
+    - Cada disparo guarda su latencia (inicio real - hora planificada).
+    - callback(planned, actual) se llama en el hilo del timer: debe ser rápido
+      (lanzar el trabajo en otro hilo) o atrasa a los siguientes.
+    """
+
+    def __init__(self, logger, clock=datetime.now, max_sleep=60, keep_latencies=200, jump_threshold=90, on_clock_jump=None):
+        self.logger = logger
+        self.clock = clock
+        self.max_sleep = max_sleep
+        self.jump_threshold = jump_threshold
+        self.on_clock_jump = on_clock_jump
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._latencies = {}
+        self._keep_latencies = keep_latencies
+
+    # --------------------------
+    # Entradas
+    # --------------------------
+    def add(self, key, schedule, callback, after=None):
+        """Programa (o reprograma) `key`. Devuelve la próxima hora de disparo."""
+        due = schedule.next_after(after or self.clock())
+        with self._lock:
+            self._cancel(key)
+            entry = _Entry(key, schedule, callback, due)
+            self._entries[key] = entry
+            if due is not None:
+                heapq.heappush(self._heap, (due, next(self._seq), entry))
+        self.wake()
+        return due
+
+    def add_once(self, key, when, callback):
+        """Dispara `callback` una sola vez a la hora `when`; luego la entrada desaparece."""
+        return self.add(key, _OneShot(when), callback)
+
+    def replace_callback(self, key, callback):
+        """Cambia qué hace `key` sin tocar su próximo disparo. False si no existe."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.callback = callback
+            return True
+
+    def cancel(self, key):
+        with self._lock:
+            found = self._cancel(key)
+        self.wake()
+        return found
+
+    def _cancel(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.cancelled = True # Se descarta del heap cuando llegue al tope
+        return entry is not None
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._cancel(key)
+            self._heap = []
+        self.wake()
+
+    def next_due(self, key=None):
+        with self._lock:
+            if key is not None:
+                entry = self._entries.get(key)
+                return entry.due if entry else None
+            return min((e.due for e in self._entries.values() if e.due), default=None)
+
+    def entries(self):
+        """[(key, próximo disparo)] ordenado por hora."""
+        with self._lock:
+            items = [(e.key, e.due) for e in self._entries.values()]
+        return sorted(items, key=lambda item: (item[1] is None, item[1] or datetime.max))
+
+    def wake(self):
+        self._wakeup.set()
+
+    # --------------------------
+    # Bucle
+    # --------------------------
+    def run(self, stop_event):
+        """Bloquea hasta que `stop_event` se active (stop debe llamar también a wake())."""
+        while not stop_event.is_set():
+            for entry, planned, actual in self._pop_due():
+                self._fire(entry, planned, actual)
+            timeout = self._seconds_until_next()
+            before = self.clock()
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            self._check_clock_jump(before, timeout)
+
+    def _check_clock_jump(self, before, slept):
+        now = self.clock()
+        elapsed = (now - before).total_seconds()
+        # wake() puede cortar la espera antes: hacia adelante se compara con lo dormido, hacia atrás con cero
+        drift = max(0.0, elapsed - slept) if elapsed >= 0 else elapsed
+        if abs(drift) < self.jump_threshold:
+            return
+        self.logger.info(f"El reloj saltó {round(drift)} s ({before:%Y-%m-%d %H:%M} -> {now:%Y-%m-%d %H:%M}): suspensión, hibernación o cambio de hora.")
+        if self.on_clock_jump:
+            try:
+                self.on_clock_jump(before, now)
+            except Exception as e:
+                self.logger.error(f"Error al procesar el salto del reloj: {e}")
+
+    def _pop_due(self):
+        now = self.clock()
+        due = []
+        with self._lock:
+            while self._heap and (self._heap[0][2].cancelled or self._heap[0][0] <= now):
+                planned, _, entry = heapq.heappop(self._heap)
+                if entry.cancelled:
+                    continue
+                due.append((entry, planned, now))
+                # Siguiente disparo contado desde ahora: si el equipo estuvo dormido no se repiten los perdidos
+                entry.due = entry.schedule.next_after(max(planned, now))
+                if entry.due is not None:
+                    heapq.heappush(self._heap, (entry.due, next(self._seq), entry))
+                elif self._entries.get(entry.key) is entry:
+                    del self._entries[entry.key] # No se vuelve a disparar
+        return due
+
+    def _seconds_until_next(self):
+        with self._lock:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                return self.max_sleep
+            remaining = (self._heap[0][0] - self.clock()).total_seconds()
+        return max(0.0, min(remaining, self.max_sleep))
+
+    def _fire(self, entry, planned, actual):
+        latency = (actual - planned).total_seconds()
+        with self._lock:
+            history = self._latencies.setdefault(entry.key, deque(maxlen=self._keep_latencies))
+            history.append(latency)
+        self.logger.debug(f"Disparo de '{entry.key}': planificado {planned:%H:%M:%S}, inicio con {round(latency * 1000)} ms de atraso.")
+        try:
+            entry.callback(planned, actual)
+        except Exception as e:
+            self.logger.error(f"Error al disparar '{entry.key}': {e}")
+
+    # --------------------------
+    # Latencias
+    # --------------------------
+    def latency_stats(self):
+        """Por entrada: disparos, p50/p95/máximo y último atraso en segundos."""
+        with self._lock:
+            snapshot = {key: list(values) for key, values in self._latencies.items()}
+        return {
+            key: {
+                "disparos": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": max(values),
+                "ultimo": values[-1],
+            }
+            for key, values in snapshot.items() if values
+        }
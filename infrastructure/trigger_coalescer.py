@@ -0,0 +1,76 @@
+# infrastructure/trigger_coalescer.py
+
+import threading
+from datetime import datetime, timedelta
+
+BATCH_KEY = "__lote__"
+
+
+class TriggerCoalescer:
+    """
+    Junta los disparos que llegan casi a la vez en una sola corrida: el primer
+    disparo abre un lote y, pasados `window_seconds`, el lote se ejecuta con
+    todos los archivos que se sumaron (sin repetir). Así diez libros a las
+    07:00 comparten una corrida (mismos Excel del pool, tope de paralelismo)
+    y un solo correo.
+
+    El cierre del lote lo dispara el mismo TimerCore del scheduler.
+    Con window_seconds <= 0 cada disparo se ejecuta enseguida, como antes.
+    """
+
+    def __init__(self, timer, window_seconds, on_batch, logger, clock=datetime.now):
+        self.timer = timer
+        self.window_seconds = window_seconds
+        self.on_batch = on_batch # on_batch(files)
+        self.logger = logger
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._files = None # Lote abierto: lista de archivos en orden de llegada
+        self._triggers = 0
+
+    @classmethod
+    def from_config(cls, config, timer, on_batch, logger):
+        return cls(timer, config.get_int("SCHEDULER_COALESCE_SECONDS", 15), on_batch, logger)
+
+    def submit(self, files):
+        if self.window_seconds <= 0:
+            self.on_batch(list(files))
+            return
+        with self._lock:
+            opened = self._files is None
+            if opened:
+                self._files = []
+                self._triggers = 0
+            self._triggers += 1
+            self._files.extend(f for f in files if f not in self._files)
+        if opened:
+            closes_at = self.clock() + timedelta(seconds=self.window_seconds)
+            self.timer.add_once(BATCH_KEY, closes_at, self._flush)
+            self.logger.info(f"Se abre un lote de actualización: se juntan los disparos de los próximos {self.window_seconds}s.")
+
+    def _flush(self, planned=None, actual=None):
+        with self._lock:
+            files, triggers = self._files, self._triggers
+            self._files = None
+        if not files:
+            return
+        if triggers > 1:
+            self.logger.info(f"Se juntaron {triggers} disparos en una sola corrida de {len(files)} archivos.")
+        self.on_batch(files)
+
+    def flush(self):
+        """Ejecuta ya el lote abierto, sin esperar a que cierre la ventana."""
+        self.timer.cancel(BATCH_KEY)
+        self._flush()
+
+    def pending(self):
+        with self._lock:
+            return list(self._files or [])
+
+    def discard(self):
+        """Al detener el scheduler: el lote abierto no se ejecuta."""
+        self.timer.cancel(BATCH_KEY)
+        with self._lock:
+            files, self._files = self._files, None
+        if files:
+            self.logger.warning(f"Se descarta el lote pendiente de {len(files)} archivos al detener el scheduler.")
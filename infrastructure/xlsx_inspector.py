@@ -0,0 +1,218 @@
+# infrastructure/xlsx_inspector.py
+
+import os
+import posixpath
+import zipfile
+from urllib.parse import unquote
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+TABLE_REL_SUFFIX = "/table"
+EXTERNAL_LINK_REL_SUFFIX = "/externalLink"
+EXTERNAL_PATH_REL_SUFFIXES = ("/externalLinkPath", "/xlExternalLinkPath/xlPathMissing")
+
+READ_CHUNK = 256 * 1024
+
+
+def _local(name):
+    # expat con namespace_separator=" " entrega "uri nombre"
+    return name.rpartition(" ")[2]
+
+
+def _split_ref(cell):
+    """Convierte "B12" en (fila 12, columna 2)."""
+    col = 0
+    digits = ""
+    for ch in cell:
+        if ch.isdigit():
+            digits += ch
+        elif ch.isalpha():
+            col = col * 26 + (ord(ch.upper()) - 64)
+    return (int(digits) if digits else 1), col
+
+
+class _SheetScanner:
+    """
+    Recorre el XML de una hoja con expat (sin construir el árbol): cuenta filas
+    con algún valor, filas con valor dentro de cada tabla, y celdas de error
+    (t="e") como #REF! o #N/A.
+    """
+
+    def __init__(self, tables=()):
+        self.rows = 0
+        self.last_row = 0
+        self.errors = {}
+        # tables: [(nombre, primera_fila, ultima_fila, primera_col, ultima_col)] del cuerpo de cada tabla
+        self.tables = list(tables)
+        self.table_rows = {t[0]: 0 for t in self.tables}
+        self._row_tables = ()
+        self._row_table_hits = set()
+        self._row_has_value = False
+        self._cell_ref = None
+        self._cell_is_error = False
+        self._in_value = False
+        self._text = []
+
+    def start(self, name, attrs):
+        tag = _local(name)
+        if tag == "row":
+            self._row_has_value = False
+            r = attrs.get("r")
+            if r and r.isdigit():
+                self.last_row = int(r)
+            else:
+                self.last_row += 1
+            if self.tables:
+                row = self.last_row
+                self._row_tables = [t for t in self.tables if t[1] <= row <= t[2]]
+                self._row_table_hits = set()
+        elif tag == "c":
+            self._cell_is_error = attrs.get("t") == "e"
+            self._cell_ref = attrs.get("r")
+        elif tag in ("v", "is"):
+            self._row_has_value = True
+            if self._row_tables and self._cell_ref:
+                col = _split_ref(self._cell_ref)[1]
+                for t in self._row_tables:
+                    if t[3] <= col <= t[4]:
+                        self._row_table_hits.add(t[0])
+            if tag == "v" and self._cell_is_error:
+                self._in_value = True
+                self._text = []
+
+    def end(self, name):
+        tag = _local(name)
+        if tag == "row":
+            if self._row_has_value:
+                self.rows += 1
+            for table_name in self._row_table_hits:
+                self.table_rows[table_name] += 1
+            self._row_table_hits = set()
+        elif tag == "v" and self._in_value:
+            value = "".join(self._text).strip() or "#ERROR"
+            self.errors[value] = self.errors.get(value, 0) + 1
+            self._in_value = False
+
+    def data(self, text):
+        if self._in_value:
+            self._text.append(text)
+
+    def scan(self, stream):
+        parser = expat.ParserCreate(namespace_separator=" ")
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start
+        parser.EndElementHandler = self.end
+        parser.CharacterDataHandler = self.data
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+        return self
+
+
+def _names(zf):
+    # namelist() arma una lista nueva en cada llamada; la guardamos como conjunto
+    if not hasattr(zf, "_pivoty_names"):
+        zf._pivoty_names = set(zf.namelist())
+    return zf._pivoty_names
+
+
+def _rels(zf, part):
+    """Relaciones de un part: {Id: (Tipo, ruta_absoluta_en_zip)}."""
+    folder, name = posixpath.split(part)
+    rels_path = posixpath.join(folder, "_rels", name + ".rels")
+    if rels_path not in _names(zf):
+        return {}
+    root = ET.fromstring(zf.read(rels_path))
+    result = {}
+    for rel in root.iter(f"{{{NS_PKG_REL}}}Relationship"):
+        target = rel.get("Target", "")
+        if rel.get("TargetMode") == "External":
+            path = target
+        elif target.startswith("/"):
+            path = target.lstrip("/")
+        else:
+            path = posixpath.normpath(posixpath.join(folder, target))
+        result[rel.get("Id")] = (rel.get("Type", ""), path)
+    return result
+
+
+def inspect_xlsx(path):
+    """
+    Inspecciona un .xlsx/.xlsm sin Excel y con memoria acotada (las hojas se leen
+    en streaming). Devuelve:
+
+        {"hojas":  {nombre: {"filas": n, "ultima_fila": m, "errores": {"#REF!": 2}}},
+         "tablas": {nombre: {"hoja": nombre_hoja, "filas": n}}}
+
+    "filas" son filas con al menos un valor; en las tablas no cuentan encabezado ni totales.
+    """
+    report = {"hojas": {}, "tablas": {}}
+    with zipfile.ZipFile(path) as zf:
+        workbook_part = "xl/workbook.xml"
+        workbook_rels = _rels(zf, workbook_part)
+        root = ET.fromstring(zf.read(workbook_part))
+
+        for sheet in root.iter(f"{{{NS_MAIN}}}sheet"):
+            name = sheet.get("name")
+            rel = workbook_rels.get(sheet.get(f"{{{NS_REL}}}id"))
+            if not rel or rel[1] not in _names(zf):
+                continue # Hojas de gráfico o partes que no existen
+            sheet_part = rel[1]
+
+            # Las tablas (ListObjects) se leen antes para contar sus filas en la misma pasada
+            tables = []
+            for rel_type, table_part in _rels(zf, sheet_part).values():
+                if not rel_type.endswith(TABLE_REL_SUFFIX) or table_part not in _names(zf):
+                    continue
+                table = ET.fromstring(zf.read(table_part))
+                start, _, end = table.get("ref", "A1").partition(":")
+                (r1, c1), (r2, c2) = _split_ref(start), _split_ref(end or start)
+                header = int(table.get("headerRowCount", "1"))
+                totals = int(table.get("totalsRowCount", "0"))
+                tables.append((table.get("displayName") or table.get("name"), r1 + header, r2 - totals, c1, c2))
+
+            with zf.open(sheet_part) as stream:
+                scanner = _SheetScanner(tables).scan(stream)
+            report["hojas"][name] = {"filas": scanner.rows, "ultima_fila": scanner.last_row, "errores": scanner.errors}
+            for table_name, rows in scanner.table_rows.items():
+                report["tablas"][table_name] = {"hoja": name, "filas": rows}
+    return report
+
+
+def total_errors(report):
+    return sum(sum(h["errores"].values()) for h in report["hojas"].values())
+
+
+def external_links(path):
+    """
+    Libros de los que `path` toma datos (vínculos externos en xl/externalLinks),
+    como rutas absolutas. Las rutas relativas se resuelven contra la carpeta del libro.
+    """
+    links = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with zipfile.ZipFile(path) as zf:
+        for rel_type, link_part in _rels(zf, "xl/workbook.xml").values():
+            if not rel_type.endswith(EXTERNAL_LINK_REL_SUFFIX) or link_part not in _names(zf):
+                continue
+            for target_type, target in _rels(zf, link_part).values():
+                if target_type.endswith(EXTERNAL_PATH_REL_SUFFIXES):
+                    links.append(_resolve_link(target, base_dir))
+    return links
+
+
+def _resolve_link(target, base_dir):
+    target = unquote(target)
+    if target.lower().startswith("file:///"):
+        target = target[len("file:///"):]
+    elif target.lower().startswith("file:"):
+        target = target[len("file:"):] # file://servidor/recurso -> //servidor/recurso
+    target = target.replace("/", os.sep).replace("\\", os.sep)
+    if not os.path.isabs(target) and not target.startswith(os.sep * 2) and not (len(target) > 1 and target[1] == ":"):
+        target = os.path.join(base_dir, target)
+    return os.path.normpath(target)
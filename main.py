@@ -3,6 +3,7 @@
 import sys
 import os
 import ctypes
+import multiprocessing
 
 from application.execute_refresh_uc import execute_refresh
 from infrastructure.config_loader import ConfigLoader
@@ -34,6 +35,10 @@ def main():
     if "--scheduler" in sys.argv:
         # ... (scheduler logic)
         pass
+
+    if "--ctl" in sys.argv:
+        # Solo habla con el scheduler que ya corre (que ya validó la licencia)
+        sys.exit(_ctl_cli(config))
     
     # --- VALIDACIÓN DE NUBE (FASE 2) ---
     supabase_url = config.get("SUPABASE_URL")
@@ -73,16 +78,172 @@ def main():
             sys.exit(0) 
 
     # --- INICIO NORMAL ---
-    if "--scheduler" in sys.argv:
+    if "--scheduler" in sys.argv or "--daemon" in sys.argv:
+        # --daemon: el mismo scheduler sin ventana; se maneja con --ctl y la GUI se une a él
         # (Este bloque se repite para mantener la lógica de hilos pero ahora validado)
+        # Antes de programar nada, cerramos los Excel que dejó una ejecución anterior
+        from infrastructure.excel_supervisor import get_excel_supervisor
+        get_excel_supervisor(config, logger)
         scheduler = SchedulerService(config=config, logger=logger, execute_fn=execute_refresh)
         scheduler.start()
     elif "--refresh" in sys.argv:
         execute_refresh()
+    elif "--invalidate-cache" in sys.argv:
+        # Uso: main.py --invalidate-cache [ruta_del_excel]  (sin ruta borra todas las huellas)
+        from infrastructure.fingerprint_cache import FingerprintCache
+        idx = sys.argv.index("--invalidate-cache")
+        target = sys.argv[idx + 1] if len(sys.argv) > idx + 1 else None
+        count = FingerprintCache(logger, config.get("FINGERPRINT_CACHE_FILE")).invalidate(target)
+        logger.info(f"Caché de huellas invalidada: {count} archivo(s).")
+    elif "--plan" in sys.argv:
+        sys.exit(_plan_cli(config, logger))
+    elif "--history" in sys.argv or "--history-trend" in sys.argv or "--history-compact" in sys.argv:
+        sys.exit(_history_cli(config))
     else:
         from gui.app import run
         run()
 
+def _plan_cli(config, logger):
+    """
+    Uso: main.py --plan [--paralelo N]
+    Muestra en qué orden y en qué Excel correría cada archivo activo, sin refrescar nada.
+    """
+    from application.scheduler_uc import SchedulerUseCase
+    from application.refresh_planner import RefreshPlanner
+    from application.refresh_graph import RefreshGraph
+    workers = config.get_int("REFRESH_MAX_PARALLEL", 1)
+    if "--paralelo" in sys.argv:
+        idx = sys.argv.index("--paralelo")
+        workers = _positive_int(sys.argv[idx + 1] if len(sys.argv) > idx + 1 else None)
+        if workers is None:
+            print(_plan_cli.__doc__)
+            return 2
+
+    jobs = SchedulerUseCase().jobs
+    tareas = [j for j in jobs if j.get("activo", True)]
+    if not tareas:
+        print("Aún no tienes archivos activos para actualizar.")
+        return 0
+
+    graph = RefreshGraph.from_tasks(jobs, detect_links=config.get_bool("DEPENDENCY_DETECT_LINKS", True))
+    plan = RefreshPlanner.from_config(config, logger=logger).plan(tareas, max(1, min(workers, len(tareas))), graph)
+    print(plan.format())
+    return 0
+
+
+def _ctl_cli(config):
+    """
+    Uso: main.py --ctl <comando> [archivos...]
+        status                estado, próximo disparo y lo que está en curso
+        list-jobs             libros programados con su próximo y último disparo
+        trigger-now [libros]  actualiza ya (ruta o nombre; sin libros, todos los activos)
+        reload                vuelve a leer excels.json
+        pause | resume        omite / vuelve a ejecutar los horarios
+        drain-and-stop        termina lo pendiente y detiene el scheduler
+    """
+    from infrastructure.control_channel import ControlClient, COMMANDS
+    from domain.exceptions import ControlChannelError
+    args = sys.argv[sys.argv.index("--ctl") + 1:]
+    if not args or args[0] not in COMMANDS:
+        print(_ctl_cli.__doc__)
+        return 2
+    command, rest = args[0], args[1:]
+    try:
+        if command == "trigger-now":
+            result = ControlClient.from_config(config).request(command, files=rest or None)
+        else:
+            result = ControlClient.from_config(config).request(command)
+    except ControlChannelError as e:
+        print(f"Error: {e}")
+        return 1
+
+    if command == "list-jobs":
+        if not result:
+            print("No hay libros programados.")
+        for job in result:
+            proximo = f"{job['proximo']:%Y-%m-%d %H:%M}" if job["proximo"] else "nunca"
+            ultimo = (job["ultimo_disparo"] or "-").replace("T", " ")[:16]
+            nombre = os.path.basename(job["archivo"]) + (" (dependiente)" if job["dependiente"] else "")
+            print(f"{nombre:<40} {job['horario']:<20} próximo {proximo}  último {ultimo:<16} {job['estado']}")
+    elif command == "trigger-now":
+        print(f"En cola: {', '.join(os.path.basename(f) for f in result)}" if result else "Nada nuevo en cola (ya estaban en curso o la cola está llena).")
+    elif isinstance(result, dict):
+        _print_status(result)
+    else:
+        print("Listo.")
+    return 0
+
+
+def _print_status(status):
+    estado = "deteniéndose" if status["drenando"] else ("en pausa" if status["pausado"] else "activo")
+    proximo = f"{status['proximo']:%Y-%m-%d %H:%M}" if status["proximo"] else "nunca"
+    print(f"Scheduler (pid {status['pid']}): {estado}, {status['jobs']} libros, próximo disparo {proximo}")
+    for archivo, fase in status["en_vuelo"].items():
+        print(f"  {fase:<9} {os.path.basename(archivo)}")
+    if status["lote_pendiente"]:
+        print(f"  lote abierto: {', '.join(os.path.basename(f) for f in status['lote_pendiente'])}")
+    for key, s in status["atrasos"].items():
+        print(f"  atraso '{key}': p50 {s['p50']:.2f}s, p95 {s['p95']:.2f}s, máx {s['max']:.2f}s ({s['disparos']} disparos)")
+
+
+def _history_cli(config):
+    """
+    Uso:
+        main.py --history [ruta_del_excel] [--dias N]   p50/p95/máx por libro
+        main.py --history-trend ruta_del_excel [--dias N]
+        main.py --history-compact                      aplica la retención ahora
+    """
+    from infrastructure.run_history import RunHistory, format_stats
+    args = sys.argv[1:]
+    days = 30
+    if "--dias" in args:
+        idx = args.index("--dias")
+        days = _positive_int(args[idx + 1] if len(args) > idx + 1 else None)
+        if days is None:
+            print(_history_cli.__doc__)
+            return 2
+        del args[idx:idx + 2]
+    archivo = None
+    if "--history-trend" in args:
+        archivo = _path_arg(args, "--history-trend")
+        if archivo is None:
+            print(_history_cli.__doc__)
+            return 2
+    elif "--history" in args:
+        archivo = _path_arg(args, "--history")
+
+    history = RunHistory.from_config(config)
+    if history is None:
+        print("El historial está deshabilitado (RUN_HISTORY_ENABLED=false).")
+        return 1
+
+    if "--history-compact" in args:
+        print(f"Trabajos compactados: {history.compact(force=True)}")
+    elif "--history-trend" in args:
+        for dia, n, p50, p95, maximo in history.daily(archivo, days=days):
+            print(f"{dia}  n={n:<4} p50={p50 or 0:.1f}s  p95={p95 or 0:.1f}s  máx={maximo or 0:.1f}s")
+    else:
+        print(format_stats(history.stats(archivo, days=days), days))
+    return 0
+
+
+def _positive_int(value):
+    """El número de un argumento como --dias N, o None si falta o no es un entero positivo."""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
+
+
+def _path_arg(args, flag):
+    """Lo que sigue a `flag` si es una ruta (no otra opción), o None."""
+    idx = args.index(flag)
+    if len(args) > idx + 1 and not args[idx + 1].startswith("--"):
+        return args[idx + 1]
+    return None
+
+
 def _save_key_to_env(key):
     """Guarda la clave de activación en el archivo .env manejando atributos ocultos."""
     import os
@@ -103,4 +264,6 @@ def _save_key_to_env(key):
         pass
 
 if __name__ == "__main__":
+    # Necesario para los procesos trabajadores cuando se empaqueta como .exe
+    multiprocessing.freeze_support()
     main()
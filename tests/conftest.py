@@ -0,0 +1,50 @@
+# tests/conftest.py
+
+import os
+import sys
+import logging
+
+import pytest
+
+# Los módulos se importan como en main.py, desde la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("pivoty-tests")
+
+
+class FakeClock:
+    """Reloj manual: las pruebas avanzan el tiempo con advance()."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, delta):
+        self.now += delta
+
+
+class FakeConfig:
+    """Lo mismo que ConfigLoader (get/get_bool/get_int) sobre un dict, sin tocar os.environ."""
+
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def get_bool(self, key, default=False):
+        value = self.values.get(key)
+        if value is None:
+            return default
+        return str(value).lower() in ("true", "1", "yes")
+
+    def get_int(self, key, default=0):
+        try:
+            return int(self.values.get(key))
+        except (TypeError, ValueError):
+            return default
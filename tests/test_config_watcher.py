@@ -0,0 +1,156 @@
+# tests/test_config_watcher.py
+
+import json
+import time
+import threading
+from datetime import datetime
+
+import pytest
+
+from conftest import FakeClock, FakeConfig
+from infrastructure.config_watcher import ConfigFileWatcher
+from infrastructure.scheduler_service import SchedulerService
+from infrastructure.scheduler_state import SchedulerState
+
+DEBOUNCE = 0.05
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+        self.event = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.event.set()
+
+
+def _settle():
+    time.sleep(DEBOUNCE * 6)
+
+
+@pytest.fixture
+def excels(tmp_path):
+    path = tmp_path / "excels.json"
+    path.write_text('{"excels": []}', encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def watcher(excels, logger):
+    counter = Counter()
+    watcher = ConfigFileWatcher(logger, str(excels), counter, debounce=DEBOUNCE, poll_interval=0.02)
+    yield watcher, counter
+    watcher.stop()
+
+
+def test_save_without_changes_does_not_notify(excels, watcher):
+    watcher, counter = watcher
+    excels.write_text('{"excels": []}', encoding="utf-8") # El editor vuelve a guardar lo mismo
+    watcher._on_directory_change(str(excels.parent))
+    _settle()
+    assert counter.calls == 0
+
+
+def test_other_files_in_folder_do_not_notify(excels, watcher):
+    watcher, counter = watcher
+    (excels.parent / "scheduler_state.json").write_text("{}", encoding="utf-8")
+    watcher._on_directory_change(str(excels.parent))
+    _settle()
+    assert counter.calls == 0
+
+
+def test_burst_of_writes_notifies_once(excels, watcher):
+    watcher, counter = watcher
+    for n in range(5): # Un editor que guarda en varias escrituras seguidas
+        excels.write_text(json.dumps({"excels": [{"path": f"libro{n}.xlsx"}]}), encoding="utf-8")
+        watcher._on_directory_change(str(excels.parent))
+        time.sleep(DEBOUNCE / 5)
+    _settle()
+    assert counter.calls == 1
+
+    # Ya se tomó el contenido final: otra señal sin cambios no vuelve a avisar
+    watcher._on_directory_change(str(excels.parent))
+    _settle()
+    assert counter.calls == 1
+
+
+def test_mark_current_skips_changes_already_applied(excels, watcher):
+    watcher, counter = watcher
+    excels.write_text('{"excels": [{"path": "ventas.xlsx"}]}', encoding="utf-8")
+    watcher.mark_current() # La GUI guardó y recargó por su cuenta
+    watcher._on_directory_change(str(excels.parent))
+    _settle()
+    assert counter.calls == 0
+
+
+def test_polling_watcher_notifies_on_disk_change(excels, watcher):
+    watcher, counter = watcher
+    watcher.start()
+    time.sleep(0.1) # Primera foto de la carpeta
+    excels.write_text('{"excels": [{"path": "ventas.xlsx"}]}', encoding="utf-8")
+    assert counter.event.wait(2)
+    _settle()
+    assert counter.calls == 1
+
+
+# --------------------------
+# Recarga del scheduler: solo se aplican las diferencias
+# --------------------------
+def _write_jobs(tmp_path, jobs):
+    (tmp_path / "config" / "excels.json").write_text(json.dumps({"excels": jobs}), encoding="utf-8")
+
+
+def _scheduler(tmp_path, logger, now):
+    """Scheduler sin subprocesos, sin watcher ni canal de control, con el reloj fijo en `now`."""
+    config = FakeConfig({
+        "REFRESH_IN_SUBPROCESS": "false",
+        "SCHEDULER_WATCH_CONFIG": "false",
+        "SCHEDULER_CONTROL_ENABLED": "false",
+        "DEPENDENCY_DETECT_LINKS": "false",
+        "SCHEDULER_STATE_FILE": str(tmp_path / "state.json"),
+    })
+    return SchedulerService(config, logger, execute_fn=lambda files: None, clock=FakeClock(now))
+
+
+def test_reload_changing_group_files_keeps_next_trigger(tmp_path, monkeypatch, logger):
+    ventas, clientes, stock = (str(tmp_path / n) for n in ("ventas.xlsx", "clientes.xlsx", "stock.xlsx"))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config").mkdir()
+    _write_jobs(tmp_path, [{"path": ventas, "horario": "07:00"}, {"path": stock, "horario": "18:00"}])
+    # Las 07:00 del 20 se perdieron: el disparo queda vencido hasta la próxima vuelta del timer
+    SchedulerState(logger, path=str(tmp_path / "state.json")).record(
+        [ventas], "07:00", datetime(2024, 3, 19, 7, 0), datetime(2024, 3, 19, 7, 0), datetime(2024, 3, 20, 7, 0)
+    )
+    service = _scheduler(tmp_path, logger, datetime(2024, 3, 20, 9, 0))
+    service._register_jobs()
+    assert service.timer.next_due("07:00") == datetime(2024, 3, 20, 7, 0)
+    assert service.timer.next_due("18:00") == datetime(2024, 3, 20, 18, 0)
+
+    # clientes se suma al grupo de las 07:00 y stock se quita
+    _write_jobs(tmp_path, [{"path": ventas, "horario": "07:00"}, {"path": clientes, "horario": "07:00"}])
+    service.reload_jobs()
+    assert service.timer.next_due("07:00") == datetime(2024, 3, 20, 7, 0) # Sigue vencido: no se reprogramó desde ahora
+    assert service.timer.next_due("18:00") is None
+    assert service.state.entry(clientes)["proximo"] == "2024-03-20T07:00:00"
+
+    # El disparo pendiente ya ejecuta los libros nuevos
+    submitted = []
+    monkeypatch.setattr(service.executor, "submit", lambda files, times=1: submitted.append(list(files)))
+    for entry, planned, actual in service.timer._pop_due():
+        service.timer._fire(entry, planned, actual)
+    assert submitted == [[ventas, clientes]]
+
+
+def test_reload_with_same_jobs_does_nothing(tmp_path, monkeypatch, logger):
+    ventas = str(tmp_path / "ventas.xlsx")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config").mkdir()
+    _write_jobs(tmp_path, [{"path": ventas, "horario": "07:00"}])
+    service = _scheduler(tmp_path, logger, datetime(2024, 3, 20, 6, 0))
+    service._register_jobs()
+    groups = service._groups
+    monkeypatch.setattr(service, "_apply_groups", lambda *a, **k: pytest.fail("no debería reprogramar"))
+    _write_jobs(tmp_path, [{"path": ventas, "horario": "07:00"}])
+    service.reload_jobs()
+    assert service._groups is groups
@@ -0,0 +1,38 @@
+# tests/test_connection_selection.py
+
+from domain.connection_selection import ConnectionSelection
+
+CONNECTIONS = [
+    ("Resumen", 7), # Modelo de datos
+    ("Ventas_2024", 1),
+    ("Clientes", 2),
+    ("Ventas_Histórico", 1),
+    ("Tipo de cambio", 4),
+]
+
+
+def test_without_options_uses_refresh_all():
+    selection = ConnectionSelection.from_job({"path": "libro.xlsx"})
+    assert selection.refresh_all
+    assert selection.select(CONNECTIONS) == [name for name, _ in CONNECTIONS]
+
+
+def test_include_with_wildcards_is_case_insensitive():
+    selection = ConnectionSelection.from_job({"conexiones": {"incluir": ["ventas*", "CLIENTES"]}})
+    assert not selection.refresh_all
+    assert selection.select(CONNECTIONS) == ["Ventas_2024", "Clientes", "Ventas_Histórico"]
+
+
+def test_exclude_wins_over_include():
+    selection = ConnectionSelection(incluir=["Ventas*"], excluir=["*histórico"])
+    assert selection.select(CONNECTIONS) == ["Ventas_2024"]
+
+
+def test_queries_first_keeps_workbook_order_within_groups():
+    selection = ConnectionSelection(queries_primero=True)
+    assert selection.select(CONNECTIONS) == ["Ventas_2024", "Clientes", "Ventas_Histórico", "Tipo de cambio", "Resumen"]
+
+
+def test_unmatched_includes():
+    selection = ConnectionSelection(incluir=["Ventas*", "Inventario"])
+    assert selection.unmatched_includes([name for name, _ in CONNECTIONS]) == ["inventario"]
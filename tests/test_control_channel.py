@@ -0,0 +1,104 @@
+# tests/test_control_channel.py
+
+import os
+import json
+import shutil
+import tempfile
+
+import pytest
+
+from domain.exceptions import ControlChannelError
+from infrastructure.control_channel import ControlServer, ControlClient, RemoteScheduler
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="El canal de prueba usa un socket Unix")
+
+
+class StubScheduler:
+    def __init__(self):
+        self.triggered = []
+
+    def status(self):
+        return {"pid": os.getpid(), "pausado": False, "jobs": 2}
+
+    def trigger_now(self, files=None):
+        self.triggered.append(files)
+        return files or ["a.xlsx", "b.xlsx"]
+
+    def reload(self):
+        raise RuntimeError("excels.json no es JSON válido")
+
+
+@pytest.fixture
+def channel(logger):
+    # Los sockets Unix tienen un límite de ~100 caracteres en la ruta: carpeta corta en /tmp
+    directory = tempfile.mkdtemp(prefix="pivoty-")
+    stub = StubScheduler()
+    server = ControlServer(
+        logger,
+        {"status": stub.status, "trigger-now": stub.trigger_now, "reload": stub.reload},
+        address=os.path.join(directory, "control.sock"),
+        endpoint_file=os.path.join(directory, "scheduler_control.json"),
+    )
+    server.start()
+    client = ControlClient(endpoint_file=server.endpoint_file, timeout=5)
+    yield server, client, stub
+    server.stop()
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_status_round_trip(channel):
+    _, client, _ = channel
+    assert client.request("status") == {"pid": os.getpid(), "pausado": False, "jobs": 2}
+    assert client.is_available()
+
+
+def test_trigger_now_passes_arguments(channel):
+    _, client, stub = channel
+    assert client.request("trigger-now", files=["ventas.xlsx"]) == ["ventas.xlsx"]
+    assert client.request("trigger-now") == ["a.xlsx", "b.xlsx"]
+    assert stub.triggered == [["ventas.xlsx"], None]
+
+
+def test_unknown_command_is_rejected(channel):
+    _, client, _ = channel
+    with pytest.raises(ControlChannelError, match="Comando desconocido: borrar-todo"):
+        client.request("borrar-todo")
+
+
+def test_handler_error_is_returned_to_the_client(channel):
+    _, client, _ = channel
+    with pytest.raises(ControlChannelError, match="no es JSON válido"):
+        client.request("reload")
+    assert client.request("status")["jobs"] == 2 # El servidor sigue atendiendo
+
+
+def test_wrong_authkey_is_refused(channel, tmp_path):
+    server, client, _ = channel
+    with open(server.endpoint_file, encoding="utf-8") as f:
+        data = json.load(f)
+    data["clave"] = os.urandom(32).hex()
+    forged = tmp_path / "forged.json"
+    forged.write_text(json.dumps(data), encoding="utf-8")
+
+    with pytest.raises(ControlChannelError):
+        ControlClient(endpoint_file=str(forged), timeout=5).request("status")
+    assert client.request("status")["jobs"] == 2 # Un intento fallido no tumba el canal
+
+
+def test_endpoint_file_is_removed_on_stop(channel):
+    server, client, _ = channel
+    assert os.path.exists(server.endpoint_file)
+    server.stop()
+    assert not os.path.exists(server.endpoint_file)
+    assert not client.is_available()
+    with pytest.raises(ControlChannelError, match="No hay un scheduler corriendo"):
+        client.request("status")
+
+
+def test_remote_scheduler_logs_instead_of_raising(channel, logger):
+    server, client, stub = channel
+    remote = RemoteScheduler(client, logger)
+    assert remote.trigger_now(["ventas.xlsx"]) == ["ventas.xlsx"]
+    assert remote.pause() is None # Comando que el stub no atiende
+    server.stop()
+    assert remote.status() is None
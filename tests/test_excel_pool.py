@@ -0,0 +1,106 @@
+# tests/test_excel_pool.py
+
+import pytest
+
+from infrastructure.excel_backend import FakeExcelBackend, FakeComError
+from infrastructure.excel_pool import ExcelPool
+
+
+class FakeSupervisor:
+    def __init__(self, dead=()):
+        self.dead = set(dead)
+        self.registered = []
+        self.retired = []
+
+    def register(self, pid):
+        self.registered.append(pid)
+
+    def assign(self, pid, job):
+        pass
+
+    def retire(self, pid):
+        self.retired.append(pid)
+
+    def is_alive(self, pid):
+        return pid not in self.dead
+
+
+def test_reuses_warm_instance(logger):
+    backend = FakeExcelBackend()
+    pool = ExcelPool(backend, logger, max_idle=1, max_uses=10)
+    for _ in range(5):
+        with pool.lease() as app:
+            app.Workbooks.append("libro.xlsx")
+    pool.shutdown()
+    assert backend.created == 1
+    assert backend.quit == 1
+    assert pool.stats == {"created": 1, "reused": 4, "closed": 1}
+
+
+def test_recycles_after_max_uses(logger):
+    backend = FakeExcelBackend()
+    pool = ExcelPool(backend, logger, max_idle=1, max_uses=2)
+    for _ in range(4):
+        with pool.lease():
+            pass
+    pool.shutdown()
+    assert backend.created == 2
+    assert backend.quit == 2
+
+
+def test_com_error_discards_instance(logger):
+    backend = FakeExcelBackend()
+    pool = ExcelPool(backend, logger, max_idle=1)
+    with pytest.raises(FakeComError):
+        with pool.lease():
+            raise FakeComError("RPC_E_DISCONNECTED")
+    with pool.lease():
+        pass
+    assert backend.created == 2
+
+
+def test_recycles_when_memory_limit_exceeded(logger):
+    backend = FakeExcelBackend(memory_bytes=100 * 1024 * 1024, memory_growth_bytes=60 * 1024 * 1024)
+    pool = ExcelPool(backend, logger, max_idle=1, max_memory_mb=200)
+    for _ in range(3):
+        with pool.lease():
+            pass
+    assert backend.created == 2 # 100 -> 160 MB sigue; 160 -> 220 MB se recicla
+
+
+def test_disabled_pool_opens_one_instance_per_lease(logger):
+    backend = FakeExcelBackend()
+    pool = ExcelPool(backend, logger, max_idle=0)
+    for _ in range(3):
+        with pool.lease():
+            pass
+    assert backend.created == 3
+    assert backend.quit == 3
+
+
+def test_idle_instance_killed_by_supervisor_is_replaced(logger):
+    backend = FakeExcelBackend()
+    supervisor = FakeSupervisor()
+    pool = ExcelPool(backend, logger, max_idle=1, supervisor=supervisor)
+    with pool.lease() as app:
+        first_pid = app.pid
+    supervisor.dead.add(first_pid)
+    with pool.lease() as app:
+        assert app.pid != first_pid
+    assert backend.created == 2
+    assert supervisor.registered == [first_pid, app.pid]
+
+
+def test_instance_without_pid_is_reused(logger):
+    class NoPidBackend(FakeExcelBackend):
+        def get_pid(self, app):
+            return None
+
+    backend = NoPidBackend()
+    supervisor = FakeSupervisor(dead={None}) # Sin PID el supervisor no puede confirmarla viva
+    pool = ExcelPool(backend, logger, max_idle=1, supervisor=supervisor)
+    for _ in range(3):
+        with pool.lease():
+            pass
+    assert backend.created == 1
+    assert pool.stats["reused"] == 2
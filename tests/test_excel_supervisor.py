@@ -0,0 +1,170 @@
+# tests/test_excel_supervisor.py
+
+import os
+import json
+import signal
+import subprocess
+import time
+
+import pytest
+
+from infrastructure.excel_supervisor import ExcelSupervisor
+from infrastructure.process_control import PosixProcessControl
+
+pytestmark = pytest.mark.skipif(os.name == "nt", reason="Usa /proc y procesos hijos POSIX")
+
+
+@pytest.fixture
+def spawn():
+    """Lanza procesos `sleep` que hacen de EXCEL.EXE; al final se matan los que queden."""
+    children = []
+
+    def start():
+        child = subprocess.Popen(["sleep", "60"])
+        children.append(child)
+        # Hasta el exec el hijo todavía se llama como el proceso de pytest
+        deadline = time.monotonic() + 5
+        while PosixProcessControl().name(child.pid) != "sleep" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return child
+
+    yield start
+    for child in children:
+        if child.poll() is None:
+            child.kill()
+        child.wait()
+
+
+def _supervisor(logger, tmp_path, now, **kwargs):
+    return ExcelSupervisor(logger, str(tmp_path / "registro"), control=PosixProcessControl(),
+                           check_interval=3600, clock=lambda: now[0], **kwargs)
+
+
+def test_posix_process_control_reads_proc(spawn):
+    control = PosixProcessControl()
+    child = spawn()
+    assert control.exists(child.pid)
+    assert control.name(child.pid) == "sleep"
+    assert control.create_time(child.pid) == control.create_time(child.pid)
+    assert control.memory_bytes(child.pid) > 0
+    control.kill(child.pid)
+    child.wait()
+    assert not control.exists(child.pid)
+
+
+def test_kills_instance_past_job_deadline(logger, tmp_path, spawn):
+    now = [1000.0]
+    supervisor = _supervisor(logger, tmp_path, now, job_deadline=600)
+    child = spawn()
+    supervisor.register(child.pid)
+    supervisor.assign(child.pid, "ventas.xlsx")
+
+    now[0] += 599
+    assert supervisor.check() == []
+    now[0] += 2
+    assert supervisor.check() == [child.pid]
+    assert child.wait(timeout=5) == -signal.SIGKILL
+    assert not supervisor.is_alive(child.pid)
+    supervisor.stop()
+
+
+def test_kills_retired_instance_after_grace(logger, tmp_path, spawn):
+    now = [1000.0]
+    supervisor = _supervisor(logger, tmp_path, now, retire_grace=30)
+    child = spawn()
+    supervisor.register(child.pid)
+    supervisor.retire(child.pid) # Quit "falló": el proceso sigue vivo
+
+    now[0] += 30
+    assert supervisor.check() == []
+    assert supervisor.is_alive(child.pid)
+    now[0] += 1
+    assert supervisor.check() == [child.pid]
+    child.wait(timeout=5)
+    supervisor.stop()
+
+
+def test_kills_stopped_instance_after_hang_seconds(logger, tmp_path, spawn):
+    now = [1000.0]
+    supervisor = _supervisor(logger, tmp_path, now, hang_seconds=60)
+    child = spawn()
+    supervisor.register(child.pid)
+    os.kill(child.pid, signal.SIGSTOP) # Detenido = no responde y no usa CPU
+    _wait_stopped(child.pid)
+
+    assert supervisor.check() == [] # Empieza a contar
+    now[0] += 61
+    assert supervisor.check() == [child.pid]
+    child.wait(timeout=5)
+    supervisor.stop()
+
+
+def _wait_stopped(pid, timeout=5):
+    control = PosixProcessControl()
+    deadline = time.monotonic() + timeout
+    while control.is_responding(pid) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_registry_file_lists_registered_pids(logger, tmp_path, spawn):
+    supervisor = _supervisor(logger, tmp_path, [0.0])
+    child = spawn()
+    supervisor.register(child.pid)
+    with open(tmp_path / "registro" / f"{os.getpid()}.json", encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["owner"]["pid"] == os.getpid()
+    assert data["procesos"][str(child.pid)]["nombre"] == "sleep"
+    supervisor.stop()
+
+
+def _write_registry(tmp_path, owner_pid, owner_created, child):
+    control = PosixProcessControl()
+    registry = tmp_path / "registro"
+    registry.mkdir(exist_ok=True)
+    path = registry / f"{owner_pid}.json"
+    path.write_text(json.dumps({
+        "owner": {"pid": owner_pid, "creado": owner_created},
+        "procesos": {str(child.pid): {
+            "nombre": control.name(child.pid), "creado": control.create_time(child.pid),
+            "job": "ventas.xlsx", "job_inicio": 0, "retirado": None,
+        }},
+    }), encoding="utf-8")
+    return path
+
+
+def test_sweep_kills_excel_left_by_a_dead_bot(logger, tmp_path, spawn):
+    dead_owner = subprocess.Popen(["true"])
+    dead_owner.wait()
+    child = spawn()
+    path = _write_registry(tmp_path, dead_owner.pid, 123.0, child)
+
+    supervisor = _supervisor(logger, tmp_path, [0.0])
+    assert supervisor.sweep_orphans() == 1
+    assert child.wait(timeout=5) == -signal.SIGKILL
+    assert not path.exists()
+
+
+def test_sweep_leaves_excel_of_a_running_bot(logger, tmp_path, spawn):
+    control = PosixProcessControl()
+    owner = spawn() # Otro bot que sigue corriendo
+    child = spawn()
+    path = _write_registry(tmp_path, owner.pid, control.create_time(owner.pid), child)
+
+    supervisor = _supervisor(logger, tmp_path, [0.0])
+    assert supervisor.sweep_orphans() == 0
+    assert control.exists(child.pid)
+    assert path.exists()
+
+
+def test_sweep_ignores_reused_pid(logger, tmp_path, spawn):
+    dead_owner = subprocess.Popen(["true"])
+    dead_owner.wait()
+    child = spawn()
+    path = _write_registry(tmp_path, dead_owner.pid, 123.0, child)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["procesos"][str(child.pid)]["creado"] = -1 # Otro proceso con el mismo PID
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    supervisor = _supervisor(logger, tmp_path, [0.0])
+    assert supervisor.sweep_orphans() == 0
+    assert PosixProcessControl().exists(child.pid)
@@ -0,0 +1,81 @@
+# tests/test_execute_refresh.py
+
+from datetime import datetime
+
+import pytz
+
+from conftest import FakeConfig
+from application import execute_refresh_uc
+
+JOBS = [{"path": "primero.xlsx", "activo": True}, {"path": "segundo.xlsx", "activo": True}]
+
+
+class FakeNotifier:
+    def __init__(self):
+        self.emails = []
+
+    def send_email(self, subject, body, attachments=None, screenshots=None):
+        self.emails.append({"asunto": subject, "cuerpo": body, "adjuntos": attachments, "capturas": screenshots})
+
+
+class FakeContext:
+    def __init__(self, logger, jobs):
+        self.config = FakeConfig({
+            "REFRESH_MAX_PARALLEL": 2,
+            "DEPENDENCY_DETECT_LINKS": "false",
+            "RUN_HISTORY_ENABLED": "false",
+            "SCREENSHOT_ON_ERROR": "false",
+            "TIMING_ENABLED": "false",
+        })
+        self.logger = logger
+        self.notifier = FakeNotifier()
+        self.tz = pytz.UTC
+        self.fingerprints = None
+        self._jobs = jobs
+
+    def refresh(self):
+        return self
+
+    def jobs(self):
+        return list(self._jobs)
+
+
+class ReversingPlanner:
+    """Planner que ejecuta las tareas al revés de como llegan."""
+
+    @classmethod
+    def from_config(cls, config, history=None, logger=None):
+        return cls()
+
+    def plan(self, tareas, workers=1, graph=None):
+        return ReversedPlan(list(reversed(tareas)))
+
+
+class ReversedPlan:
+    def __init__(self, ordered_tasks):
+        self.ordered_tasks = ordered_tasks
+        self.predicted_finish = datetime(2024, 3, 18, 7, 0)
+        self.makespan = 0
+
+    def late_jobs(self):
+        return []
+
+
+def test_report_keeps_input_order_when_the_plan_reorders(monkeypatch, tmp_path, logger):
+    monkeypatch.chdir(tmp_path)
+    executed = []
+
+    def fake_run_tasks(tareas, *args, **kwargs):
+        executed.extend(t["path"] for t in tareas)
+        return [{"archivo": t["path"], "estado": "ERROR", "error": "simulado", "fallback": False} for t in tareas]
+
+    monkeypatch.setattr(execute_refresh_uc, "RefreshPlanner", ReversingPlanner)
+    monkeypatch.setattr(execute_refresh_uc, "_run_tasks", fake_run_tasks)
+    context = FakeContext(logger, JOBS)
+
+    resultados = execute_refresh_uc.execute_refresh(context=context)
+
+    assert executed == ["segundo.xlsx", "primero.xlsx"]
+    assert [r["archivo"] for r in resultados] == ["primero.xlsx", "segundo.xlsx"]
+    [email] = context.notifier.emails
+    assert email["cuerpo"].index("primero.xlsx") < email["cuerpo"].index("segundo.xlsx")
@@ -0,0 +1,82 @@
+# tests/test_fake_excel_com.py
+
+import pytest
+
+from infrastructure.excel_backend import FakeComError
+from infrastructure.excel_pool import ExcelPool
+from infrastructure.fake_excel_com import FakeComExcelBackend, FakeExcelProfile, XL_CALCULATION_DONE
+from infrastructure.retry_policy import classify_error, TRANSIENT, PERMANENT
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    path = tmp_path / "ventas.xlsx"
+    path.write_bytes(b"")
+    return str(path)
+
+
+def _backend(profile=None, seed=1):
+    slept = []
+    backend = FakeComExcelBackend(FakeExcelProfile.from_dict(profile), seed=seed, sleep=slept.append)
+    return backend, slept
+
+
+def test_full_refresh_cycle_is_counted(workbook_path):
+    backend, slept = _backend({
+        "latencias": {"arranque": 2.0, "abrir": 1.0, "conexion": 0.5, "guardar": 0.25},
+        "conexiones": 2,
+    })
+    app = backend.create_application()
+    wb = app.Workbooks.Open(workbook_path)
+    assert [c.Name for c in wb.Connections] == ["Consulta - 1", "Consulta - 2"]
+    wb.RefreshAll()
+    assert app.CalculateState == XL_CALCULATION_DONE
+    wb.Save()
+    wb.Close(SaveChanges=False)
+
+    assert slept == [2.0, 1.0, 0.5, 0.5, 0.25]
+    stats = backend.stats
+    assert (stats["instancias"], stats["libros_abiertos"], stats["refresh"], stats["guardados"]) == (1, 1, 1, 1)
+    assert stats["segundos_simulados"] == pytest.approx(4.25)
+    assert len(app.Workbooks) == 0
+
+
+def test_missing_file_raises_com_error(tmp_path):
+    backend, _ = _backend()
+    app = backend.create_application()
+    with pytest.raises(FakeComError) as info:
+        app.Workbooks.Open(str(tmp_path / "no_existe.xlsx"))
+    assert classify_error(info.value) == PERMANENT
+
+
+@pytest.mark.parametrize("permanent_share, expected", [(0.0, TRANSIENT), (1.0, PERMANENT)])
+def test_injected_failures_follow_the_profile(workbook_path, permanent_share, expected):
+    backend, _ = _backend({"fallos": {"refresh": 1.0}, "proporcion_permanentes": permanent_share})
+    wb = backend.create_application().Workbooks.Open(workbook_path)
+    with pytest.raises(FakeComError) as info:
+        wb.RefreshAll()
+    assert classify_error(info.value) == expected
+    assert backend.stats["fallos_inyectados"] == 1
+
+
+def test_same_seed_gives_same_latencies(workbook_path):
+    profile = {"latencias": {"abrir": {"dist": "lognormal", "media": 1.5, "sigma": 0.4}}}
+    runs = []
+    for _ in range(2):
+        backend, slept = _backend(profile, seed=42)
+        app = backend.create_application()
+        for _ in range(5):
+            app.Workbooks.Open(workbook_path).Close()
+        runs.append(slept)
+    assert runs[0] == runs[1]
+    assert len(set(runs[0])) == 5
+
+
+def test_pool_recycles_instance_that_grew_past_memory_limit(logger, workbook_path):
+    backend, _ = _backend()
+    pool = ExcelPool(backend, logger, max_idle=1, max_uses=0, max_memory_mb=200)
+    for _ in range(4):
+        with pool.lease() as app:
+            app.Workbooks.Open(workbook_path)
+    # 150 MB al arrancar + 20 MB por libro abierto: se recicla al pasar de 200 MB
+    assert backend.stats["instancias"] == 2
@@ -0,0 +1,43 @@
+# tests/test_hedged_refresh.py
+
+from datetime import datetime, timedelta
+
+from conftest import FakeConfig
+from application.hedged_refresh import HedgePolicy
+from infrastructure.run_history import RunHistory
+
+JOB = {"path": "ventas.xlsx", "backup": "ventas_backup.xlsx", "hedge": True}
+
+
+def _history(tmp_path, durations):
+    history = RunHistory(str(tmp_path / "run_history.db"))
+    inicio = datetime(2024, 3, 18, 7, 0)
+    for n, duracion in enumerate(durations):
+        history.record_run(f"r{n}", inicio + timedelta(days=n), inicio + timedelta(days=n, seconds=duracion),
+                           [{"archivo": JOB["path"], "estado": "OK", "duracion": duracion, "fallback": False}])
+    return history
+
+
+def test_threshold_from_run_history_p95(tmp_path):
+    history = _history(tmp_path, [100.0] * 19 + [200.0])
+    policy = HedgePolicy.from_job(JOB, FakeConfig({"HEDGE_P95_FACTOR": 1.5}), history)
+    assert policy.p95 == 100.0
+    assert policy.threshold_seconds == 150.0
+
+
+def test_only_recent_runs_count(tmp_path):
+    history = _history(tmp_path, [1000.0] * 5 + [100.0] * 5)
+    policy = HedgePolicy.from_job(JOB, FakeConfig({"HEDGE_HISTORY_RUNS": 5}), history)
+    assert policy.p95 == 100.0
+
+
+def test_without_history_only_fixed_threshold(tmp_path):
+    history = _history(tmp_path, [])
+    assert HedgePolicy.from_job(JOB, FakeConfig(), history) is None
+    policy = HedgePolicy.from_job(dict(JOB, hedge={"umbral_segundos": 900}), FakeConfig(), history)
+    assert policy.threshold_seconds == 900.0
+
+
+def test_no_hedging_without_backup(tmp_path):
+    history = _history(tmp_path, [100.0])
+    assert HedgePolicy.from_job({"path": "ventas.xlsx", "hedge": True}, FakeConfig(), history) is None
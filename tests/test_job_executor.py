@@ -0,0 +1,147 @@
+# tests/test_job_executor.py
+
+import threading
+
+import pytest
+
+from infrastructure.job_executor import JobExecutor, OVERLAP_DROP
+
+TIMEOUT = 5
+
+
+class BlockingRun:
+    """run_fn que se queda esperando hasta que la prueba lo suelta con release()."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Semaphore(0)
+        self._gate = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, files):
+        with self._lock:
+            self.calls.append(list(files))
+        self.started.release()
+        assert self._gate.wait(TIMEOUT)
+
+    def wait_started(self):
+        assert self.started.acquire(timeout=TIMEOUT)
+
+    def release(self):
+        self._gate.set()
+
+
+@pytest.fixture
+def run_fn():
+    run = BlockingRun()
+    yield run
+    run.release()
+
+
+def _finish(executor):
+    executor.shutdown(cancel_pending=False)
+    executor.join(TIMEOUT)
+    assert not any(t.is_alive() for t in executor._threads)
+
+
+def test_trigger_joins_run_already_in_flight(logger, run_fn):
+    executor = JobExecutor(logger, run_fn, size=2)
+    assert executor.submit(["a.xlsx"]) == ["a.xlsx"]
+    run_fn.wait_started()
+    assert executor.in_flight() == {"a.xlsx": "en curso"}
+
+    # a.xlsx se une a la corrida en curso; solo b.xlsx lanza otra
+    assert executor.submit(["a.xlsx", "b.xlsx"]) == ["b.xlsx"]
+    run_fn.wait_started()
+    run_fn.release()
+    _finish(executor)
+    assert sorted(run_fn.calls) == [["a.xlsx"], ["b.xlsx"]]
+    assert executor.in_flight() == {}
+
+
+def test_drop_policy_discards_overlapping_trigger(logger, run_fn):
+    executor = JobExecutor(logger, run_fn, size=2, overlap_policy=OVERLAP_DROP)
+    executor.submit(["a.xlsx"])
+    run_fn.wait_started()
+    assert executor.submit(["a.xlsx"]) == []
+    run_fn.release()
+    _finish(executor)
+    assert run_fn.calls == [["a.xlsx"]]
+
+
+def test_full_queue_rejects_new_runs(logger, run_fn):
+    executor = JobExecutor(logger, run_fn, size=1, queue_size=1)
+    executor.submit(["a.xlsx"])
+    run_fn.wait_started()
+    assert executor.submit(["b.xlsx"]) == ["b.xlsx"] # Espera en la cola
+    assert executor.in_flight() == {"a.xlsx": "en curso", "b.xlsx": "en cola"}
+    assert executor.submit(["c.xlsx"]) == [] # Cola llena
+    run_fn.release()
+    _finish(executor)
+    assert run_fn.calls == [["a.xlsx"], ["b.xlsx"]]
+
+
+def test_times_repeats_the_run(logger):
+    calls = []
+    done = threading.Event()
+
+    def run(files):
+        calls.append(files)
+        if len(calls) == 3:
+            done.set()
+
+    executor = JobExecutor(logger, run, size=1)
+    executor.submit(["a.xlsx"], times=3)
+    assert done.wait(TIMEOUT)
+    _finish(executor)
+    assert calls == [["a.xlsx"]] * 3
+
+
+def test_shutdown_stops_repetitions_and_drops_queued_runs(logger, run_fn):
+    executor = JobExecutor(logger, run_fn, size=1)
+    executor.submit(["a.xlsx"], times=3)
+    run_fn.wait_started()
+    executor.submit(["b.xlsx"])
+    executor.shutdown()
+    assert executor.submit(["c.xlsx"]) == []
+    run_fn.release()
+    executor.join(TIMEOUT)
+    assert run_fn.calls == [["a.xlsx"]]
+    assert executor.in_flight() == {}
+
+
+def test_failed_run_does_not_stop_the_executor(logger):
+    calls = []
+
+    def run(files):
+        calls.append(files)
+        if files == ["a.xlsx"]:
+            raise RuntimeError("Excel no responde")
+
+    executor = JobExecutor(logger, run, size=1)
+    executor.submit(["a.xlsx"])
+    executor.submit(["b.xlsx"])
+    _finish(executor)
+    assert calls == [["a.xlsx"], ["b.xlsx"]]
+
+
+def test_dead_thread_is_replaced_and_frees_its_workbooks(logger, monkeypatch):
+    monkeypatch.setattr(threading, "excepthook", lambda args: None) # El hilo muere a propósito
+    done = threading.Event()
+
+    def run(files):
+        if files == ["a.xlsx"]:
+            raise SystemExit # No es Exception: mata el hilo
+        done.set()
+
+    executor = JobExecutor(logger, run, size=1)
+    executor.submit(["a.xlsx"])
+    [dead] = executor._threads
+    dead.join(TIMEOUT)
+    assert not dead.is_alive()
+    assert executor.in_flight() == {}
+
+    assert executor.submit(["a.xlsx", "b.xlsx"]) == ["a.xlsx", "b.xlsx"]
+    assert done.wait(TIMEOUT)
+    _finish(executor)
+    assert dead not in executor._threads
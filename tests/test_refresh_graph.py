@@ -0,0 +1,116 @@
+# tests/test_refresh_graph.py
+
+import os
+
+import pytest
+
+from conftest import FakeConfig
+from application import execute_refresh_uc
+from application.refresh_graph import RefreshGraph, SKIPPED_UPSTREAM
+from application.refresh_queue import RefreshJobQueue
+from infrastructure.excel_backend import FakeExcelBackend, set_backend_factory
+from infrastructure.screenshot_service import NULL_SCREENSHOTS
+
+# base -> ventas -> resumen ; base -> clientes ; ciclo_a <-> ciclo_b -> tras_ciclo
+TAREAS = [
+    {"path": "resumen.xlsx", "depends_on": ["ventas.xlsx"]},
+    {"path": "ventas.xlsx", "depends_on": "base.xlsx"},
+    {"path": "clientes.xlsx", "depends_on": ["base.xlsx"]},
+    {"path": "base.xlsx"},
+    {"path": "ciclo_a.xlsx", "depends_on": "ciclo_b.xlsx"},
+    {"path": "ciclo_b.xlsx", "depends_on": "ciclo_a.xlsx"},
+    {"path": "tras_ciclo.xlsx", "depends_on": "ciclo_b.xlsx"},
+]
+
+
+def _graph(tareas=TAREAS, logger=None):
+    return RefreshGraph.from_tasks(tareas, logger, detect_links=False)
+
+
+def test_depends_on_builds_upstream_and_downstream():
+    graph = _graph()
+    assert graph.upstream("resumen.xlsx") == {"ventas.xlsx"}
+    assert graph.downstream("base.xlsx") == {"ventas.xlsx", "clientes.xlsx"}
+    assert sorted(graph.descendants(["base.xlsx"])) == ["clientes.xlsx", "resumen.xlsx", "ventas.xlsx"]
+
+
+def test_unknown_dependency_is_ignored(logger):
+    graph = _graph([{"path": "a.xlsx", "depends_on": "no_esta.xlsx"}], logger)
+    assert not graph
+    assert graph.upstream("a.xlsx") == set()
+
+
+def test_dependency_by_name_only_when_unique():
+    tareas = [{"path": os.path.join("norte", "base.xlsx")}, {"path": os.path.join("sur", "base.xlsx")},
+              {"path": "ventas.xlsx", "depends_on": "base.xlsx"}, {"path": "clientes.xlsx", "depends_on": "ventas.xlsx"}]
+    graph = _graph(tareas)
+    assert graph.upstream("ventas.xlsx") == set() # Ambiguo: hay dos base.xlsx
+    assert graph.upstream("clientes.xlsx") == {"ventas.xlsx"}
+
+
+def test_for_run_blocks_cycles_and_their_dependents():
+    upstream, blocked = _graph().for_run(TAREAS)
+    assert upstream[0] == {1}
+    assert upstream[1] == {3}
+    assert blocked == {4, 5, 6}
+
+
+def test_for_run_ignores_dependencies_outside_the_run():
+    tareas = [TAREAS[0], TAREAS[1]] # Sin base.xlsx
+    upstream, blocked = _graph().for_run(tareas)
+    assert upstream == {0: {1}}
+    assert blocked == set()
+
+
+def test_queue_releases_dependents_in_order(logger):
+    upstream, _ = _graph().for_run(TAREAS[:4])
+    queue = RefreshJobQueue(TAREAS[:4], logger, upstream=upstream)
+    order = []
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        order.append(item[1]["path"])
+        assert queue.task_done(item[0]) == []
+    # Entre los listos sale el de menor índice: resumen apenas termina ventas
+    assert order == ["base.xlsx", "ventas.xlsx", "resumen.xlsx", "clientes.xlsx"]
+
+
+def test_failed_job_skips_its_dependents_in_cascade(logger):
+    upstream, _ = _graph().for_run(TAREAS[:4])
+    queue = RefreshJobQueue(TAREAS[:4], logger, upstream=upstream)
+    idx, _ = queue.get()
+    assert idx == 3 # base.xlsx
+    skipped = queue.task_done(idx, ok=False)
+    assert sorted((child, failed) for child, _, failed in skipped) == [(0, 1), (1, 3), (2, 3)]
+    assert queue.get() is None
+
+
+@pytest.fixture
+def fake_excel():
+    previous = set_backend_factory(FakeExcelBackend)
+    yield
+    set_backend_factory(previous)
+
+
+def test_run_reports_cycles_as_error_and_skips_after_failure(monkeypatch, logger, fake_excel):
+    executed = []
+
+    def fake_process_file(tarea, *args, **kwargs):
+        executed.append(tarea["path"])
+        estado = "ERROR" if tarea["path"] == "ventas.xlsx" else "OK"
+        return {"archivo": tarea["path"], "estado": estado, "error": "simulado", "fallback": False}
+
+    monkeypatch.setattr(execute_refresh_uc, "_process_file", fake_process_file)
+    config = FakeConfig({"EXCEL_SUPERVISOR_ENABLED": "false"})
+    resultados = execute_refresh_uc._run_tasks(
+        TAREAS, 1, logger, config, None, screenshots=NULL_SCREENSHOTS, graph=_graph(),
+    )
+
+    estados = {r["archivo"]: r["estado"] for r in resultados}
+    assert [r["archivo"] for r in resultados] == [t["path"] for t in TAREAS]
+    assert executed == ["base.xlsx", "ventas.xlsx", "clientes.xlsx"]
+    assert estados["resumen.xlsx"] == SKIPPED_UPSTREAM
+    assert estados["clientes.xlsx"] == "OK"
+    assert {estados[p] for p in ("ciclo_a.xlsx", "ciclo_b.xlsx", "tras_ciclo.xlsx")} == {"ERROR"}
+    assert resultados[4]["error"] == "Dependencia circular"
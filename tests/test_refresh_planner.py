@@ -0,0 +1,91 @@
+# tests/test_refresh_planner.py
+
+import logging
+from datetime import datetime
+
+from application.refresh_graph import RefreshGraph
+from application.refresh_planner import RefreshPlanner, HISTORY, DEFAULT
+
+NOW = datetime(2024, 3, 20, 6, 0)
+
+
+class FakeHistory:
+    def __init__(self, durations):
+        self._durations = durations # archivo -> [segundos]
+
+    def durations(self, archivo, limit=50):
+        return self._durations.get(archivo, [])[:limit]
+
+
+def _planner(durations, logger=None):
+    return RefreshPlanner(FakeHistory(durations), default_seconds=60.0, clock=lambda: NOW, logger=logger)
+
+
+def _paths(plan):
+    return [job.path for job in plan.jobs]
+
+
+def test_deadlines_first_then_longest_first():
+    tareas = [
+        {"path": "corto.xlsx"},
+        {"path": "largo.xlsx"},
+        {"path": "urgente.xlsx", "hora_limite": "06:30"},
+        {"path": "limite_tarde.xlsx", "hora_limite": "09:00"},
+        {"path": "nuevo.xlsx"},
+    ]
+    plan = _planner({
+        "corto.xlsx": [10, 12, 11],
+        "largo.xlsx": [300],
+        "urgente.xlsx": [5],
+        "limite_tarde.xlsx": [20],
+    }).plan(tareas)
+    assert _paths(plan) == ["urgente.xlsx", "limite_tarde.xlsx", "largo.xlsx", "nuevo.xlsx", "corto.xlsx"]
+    assert plan.jobs[0].source == HISTORY
+    assert plan.jobs[3].source == DEFAULT
+
+
+def test_lpt_spreads_work_across_workers():
+    tareas = [{"path": f"{n}.xlsx"} for n in ("a", "b", "c", "d")]
+    plan = _planner({"a.xlsx": [10], "b.xlsx": [40], "c.xlsx": [30], "d.xlsx": [20]}).plan(tareas, workers=2)
+    assert _paths(plan) == ["b.xlsx", "c.xlsx", "d.xlsx", "a.xlsx"]
+    assert plan.makespan == 50 # b+a en un Excel, c+d en el otro
+
+
+def test_late_jobs_are_reported():
+    tareas = [{"path": "a.xlsx", "hora_limite": "06:01"}, {"path": "b.xlsx", "hora_limite": "06:01"}]
+    plan = _planner({"a.xlsx": [40], "b.xlsx": [40]}).plan(tareas, workers=1)
+    assert [job.path for job in plan.late_jobs()] == ["b.xlsx"]
+
+
+def test_dependency_runs_before_its_dependents():
+    tareas = [
+        {"path": "reporte.xlsx", "depends_on": ["base.xlsx"], "hora_limite": "06:30"},
+        {"path": "base.xlsx"},
+        {"path": "otro.xlsx"},
+    ]
+    graph = RefreshGraph.from_tasks(tareas, detect_links=False)
+    plan = _planner({"reporte.xlsx": [10], "base.xlsx": [5], "otro.xlsx": [100]}).plan(tareas, workers=2, graph=graph)
+    # base hereda la hora límite de reporte, así que va antes que el más largo
+    assert _paths(plan) == ["base.xlsx", "reporte.xlsx", "otro.xlsx"]
+    base, reporte, _ = plan.jobs
+    assert reporte.start >= base.end
+
+
+def test_dependency_cycle_is_left_out_of_the_plan():
+    tareas = [
+        {"path": "a.xlsx", "depends_on": "b.xlsx"},
+        {"path": "b.xlsx", "depends_on": "a.xlsx"},
+        {"path": "c.xlsx"},
+    ]
+    graph = RefreshGraph.from_tasks(tareas, detect_links=False)
+    plan = _planner({}).plan(tareas, graph=graph)
+    assert _paths(plan) == ["c.xlsx"]
+    assert [t["path"] for t in plan.ordered_tasks] == ["c.xlsx", "a.xlsx", "b.xlsx"]
+
+
+def test_invalid_deadline_is_ignored_and_logged(caplog, logger):
+    tareas = [{"path": "a.xlsx", "hora_limite": "25:00"}, {"path": "b.xlsx", "hora_limite": "mañana"}]
+    with caplog.at_level(logging.WARNING):
+        plan = _planner({}, logger=logger).plan(tareas)
+    assert [job.deadline for job in plan.jobs] == [None, None]
+    assert "a.xlsx" in caplog.text and "b.xlsx" in caplog.text
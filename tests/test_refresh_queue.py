@@ -0,0 +1,67 @@
+# tests/test_refresh_queue.py
+
+import os
+import re
+import logging
+
+from conftest import FakeClock
+from application.refresh_queue import RefreshJobQueue
+
+TAREAS = [{"path": os.path.join("reportes", "a.xlsx")}, {"path": os.path.join("reportes", "b.xlsx")},
+          {"path": os.path.join("otros", "c.xlsx")}]
+
+
+def _queue(logger, **kwargs):
+    clock = FakeClock(1000.0)
+    return RefreshJobQueue(TAREAS, logger, base_delay=5, max_delay=20, max_wait=60, clock=clock, **kwargs), clock
+
+
+def _retry_delays(caplog):
+    return [int(d) for d in re.findall(r"reintento en (\d+)s", caplog.text)]
+
+
+def test_jobs_come_out_in_plan_order(logger):
+    queue, _ = _queue(logger)
+    assert [queue.get()[0] for _ in TAREAS] == [0, 1, 2]
+    for idx in range(3):
+        queue.task_done(idx)
+    assert queue.get() is None
+
+
+def test_parked_file_waits_its_delay_while_others_continue(logger):
+    queue, clock = _queue(logger)
+    idx, tarea = queue.get()
+    assert queue.park(idx, tarea)
+    assert queue.parked_directories() == {os.path.abspath("reportes")}
+
+    assert queue.get()[0] == 1 # Sigue con los demás
+    queue.task_done(1)
+    assert queue.get()[0] == 2
+    queue.task_done(2)
+
+    clock.advance(5)
+    assert queue.get() == (0, tarea)
+    queue.task_done(0)
+    assert queue.get() is None
+
+
+def test_backoff_doubles_up_to_max_delay_and_gives_up(logger, caplog):
+    queue, clock = _queue(logger)
+    idx, tarea = queue.get()
+    with caplog.at_level(logging.WARNING):
+        while queue.park(idx, tarea):
+            clock.advance(_retry_delays(caplog)[-1])
+            assert queue.get() == (idx, tarea)
+    # 5 + 10 + 20 + 20 = 55s; el último reintento se acorta para no pasar de max_wait (60s)
+    assert _retry_delays(caplog) == [5, 10, 20, 20, 5]
+    queue.task_done(idx, ok=False)
+
+
+def test_directory_change_retries_parked_file_now(logger):
+    queue, _ = _queue(logger)
+    idx, tarea = queue.get()
+    queue.park(idx, tarea)
+    queue.notify_changed(os.path.abspath("otros")) # Otra carpeta: sigue esperando
+    assert queue.get()[0] == 1
+    queue.notify_changed(os.path.abspath("reportes"))
+    assert queue.get() == (0, tarea)
@@ -0,0 +1,89 @@
+# tests/test_refresh_waiter.py
+
+import pytest
+
+from domain.exceptions import ExcelGatewayError
+from infrastructure.refresh_waiter import RefreshCompletionWaiter, FakeRefreshEventSource
+
+
+class FakeApp:
+    def __init__(self, states=()):
+        self.states = list(states) # Valores de CalculateState en cada lectura; al final queda en 0
+
+    @property
+    def CalculateState(self):
+        value = self.states.pop(0) if self.states else 0
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+class _OLEDB:
+    def __init__(self, refreshing):
+        self.refreshing = list(refreshing)
+
+    @property
+    def Refreshing(self):
+        return self.refreshing.pop(0) if self.refreshing else False
+
+
+class FakeConnection:
+    Type = 1
+
+    def __init__(self, name, refreshing):
+        self.Name = name
+        self.OLEDBConnection = _OLEDB(refreshing)
+
+
+class FakeWorkbook:
+    def __init__(self, connections):
+        self.Connections = connections
+
+
+def test_events_record_each_connection(logger):
+    source = FakeRefreshEventSource([
+        (0.0, "start", "Ventas"),
+        (0.01, "start", "Clientes"),
+        (0.02, "end", "Ventas", True),
+        (0.03, "end", "Clientes", False),
+    ])
+    # Excel todavía no empezó a calcular cuando se consulta por primera vez
+    waiter = RefreshCompletionWaiter(logger, FakeApp(states=[1]), event_source=source, poll_max=0.05)
+    waiter.start()
+    connections = waiter.wait()
+    assert waiter.using_events
+    assert [(c["nombre"], c["ok"]) for c in connections] == [("Ventas", True), ("Clientes", False)]
+
+
+def test_falls_back_to_polling_without_events(logger):
+    workbook = FakeWorkbook([FakeConnection("Ventas", [True, True, False])])
+    app = FakeApp(states=[1, 1, 1])
+    waiter = RefreshCompletionWaiter(
+        logger, app, workbook=workbook, event_source=FakeRefreshEventSource([], available=False),
+        poll_min=0.001, poll_max=0.002,
+    )
+    waiter.start()
+    connections = waiter.wait()
+    assert not waiter.using_events
+    assert [c["nombre"] for c in connections] == ["Ventas"]
+
+
+def test_repeated_read_failures_raise(logger):
+    app = FakeApp(states=[RuntimeError("RPC_E_CALL_REJECTED")] * 3)
+    waiter = RefreshCompletionWaiter(
+        logger, app, event_source=FakeRefreshEventSource([], available=False),
+        poll_min=0.001, poll_max=0.001, max_read_failures=3,
+    )
+    waiter.start()
+    with pytest.raises(ExcelGatewayError):
+        waiter.wait()
+
+
+def test_single_read_failure_is_not_treated_as_done(logger):
+    app = FakeApp(states=[RuntimeError("ocupado"), 1, 0])
+    waiter = RefreshCompletionWaiter(
+        logger, app, event_source=FakeRefreshEventSource([], available=False), poll_min=0.001, poll_max=0.001,
+    )
+    waiter.start()
+    waiter.wait()
+    assert app.states == []
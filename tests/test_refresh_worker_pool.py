@@ -0,0 +1,82 @@
+# tests/test_refresh_worker_pool.py
+
+import os
+import time
+import logging
+
+import pytest
+
+from domain.exceptions import WorkerProcessError
+from infrastructure.refresh_worker_pool import RefreshWorkerPool, LOGGER_NAME
+
+
+def fake_refresh(progress, files=(), accion="ok"):
+    """Hace de execute_refresh dentro del trabajador (spawn lo importa desde este módulo)."""
+    logging.getLogger(LOGGER_NAME).info(f"Refrescando {len(files)} archivos")
+    progress({"evento": "inicio", "archivo": files[0] if files else None})
+    if accion == "colgar":
+        time.sleep(60)
+    elif accion == "morir":
+        os._exit(3) # Como un crash de COM: el proceso desaparece sin avisar
+    elif accion == "fallar":
+        raise RuntimeError("Excel no responde")
+    return {"pid": os.getpid(), "resultados": [{"archivo": f, "estado": "OK"} for f in files]}
+
+
+@pytest.fixture
+def pool(logger):
+    restarts = []
+    pool = RefreshWorkerPool(logger, fake_refresh, size=1, job_timeout=30, start_timeout=30,
+                             on_restart=lambda: restarts.append(True))
+    pool.restarts = restarts
+    yield pool
+    pool.shutdown()
+
+
+def test_result_progress_and_log_come_back_from_the_worker(pool, caplog):
+    events = []
+    with caplog.at_level(logging.INFO):
+        result = pool.run(files=["a.xlsx"], on_progress=events.append)
+    assert result["resultados"] == [{"archivo": "a.xlsx", "estado": "OK"}]
+    assert result["pid"] != os.getpid()
+    assert events == [{"evento": "inicio", "archivo": "a.xlsx"}]
+    assert "Refrescando 1 archivos" in caplog.text
+
+
+def test_worker_is_reused_between_jobs(pool):
+    first = pool.run(files=["a.xlsx"])["pid"]
+    assert pool.run(files=["b.xlsx"])["pid"] == first
+
+
+def test_error_in_refresh_keeps_the_worker(pool):
+    pid = pool.run(files=["a.xlsx"])["pid"]
+    with pytest.raises(WorkerProcessError, match="RuntimeError: Excel no responde"):
+        pool.run(files=["a.xlsx"], accion="fallar")
+    assert pool.run(files=["a.xlsx"])["pid"] == pid
+    assert pool.restarts == []
+
+
+def test_crashed_worker_is_reported_and_replaced(pool):
+    pid = pool.run(files=["a.xlsx"])["pid"]
+    with pytest.raises(WorkerProcessError, match=r"terminó inesperadamente \(código 3\)"):
+        pool.run(files=["a.xlsx"], accion="morir")
+    assert pool.restarts == [True]
+    assert pool.run(files=["a.xlsx"])["pid"] != pid
+
+
+def test_hung_worker_is_killed_after_timeout_and_replaced(pool):
+    pid = pool.run(files=["a.xlsx"])["pid"]
+    started = time.monotonic()
+    with pytest.raises(WorkerProcessError, match="superó el tiempo máximo de 1s"):
+        pool.run(files=["a.xlsx"], accion="colgar", timeout=1)
+    assert time.monotonic() - started < 10
+    assert pool.restarts == [True]
+    with pytest.raises(ProcessLookupError):
+        os.kill(pid, 0) # El proceso colgado ya no existe
+    assert pool.run(files=["a.xlsx"])["pid"] != pid
+
+
+def test_closed_pool_rejects_jobs(pool):
+    pool.shutdown()
+    with pytest.raises(WorkerProcessError, match="cerrado"):
+        pool.run(files=["a.xlsx"])
@@ -0,0 +1,80 @@
+# tests/test_retry_policy.py
+
+import pytest
+
+from conftest import FakeConfig
+from domain.exceptions import FileLockedError, RefreshJobError
+from infrastructure.retry_policy import RetryPolicy, CircuitBreaker, classify_error, TRANSIENT, PERMANENT
+
+
+class ComError(Exception):
+    """Imita pywintypes.com_error: (hresult, texto, excepinfo, argerr)."""
+
+
+@pytest.mark.parametrize("error, expected", [
+    (FileNotFoundError("libro.xlsx"), PERMANENT),
+    (RefreshJobError("validación"), PERMANENT),
+    (FileLockedError("abierto por otro usuario"), TRANSIENT),
+    (ComError(-2147418111, "Call was rejected by callee.", None, None), TRANSIENT), # RPC_E_CALL_REJECTED
+    (ComError(-2147352567, "Exception occurred.", (0, "Excel", "Acceso", None, 0, -2147024891), None), PERMANENT),
+    (Exception("Login failed for user 'reportes'"), PERMANENT),
+    (Exception("algo raro"), TRANSIENT),
+])
+def test_classify_error(error, expected):
+    assert classify_error(error) == expected
+
+
+def test_should_retry_only_transient_and_below_max():
+    policy = RetryPolicy(max_retries=3)
+    assert policy.should_retry(1, Exception("ocupado"))
+    assert not policy.should_retry(3, Exception("ocupado"))
+    assert not policy.should_retry(1, FileNotFoundError("libro.xlsx"))
+
+
+def test_delay_grows_exponentially_up_to_max():
+    policy = RetryPolicy(base_delay=10, max_delay=60, jitter=False)
+    assert [policy.delay(n) for n in range(1, 6)] == [10, 20, 40, 60, 60]
+
+
+def test_equal_jitter_stays_within_half_and_full_delay():
+    low = RetryPolicy(base_delay=10, max_delay=60, jitter=True, rng=lambda: 0.0)
+    high = RetryPolicy(base_delay=10, max_delay=60, jitter=True, rng=lambda: 1.0)
+    assert low.delay(2) == 10
+    assert high.delay(2) == 20
+
+
+def test_from_job_overrides_config():
+    config = FakeConfig({"MAX_RETRIES": 3, "RETRY_INTERVAL_SECONDS": 15})
+    policy = RetryPolicy.from_job({"reintentos": {"max": 5, "jitter": False}}, config)
+    assert policy.max_retries == 5
+    assert policy.base_delay == 15
+    assert policy.jitter is False
+
+
+def test_circuit_opens_after_threshold_and_allows_probe_after_cooldown():
+    now = [1000.0]
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=600, clock=lambda: now[0])
+    assert not breaker.record_failure("a.xlsx")
+    assert not breaker.record_failure("a.xlsx")
+    assert breaker.record_failure("a.xlsx")
+    assert breaker.open_until("a.xlsx") == 1600.0
+    assert breaker.open_until("b.xlsx") is None
+
+    now[0] = 1600.0
+    assert breaker.open_until("a.xlsx") is None # Intento de prueba
+    assert breaker.record_failure("a.xlsx") # Un solo fallo más lo vuelve a abrir
+    assert breaker.open_until("a.xlsx") == 2200.0
+
+
+def test_success_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, clock=lambda: 0.0)
+    breaker.record_failure("a.xlsx")
+    breaker.record_success("a.xlsx")
+    assert not breaker.record_failure("a.xlsx")
+
+
+def test_threshold_zero_disables_breaker():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(5):
+        assert not breaker.record_failure("a.xlsx")
+    assert breaker.open_until("a.xlsx") is None
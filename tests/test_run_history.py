@@ -0,0 +1,100 @@
+# tests/test_run_history.py
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from infrastructure.phase_timer import new_run_id
+from infrastructure.run_history import RunHistory
+
+NOW = datetime(2024, 3, 20, 12, 0)
+
+
+@pytest.fixture
+def history(tmp_path):
+    return RunHistory(str(tmp_path / "run_history.db"), detail_days=5, keep_days=10, clock=lambda: NOW.timestamp())
+
+
+def _record(history, run_id, inicio, *durations, estado="OK", archivo="ventas.xlsx"):
+    resultados = [
+        {
+            "archivo": archivo, "estado": estado, "duracion": d, "fallback": False,
+            "tiempos": {"intentos": [{"intento": 1, "estado": estado, "fases": {"refresh": d}}]},
+        }
+        for d in durations
+    ]
+    history.record_run(run_id, inicio, inicio + timedelta(seconds=sum(durations)), resultados)
+
+
+def _count(history, table):
+    conn = sqlite3.connect(history.path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_stats_and_durations(history):
+    _record(history, "r1", NOW - timedelta(days=1), 10.0)
+    _record(history, "r2", NOW - timedelta(hours=5), 30.0)
+    _record(history, "r3", NOW - timedelta(hours=1), 20.0)
+    _record(history, "r4", NOW - timedelta(minutes=30), 99.0, estado="ERROR")
+
+    assert history.durations("ventas.xlsx") == [20.0, 30.0, 10.0] # Más reciente primero, sin errores
+    [stats] = history.stats()
+    assert (stats["corridas"], stats["errores"]) == (4, 1)
+    assert (stats["p50"], stats["p95"], stats["max"]) == (20.0, 30.0, 30.0)
+
+
+def test_compaction_cuts_at_local_midnight(history):
+    # keep_days=10: se resume todo lo anterior al 10/03 00:00, días enteros
+    _record(history, "r1", datetime(2024, 3, 9, 8, 0), 10.0)
+    _record(history, "r2", datetime(2024, 3, 9, 20, 0), 30.0)
+    _record(history, "r3", datetime(2024, 3, 10, 6, 0), 50.0) # Mismo día que el límite de 10 días: se conserva
+
+    assert history.compact(force=True) == 2
+    assert _count(history, "trabajos") == 1
+    assert history.daily("ventas.xlsx", days=30) == [
+        ("2024-03-09", 2, 10.0, 30.0, 30.0),
+        ("2024-03-10", 1, 50.0, 50.0, 50.0),
+    ]
+
+
+def test_summary_and_detail_of_same_day_are_combined(history):
+    _record(history, "r1", datetime(2024, 3, 9, 8, 0), 10.0)
+    history.compact(force=True)
+    # Llega tarde otra corrida del mismo día (p. ej. desde otro equipo)
+    _record(history, "r2", datetime(2024, 3, 9, 9, 0), 30.0)
+
+    [(dia, n, p50, p95, maximo)] = history.daily("ventas.xlsx", days=30)
+    assert (dia, n, maximo) == ("2024-03-09", 2, 30.0)
+    assert p50 == 20.0 # Promedio ponderado de los dos resúmenes
+
+    # Al volver a compactar se suma al resumen existente en vez de pisarlo
+    history.compact(force=True)
+    assert _count(history, "trabajos") == 0
+    assert history.daily("ventas.xlsx", days=30) == [("2024-03-09", 2, 20.0, 20.0, 30.0)]
+
+
+def test_attempt_detail_is_dropped_after_detail_days(history):
+    _record(history, "r1", NOW - timedelta(days=7), 10.0)
+    _record(history, "r2", NOW - timedelta(days=1), 20.0)
+    history.compact(force=True)
+    assert _count(history, "trabajos") == 2
+    assert _count(history, "intentos") == 1
+
+
+def test_compact_runs_at_most_once_a_day(tmp_path):
+    now = [NOW.timestamp()]
+    history = RunHistory(str(tmp_path / "run_history.db"), keep_days=10, clock=lambda: now[0])
+    history.compact()
+    _record(history, "r1", datetime(2024, 3, 1, 8, 0), 10.0)
+    assert history.compact() == 0
+    now[0] += 86400
+    assert history.compact() == 1
+
+
+def test_run_ids_are_unique_within_the_same_second():
+    ids = {new_run_id() for _ in range(100)}
+    assert len(ids) == 100
@@ -0,0 +1,64 @@
+# tests/test_schedule_spec.py
+
+from datetime import datetime
+
+import pytest
+
+from domain.schedule_spec import CronExpression, JobSchedule, parse_trigger
+
+MONDAY = datetime(2024, 3, 18, 9, 30) # Lunes
+
+
+@pytest.mark.parametrize("expression, moment, expected", [
+    ("0 7 * * *", MONDAY, datetime(2024, 3, 19, 7, 0)),
+    ("*/15 * * * *", MONDAY, datetime(2024, 3, 18, 9, 45)),
+    ("0 8-18/2 * * mon-fri", MONDAY, datetime(2024, 3, 18, 10, 0)),
+    ("0 8 * * mon-fri", datetime(2024, 3, 22, 9, 0), datetime(2024, 3, 25, 8, 0)), # Viernes -> lunes
+    ("0 6 * * 7", MONDAY, datetime(2024, 3, 24, 6, 0)), # 7 también es domingo
+    ("30 6 1 jan,jul *", MONDAY, datetime(2024, 7, 1, 6, 30)),
+    ("0 0 29 2 *", MONDAY, datetime(2028, 2, 29, 0, 0)),
+    ("@hourly", MONDAY, datetime(2024, 3, 18, 10, 0)),
+])
+def test_next_after(expression, moment, expected):
+    assert CronExpression(expression).next_after(moment) == expected
+
+
+def test_next_after_is_strictly_after():
+    assert CronExpression("30 9 * * *").next_after(MONDAY) == datetime(2024, 3, 19, 9, 30)
+
+
+def test_day_of_month_or_day_of_week():
+    # Como en cron: el 1 de cada mes o cualquier lunes
+    cron = CronExpression("0 0 1 * mon")
+    assert cron.next_after(datetime(2024, 3, 19)) == datetime(2024, 3, 25)
+    assert cron.next_after(datetime(2024, 3, 26)) == datetime(2024, 4, 1)
+
+
+@pytest.mark.parametrize("expression", ["0 7 * *", "60 * * * *", "0 7 * * funday", "*/0 * * * *", "0 10-8 * * *"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
+
+
+def test_parse_trigger_accepts_hhmm_and_cron():
+    assert str(parse_trigger("7:05")) == "07:05"
+    assert str(parse_trigger("0 7 * * mon")) == "0 7 * * mon"
+    with pytest.raises(ValueError):
+        parse_trigger("24:00")
+
+
+def test_job_schedule_combines_all_keys():
+    schedule = JobSchedule.from_job({"horario": "07:00", "horarios": ["13:30"], "cron": "0 20 * * fri"})
+    assert schedule.key == "0 20 * * fri | 07:00 | 13:30"
+    assert schedule.next_after(MONDAY) == datetime(2024, 3, 18, 13, 30)
+
+
+def test_job_schedule_key_ignores_order_and_duplicates():
+    a = JobSchedule.from_job({"horarios": ["13:30", "07:00"]})
+    b = JobSchedule.from_job({"horario": "07:00", "horarios": ["07:00", "13:30"]})
+    assert a.key == b.key
+
+
+def test_job_without_schedule():
+    with pytest.raises(ValueError):
+        JobSchedule.from_job({"horario": ":"}) # Lo que deja la GUI con el campo vacío
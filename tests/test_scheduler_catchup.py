@@ -0,0 +1,135 @@
+# tests/test_scheduler_catchup.py
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import FakeClock, FakeConfig
+from infrastructure.scheduler_service import SchedulerService
+from infrastructure.scheduler_state import SchedulerState
+
+NOW = datetime(2024, 3, 20, 10, 0)
+
+
+def _service(tmp_path, monkeypatch, logger, jobs, clock, **config):
+    """Scheduler sin subprocesos, sin watcher ni canal de control; las corridas se anotan en `service.submitted`."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "config").mkdir(exist_ok=True)
+    (tmp_path / "config" / "excels.json").write_text(json.dumps({"excels": jobs}), encoding="utf-8")
+    values = {
+        "REFRESH_IN_SUBPROCESS": "false",
+        "SCHEDULER_WATCH_CONFIG": "false",
+        "SCHEDULER_CONTROL_ENABLED": "false",
+        "DEPENDENCY_DETECT_LINKS": "false",
+        "SCHEDULER_STATE_FILE": str(tmp_path / "state.json"),
+    }
+    values.update(config)
+    service = SchedulerService(FakeConfig(values), logger, execute_fn=lambda files: None, clock=clock)
+    service.submitted = []
+    monkeypatch.setattr(service.executor, "submit", lambda files, times=1: service.submitted.append((list(files), times)))
+    service._register_jobs()
+    return service
+
+
+def _tick(service):
+    """Una vuelta del bucle del timer: dispara lo vencido sin esperar."""
+    for entry, planned, actual in service.timer._pop_due():
+        service.timer._fire(entry, planned, actual)
+
+
+def _last_fired(tmp_path, path, when, logger):
+    state = SchedulerState(logger, path=str(tmp_path / "state.json"))
+    state.record([path], "07:00", when, when, when + timedelta(days=1))
+
+
+@pytest.fixture
+def ventas(tmp_path):
+    return str(tmp_path / "ventas.xlsx")
+
+
+def test_missed_slot_fires_once_with_planned_time_and_is_not_recovered_again(tmp_path, monkeypatch, logger, ventas, caplog):
+    _last_fired(tmp_path, ventas, datetime(2024, 3, 18, 7, 0), logger)
+    clock = FakeClock(NOW) # La app estuvo cerrada el 19 y el 20 a las 07:00
+    service = _service(tmp_path, monkeypatch, logger, [{"path": ventas, "horario": "07:00"}], clock)
+    assert service.timer.next_due("07:00") == datetime(2024, 3, 19, 7, 0)
+
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        _tick(service)
+        _tick(service)
+    assert service.submitted == [([ventas], 1)]
+    assert "Corrida perdida de las 2024-03-19 07:00 (ventas.xlsx): se recupera ahora." in caplog.text
+    entry = service.state.entry(ventas)
+    assert entry["ultimo_disparo"] == "2024-03-20T07:00:00" # El último horario perdido, no la hora real
+    assert entry["inicio_real"] == "2024-03-20T10:00:00"
+    assert entry["recuperado"] is True
+    assert entry["proximo"] == "2024-03-21T07:00:00"
+
+    # Al reiniciar se retoma desde el horario anotado: lo recuperado no vuelve a salir
+    clock.advance(timedelta(minutes=5))
+    restarted = _service(tmp_path, monkeypatch, logger, [{"path": ventas, "horario": "07:00"}], clock)
+    assert restarted.timer.next_due("07:00") == datetime(2024, 3, 21, 7, 0)
+    _tick(restarted)
+    assert restarted.submitted == []
+
+
+@pytest.mark.parametrize("max_runs, times", [("5", 3), ("2", 2)])
+def test_policy_all_runs_once_per_missed_slot_up_to_max(tmp_path, monkeypatch, logger, ventas, max_runs, times):
+    _last_fired(tmp_path, ventas, datetime(2024, 3, 17, 7, 0), logger) # Se perdieron el 18, el 19 y el 20
+    service = _service(
+        tmp_path, monkeypatch, logger, [{"path": ventas, "horario": "07:00"}], FakeClock(NOW),
+        SCHEDULER_CATCHUP_POLICY="todas", SCHEDULER_CATCHUP_MAX_RUNS=max_runs,
+    )
+    _tick(service)
+    assert service.submitted == [([ventas], times)]
+    assert service.state.entry(ventas)["ultimo_disparo"] == "2024-03-20T07:00:00"
+
+
+def test_policy_skip_records_slot_without_running(tmp_path, monkeypatch, logger, ventas):
+    clientes = str(tmp_path / "clientes.xlsx")
+    for path in (ventas, clientes):
+        _last_fired(tmp_path, path, datetime(2024, 3, 19, 7, 0), logger)
+    jobs = [{"path": ventas, "horario": "07:00"}, {"path": clientes, "horario": "07:00", "recuperar": "una_vez"}]
+    service = _service(tmp_path, monkeypatch, logger, jobs, FakeClock(NOW), SCHEDULER_CATCHUP_POLICY="omitir")
+    _tick(service)
+    # El "recuperar" del job pisa la política global
+    assert service.submitted == [([clientes], 1)]
+    assert service.state.entry(ventas)["ultimo_disparo"] == "2024-03-20T07:00:00"
+    assert service.state.entry(ventas)["recuperado"] is True
+
+
+def test_catch_ups_are_staggered(tmp_path, monkeypatch, logger, ventas):
+    clientes = str(tmp_path / "clientes.xlsx")
+    _last_fired(tmp_path, ventas, datetime(2024, 3, 19, 7, 0), logger)
+    _last_fired(tmp_path, clientes, datetime(2024, 3, 19, 8, 0), logger)
+    jobs = [{"path": ventas, "horario": "07:00"}, {"path": clientes, "horario": "08:00"}]
+    clock = FakeClock(NOW)
+    service = _service(tmp_path, monkeypatch, logger, jobs, clock, SCHEDULER_CATCHUP_STAGGER_SECONDS="60")
+
+    _tick(service)
+    # El primero sale ahora; el segundo queda para dentro de un minuto
+    assert service.submitted == [([ventas], 1)]
+    later = [key for key, due in service.timer.entries() if due == NOW + timedelta(seconds=60)]
+    assert len(later) == 1 and later[0].startswith("recuperar:")
+
+    clock.advance(timedelta(seconds=59))
+    _tick(service)
+    assert service.submitted == [([ventas], 1)]
+    clock.advance(timedelta(seconds=1))
+    _tick(service)
+    assert service.submitted == [([ventas], 1), ([clientes], 1)]
+    assert all(not key.startswith("recuperar:") for key, _ in service.timer.entries())
+
+
+def test_on_time_trigger_is_not_a_catch_up(tmp_path, monkeypatch, logger, ventas):
+    _last_fired(tmp_path, ventas, datetime(2024, 3, 19, 7, 0), logger)
+    clock = FakeClock(datetime(2024, 3, 20, 6, 59))
+    service = _service(tmp_path, monkeypatch, logger, [{"path": ventas, "horario": "07:00"}], clock)
+    batches = []
+    monkeypatch.setattr(service.coalescer, "submit", batches.append)
+    clock.advance(timedelta(minutes=1, seconds=30)) # Dentro de SCHEDULER_CATCHUP_GRACE_SECONDS
+    _tick(service)
+    assert batches == [[ventas]]
+    assert service.submitted == []
+    assert service.state.entry(ventas)["recuperado"] is False
@@ -0,0 +1,125 @@
+# tests/test_screenshot_service.py
+
+import os
+import json
+import time
+import zlib
+import struct
+
+import pytest
+
+from infrastructure.screenshot_service import PNG_SIGNATURE, INDEX_FILE, ScreenshotService, encode_png
+
+
+def _bgra(width, height):
+    """Píxeles de prueba: B = x, G = y, R = x + y (como GetBitmapBits, de arriba a abajo)."""
+    return bytes(b for y in range(height) for x in range(width) for b in (x, y, x + y, 255))
+
+
+def _decode_png(data):
+    """Lee las chunks (verificando el CRC) y devuelve (ancho, alto, filas RGB)."""
+    assert data[:8] == PNG_SIGNATURE
+    pos, chunks = 8, []
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos:pos + 4])
+        kind, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xFFFFFFFF
+        chunks.append((kind, body))
+        pos += 12 + length
+    assert [k for k, _ in chunks] == [b"IHDR", b"IDAT", b"IEND"]
+
+    width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert (depth, color, compression, filtering, interlace) == (8, 2, 0, 0, 0) # RGB de 8 bits
+    raw = zlib.decompress(chunks[1][1])
+    stride = 1 + width * 3
+    assert len(raw) == stride * height
+    rows = [raw[y * stride:(y + 1) * stride] for y in range(height)]
+    assert all(row[0] == 0 for row in rows) # Filtro "ninguno"
+    return width, height, [bytes(row[1:]) for row in rows]
+
+
+def test_encode_png_converts_bgra_to_rgb():
+    width, height, rows = _decode_png(encode_png(5, 3, _bgra(5, 3)))
+    assert (width, height) == (5, 3)
+    for y, row in enumerate(rows):
+        assert row == bytes(b for x in range(5) for b in (x + y, y, x))
+
+
+def test_encode_png_downscales_taking_one_pixel_every_n():
+    width, height, rows = _decode_png(encode_png(5, 3, _bgra(5, 3), scale=2))
+    assert (width, height) == (3, 2)
+    assert rows == [
+        bytes(b for x in (0, 2, 4) for b in (x + y, y, x)) for y in (0, 2)
+    ]
+
+
+def test_encode_png_compresses_flat_screens():
+    bgra = bytes([200, 200, 200, 255]) * (640 * 480)
+    assert len(encode_png(640, 480, bgra)) < len(bgra) // 100
+
+
+# --------------------------
+# Servicio: índice por corrida y retención
+# --------------------------
+class FakeCapturer:
+    def __init__(self, width=8, height=8):
+        self.size = (width, height)
+
+    def grab(self):
+        width, height = self.size
+        return width, height, os.urandom(width * height * 4) # Ruido: no se comprime, el tamaño es estable
+
+
+def _service(tmp_path, logger, run_id, **kwargs):
+    return ScreenshotService(logger, str(tmp_path / "capturas"), run_id=run_id, capturer=FakeCapturer(), **kwargs)
+
+
+def test_captures_are_indexed_by_run_and_file(tmp_path, logger):
+    first = _service(tmp_path, logger, "corrida1")
+    a = first.capture(r"c:\reportes\ventas.xlsx", 1)
+    b = first.capture(r"c:\reportes\clientes.xlsx", 2)
+    first.close()
+    second = _service(tmp_path, logger, "corrida2")
+    c = second.capture(r"c:\reportes\ventas.xlsx", 1)
+    second.close()
+
+    assert [e["ruta"] for e in first.captures()] == [a, b]
+    assert [e["ruta"] for e in first.captures(archivo=r"c:\reportes\clientes.xlsx")] == [b]
+    assert [e["ruta"] for e in second.captures()] == [c]
+    for path in (a, b, c):
+        _decode_png(open(path, "rb").read())
+    assert not os.path.exists(os.path.join(tmp_path, "capturas", "index.lock"))
+
+
+def test_size_budget_keeps_newest_captures(tmp_path, logger):
+    size = len(encode_png(8, 8, os.urandom(8 * 8 * 4)))
+    service = _service(tmp_path, logger, "corrida1", max_bytes=size * 3 + size // 2, max_age_days=0)
+    paths = [service.capture("ventas.xlsx", n) for n in range(1, 7)]
+    service.close()
+
+    kept = [e["ruta"] for e in service.captures()]
+    assert kept == paths[-3:]
+    assert [os.path.exists(p) for p in paths] == [False] * 3 + [True] * 3
+
+
+def test_old_captures_are_pruned_including_adopted_ones(tmp_path, logger):
+    folder = tmp_path / "capturas"
+    folder.mkdir()
+    # Capturas de antes del índice: se adoptan con su fecha de modificación
+    old = folder / "error_viejo.png"
+    old.write_bytes(b"png viejo")
+    month_ago = time.time() - 30 * 86400
+    os.utime(old, (month_ago, month_ago))
+    recent = folder / "error_reciente.png"
+    recent.write_bytes(b"png reciente")
+
+    service = _service(tmp_path, logger, "corrida1", max_age_days=14)
+    new = service.capture("ventas.xlsx", 1)
+    service.close()
+
+    assert not old.exists()
+    assert recent.exists() and os.path.exists(new)
+    with open(folder / INDEX_FILE, encoding="utf-8") as f:
+        index = [json.loads(line) for line in f]
+    assert [e["ruta"] for e in index] == [str(recent), new]
@@ -0,0 +1,139 @@
+# tests/test_staging.py
+
+import os
+
+import pytest
+
+from conftest import FakeConfig
+from domain.exceptions import ExcelGatewayError, FileLockedError
+from infrastructure import staging as staging_module
+from infrastructure.excel_gateway import ExcelGateway
+from infrastructure.excel_pool import ExcelPool
+from infrastructure.fake_excel_com import FakeComExcelBackend, FakeExcelProfile
+from infrastructure.file_lock import owner_file_path
+from infrastructure.staging import StagingArea
+
+
+@pytest.fixture
+def original(tmp_path):
+    folder = tmp_path / "reportes"
+    folder.mkdir()
+    path = folder / "ventas.xlsx"
+    path.write_bytes(b"version original")
+    return path
+
+
+@pytest.fixture
+def area(tmp_path):
+    return StagingArea(str(tmp_path / "staging"))
+
+
+def _leftovers(original):
+    return [n for n in os.listdir(original.parent) if n.startswith("~pivoty_")]
+
+
+def test_commit_replaces_original_and_discard_removes_copy(original, area):
+    staged = area.stage(str(original))
+    assert staged.path != str(original)
+    assert os.path.basename(staged.path) == "ventas.xlsx"
+    with open(staged.path, "wb") as f:
+        f.write(b"version refrescada")
+
+    staged.commit()
+    staged.discard()
+    assert original.read_bytes() == b"version refrescada"
+    assert not os.path.exists(os.path.dirname(staged.path))
+    assert _leftovers(original) == []
+
+
+def test_failed_replace_keeps_original_and_maps_permission_error(original, area, monkeypatch):
+    staged = area.stage(str(original))
+    with open(staged.path, "wb") as f:
+        f.write(b"version refrescada")
+
+    def denied(src, dst):
+        raise PermissionError(13, "Acceso denegado", dst) # Windows: alguien abrió el original, aunque sea para leer
+
+    monkeypatch.setattr(staging_module.os, "replace", denied)
+    with pytest.raises(FileLockedError):
+        staged.commit()
+    assert original.read_bytes() == b"version original"
+    assert _leftovers(original) == []
+    staged.discard()
+
+
+def test_other_replace_errors_are_not_treated_as_locks(original, area, monkeypatch):
+    staged = area.stage(str(original))
+
+    def disk_full(src, dst):
+        raise OSError(28, "Disco lleno", dst)
+
+    monkeypatch.setattr(staging_module.shutil, "copyfile", disk_full)
+    with pytest.raises(OSError) as info:
+        staged.commit()
+    assert not isinstance(info.value, FileLockedError)
+    assert original.read_bytes() == b"version original"
+    assert _leftovers(original) == []
+
+
+def test_commit_refuses_when_original_changed_during_refresh(original, area):
+    staged = area.stage(str(original))
+    original.write_bytes(b"cambios del usuario, mas largos")
+    with pytest.raises(ExcelGatewayError):
+        staged.commit()
+    assert original.read_bytes() == b"cambios del usuario, mas largos"
+
+
+def test_commit_refuses_when_original_is_open(original, area):
+    staged = area.stage(str(original))
+    with open(owner_file_path(str(original)), "wb"):
+        pass
+    with pytest.raises(FileLockedError):
+        staged.commit()
+    assert original.read_bytes() == b"version original"
+
+
+def test_stage_maps_locked_copy_and_cleans_folder(original, area, monkeypatch):
+    def denied(src, dst):
+        raise PermissionError(13, "Acceso denegado", src)
+
+    monkeypatch.setattr(staging_module.shutil, "copyfile", denied)
+    with pytest.raises(FileLockedError):
+        area.stage(str(original))
+    assert os.listdir(area.base_dir) == []
+
+
+# --------------------------
+# Gateway con staging: el bloqueo del original solo cuenta al reemplazar
+# --------------------------
+def _gateway(logger):
+    backend = FakeComExcelBackend(FakeExcelProfile.from_dict({"conexiones": 1}), seed=1, sleep=lambda s: None)
+    config = FakeConfig({"VALIDATE_ROWS_AFTER_REFRESH": "false", "REFRESH_EVENTS_ENABLED": "false"})
+    return ExcelGateway(logger, config, pool=ExcelPool(backend, logger)), backend
+
+
+def test_gateway_with_staging_refreshes_copy_while_original_is_open(original, area, logger):
+    gateway, backend = _gateway(logger)
+    owner = owner_file_path(str(original))
+    with open(owner, "wb"):
+        pass
+
+    # Sin staging el archivo abierto se rechaza antes de abrir Excel
+    with pytest.raises(FileLockedError):
+        gateway.refresh_file(str(original))
+    assert backend.stats["libros_abiertos"] == 0
+
+    # Con staging se refresca la copia; el original sigue abierto al final y no se toca
+    with pytest.raises(FileLockedError):
+        gateway.refresh_file(str(original), staging=area)
+    assert backend.stats["libros_abiertos"] == 1
+    assert original.read_bytes() == b"version original"
+    assert os.listdir(area.base_dir) == []
+
+    # Cerrado el original, el reemplazo pasa
+    os.remove(owner)
+    result = gateway.refresh_file(str(original), staging=area)
+    assert result["status"] == "ok"
+    assert backend.stats["libros_abiertos"] == 2
+    assert os.listdir(area.base_dir) == []
+    assert _leftovers(original) == []
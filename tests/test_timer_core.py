@@ -0,0 +1,108 @@
+# tests/test_timer_core.py
+
+import threading
+from datetime import datetime, timedelta
+
+from conftest import FakeClock
+from domain.schedule_spec import JobSchedule
+from infrastructure.timer_core import TimerCore
+
+START = datetime(2024, 3, 18, 6, 0)
+
+
+def _run_until(timer, stop, timeout=2):
+    """Corre el bucle del timer en otro hilo hasta que `stop` se active."""
+    thread = threading.Thread(target=timer.run, args=(stop,), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    stop.set()
+    timer.wake()
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_entries_are_ordered_by_next_due(logger):
+    timer = TimerCore(logger, clock=FakeClock(START))
+    timer.add("tarde", JobSchedule.from_job({"horario": "18:00"}), print)
+    timer.add("temprano", JobSchedule.from_job({"horario": "07:00"}), print)
+    assert timer.entries() == [("temprano", datetime(2024, 3, 18, 7, 0)), ("tarde", datetime(2024, 3, 18, 18, 0))]
+    assert timer.next_due() == datetime(2024, 3, 18, 7, 0)
+    assert timer.cancel("temprano")
+    assert timer.next_due() == datetime(2024, 3, 18, 18, 0)
+    assert not timer.cancel("temprano")
+
+
+def test_overdue_entry_fires_once_and_reschedules_from_now(logger):
+    clock = FakeClock(START)
+    timer = TimerCore(logger, clock=clock, max_sleep=0.01)
+    stop = threading.Event()
+    fired = []
+
+    def callback(planned, actual):
+        fired.append((planned, actual))
+        stop.set()
+
+    timer.add("diario", JobSchedule.from_job({"horario": "07:00"}), callback)
+    clock.now = datetime(2024, 3, 20, 10, 0) # El equipo estuvo apagado dos días y medio
+    _run_until(timer, stop)
+
+    assert fired == [(datetime(2024, 3, 18, 7, 0), datetime(2024, 3, 20, 10, 0))]
+    assert timer.next_due("diario") == datetime(2024, 3, 21, 7, 0)
+    [(key, stats)] = timer.latency_stats().items()
+    assert key == "diario"
+    assert stats["disparos"] == 1
+    assert stats["ultimo"] == timedelta(days=2, hours=3).total_seconds()
+
+
+def test_add_once_fires_and_disappears(logger):
+    clock = FakeClock(START)
+    timer = TimerCore(logger, clock=clock, max_sleep=0.01)
+    stop = threading.Event()
+    fired = []
+    timer.add_once("lote", START + timedelta(seconds=15), lambda planned, actual: (fired.append(planned), stop.set()))
+    assert timer.next_due("lote") == START + timedelta(seconds=15)
+
+    clock.advance(timedelta(seconds=20))
+    _run_until(timer, stop)
+    assert fired == [START + timedelta(seconds=15)]
+    assert timer.entries() == []
+
+
+def test_replace_callback_keeps_next_due(logger):
+    clock = FakeClock(START)
+    timer = TimerCore(logger, clock=clock, max_sleep=0.01)
+    stop = threading.Event()
+    fired = []
+    timer.add("diario", JobSchedule.from_job({"horario": "07:00"}), lambda planned, actual: fired.append("viejo"))
+    assert timer.replace_callback("diario", lambda planned, actual: (fired.append("nuevo"), stop.set()))
+    assert not timer.replace_callback("otro", print)
+    assert timer.next_due("diario") == datetime(2024, 3, 18, 7, 0)
+
+    clock.advance(timedelta(hours=1))
+    _run_until(timer, stop)
+    assert fired == ["nuevo"]
+
+
+def test_clock_jump_is_reported(logger):
+    class JumpingClock:
+        """Cada lectura avanza dos horas, como un equipo que vuelve de hibernar."""
+
+        def __init__(self):
+            self.now = START
+
+        def __call__(self):
+            self.now += timedelta(hours=2)
+            return self.now
+
+    stop = threading.Event()
+    jumps = []
+
+    def on_clock_jump(before, now):
+        jumps.append((before, now))
+        stop.set()
+
+    timer = TimerCore(logger, clock=JumpingClock(), max_sleep=0.01, jump_threshold=90, on_clock_jump=on_clock_jump)
+    _run_until(timer, stop)
+    before, now = jumps[0]
+    assert now - before == timedelta(hours=2)
+
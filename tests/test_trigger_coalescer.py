@@ -0,0 +1,80 @@
+# tests/test_trigger_coalescer.py
+
+from datetime import datetime, timedelta
+
+from conftest import FakeClock
+from infrastructure.trigger_coalescer import TriggerCoalescer, BATCH_KEY
+
+START = datetime(2024, 3, 18, 7, 0)
+
+
+class FakeTimer:
+    def __init__(self):
+        self.once = {} # key -> (when, callback)
+        self.cancelled = []
+
+    def add_once(self, key, when, callback):
+        self.once[key] = (when, callback)
+        return when
+
+    def cancel(self, key):
+        self.cancelled.append(key)
+        return self.once.pop(key, None) is not None
+
+    def fire(self, key):
+        when, callback = self.once.pop(key)
+        callback(when, when)
+
+
+def _coalescer(logger, window=15):
+    timer, batches = FakeTimer(), []
+    coalescer = TriggerCoalescer(timer, window, batches.append, logger, clock=FakeClock(START))
+    return coalescer, timer, batches
+
+
+def test_triggers_within_window_share_one_batch(logger):
+    coalescer, timer, batches = _coalescer(logger)
+    coalescer.submit(["a.xlsx", "b.xlsx"])
+    coalescer.submit(["b.xlsx", "c.xlsx"])
+    assert timer.once[BATCH_KEY][0] == START + timedelta(seconds=15)
+    assert coalescer.pending() == ["a.xlsx", "b.xlsx", "c.xlsx"]
+    assert batches == []
+
+    timer.fire(BATCH_KEY)
+    assert batches == [["a.xlsx", "b.xlsx", "c.xlsx"]]
+    assert coalescer.pending() == []
+
+
+def test_next_trigger_after_flush_opens_new_batch(logger):
+    coalescer, timer, batches = _coalescer(logger)
+    coalescer.submit(["a.xlsx"])
+    timer.fire(BATCH_KEY)
+    coalescer.submit(["a.xlsx"])
+    timer.fire(BATCH_KEY)
+    assert batches == [["a.xlsx"], ["a.xlsx"]]
+
+
+def test_zero_window_runs_immediately(logger):
+    coalescer, timer, batches = _coalescer(logger, window=0)
+    coalescer.submit(["a.xlsx"])
+    assert batches == [["a.xlsx"]]
+    assert timer.once == {}
+
+
+def test_flush_runs_open_batch_now(logger):
+    coalescer, timer, batches = _coalescer(logger)
+    coalescer.submit(["a.xlsx"])
+    coalescer.flush()
+    assert batches == [["a.xlsx"]]
+    assert BATCH_KEY in timer.cancelled
+    coalescer.flush() # Sin lote abierto no hace nada
+    assert batches == [["a.xlsx"]]
+
+
+def test_discard_drops_open_batch(logger):
+    coalescer, timer, batches = _coalescer(logger)
+    coalescer.submit(["a.xlsx"])
+    coalescer.discard()
+    assert coalescer.pending() == []
+    assert timer.once == {}
+    assert batches == []
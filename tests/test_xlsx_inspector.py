@@ -0,0 +1,122 @@
+# tests/test_xlsx_inspector.py
+
+import os
+import zipfile
+
+import pytest
+
+from conftest import FakeConfig
+from domain.validation_rules import ValidationRules
+from infrastructure.xlsx_inspector import inspect_xlsx, total_errors, external_links
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def _rels(*relationships):
+    items = "".join(
+        f'<Relationship Id="{rid}" Type="{REL}/{kind}" Target="{target}"{extra}/>'
+        for rid, kind, target, extra in relationships
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><Relationships xmlns="{PKG}">{items}</Relationships>'
+
+
+def _sheet(rows):
+    """rows: {fila: [(ref, valor, tipo)]}"""
+    body = ""
+    for r, cells in rows.items():
+        body += f'<row r="{r}">'
+        for ref, value, kind in cells:
+            t = f' t="{kind}"' if kind else ""
+            body += f'<c r="{ref}"{t}><v>{value}</v></c>' if value is not None else f'<c r="{ref}"/>'
+        body += "</row>"
+    return f'<?xml version="1.0" encoding="UTF-8"?><worksheet xmlns="{MAIN}"><sheetData>{body}</sheetData></worksheet>'
+
+
+def _write_workbook(path):
+    # Ventas: encabezado + 3 filas de datos en la tabla TablaVentas (A1:B4) y una fila vacía con celda sin valor
+    ventas = _sheet({
+        1: [("A1", 0, "s"), ("B1", 1, "s")],
+        2: [("A2", "10", None), ("B2", "100", None)],
+        3: [("A3", "11", None), ("B3", "#REF!", "e")],
+        4: [("A4", "12", None), ("B4", "300", None)],
+        6: [("A6", None, None)],
+    })
+    resumen = _sheet({1: [("A1", "#N/A", "e")], 2: [("A2", "#N/A", "e")], 3: [("A3", "5", None)]})
+    parts = {
+        "[Content_Types].xml": '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>',
+        "xl/workbook.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><workbook xmlns="{MAIN}" xmlns:r="{REL}"><sheets>'
+            '<sheet name="Ventas" sheetId="1" r:id="rId1"/><sheet name="Resumen" sheetId="2" r:id="rId2"/>'
+            '<sheet name="Gráfico" sheetId="3" r:id="rId9"/>'
+            '</sheets><pivotCaches><pivotCache cacheId="1" r:id="rId3"/></pivotCaches></workbook>'
+        ),
+        "xl/_rels/workbook.xml.rels": _rels(
+            ("rId1", "worksheet", "worksheets/sheet1.xml", ""),
+            ("rId2", "worksheet", "worksheets/sheet2.xml", ""),
+            ("rId3", "pivotCacheDefinition", "pivotCache/pivotCacheDefinition1.xml", ""),
+            ("rId4", "connections", "connections.xml", ""),
+            ("rId5", "externalLink", "externalLinks/externalLink1.xml", ""),
+            ("rId9", "chartsheet", "chartsheets/sheet1.xml", ""), # No existe en el zip
+        ),
+        "xl/worksheets/sheet1.xml": ventas,
+        "xl/worksheets/_rels/sheet1.xml.rels": _rels(("rId1", "table", "../tables/table1.xml", "")),
+        "xl/tables/table1.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><table xmlns="{MAIN}" id="1" name="Tabla1" '
+            'displayName="TablaVentas" ref="A1:B4" headerRowCount="1"/>'
+        ),
+        "xl/worksheets/sheet2.xml": resumen,
+        "xl/connections.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><connections xmlns="{MAIN}">'
+            '<connection id="1" name="Consulta - Ventas" type="5" refreshedVersion="6"/></connections>'
+        ),
+        "xl/pivotCache/pivotCacheDefinition1.xml": (
+            f'<?xml version="1.0" encoding="UTF-8"?><pivotCacheDefinition xmlns="{MAIN}" refreshOnLoad="1">'
+            '<cacheSource type="worksheet"><worksheetSource name="TablaVentas"/></cacheSource></pivotCacheDefinition>'
+        ),
+        "xl/externalLinks/externalLink1.xml": f'<?xml version="1.0" encoding="UTF-8"?><externalLink xmlns="{MAIN}"/>',
+        "xl/externalLinks/_rels/externalLink1.xml.rels": _rels(
+            ("rId1", "externalLinkPath", "fuentes/Base%20Clientes.xlsx", ' TargetMode="External"'),
+        ),
+    }
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, content in parts.items():
+            zf.writestr(name, content)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "ventas.xlsx"
+    _write_workbook(path)
+    return str(path)
+
+
+def test_inspect_counts_rows_tables_and_errors(workbook):
+    report = inspect_xlsx(workbook)
+    assert report["hojas"] == {
+        "Ventas": {"filas": 4, "ultima_fila": 6, "errores": {"#REF!": 1}},
+        "Resumen": {"filas": 3, "ultima_fila": 3, "errores": {"#N/A": 2}},
+    }
+    assert report["tablas"] == {"TablaVentas": {"hoja": "Ventas", "filas": 3}}
+    assert total_errors(report) == 3
+
+
+def test_external_links_resolve_against_workbook_folder(workbook):
+    folder = os.path.dirname(workbook)
+    assert external_links(workbook) == [os.path.join(folder, "fuentes", "Base Clientes.xlsx")]
+
+
+@pytest.mark.parametrize("job, config, problems", [
+    ({}, {}, []),
+    ({"filas_minimas": 3}, {}, []),
+    ({"filas_minimas": 4}, {}, ["La tabla 'TablaVentas' tiene 3 filas (mínimo 4)"]),
+    ({"filas_minimas": {"Tabla*": 2, "Resumen": 5}}, {}, ["'Resumen' tiene 3 filas (mínimo 5)"]),
+    ({"filas_minimas": {"Inventario": 1}}, {}, ["No se encontró la tabla u hoja 'Inventario'"]),
+    ({}, {"MIN_ROWS_EXPECTED": "8"}, ["El libro tiene 7 filas con datos (mínimo 8)"]),
+    ({"max_celdas_error": 3}, {}, []),
+    ({}, {"MAX_ERROR_CELLS": "0"}, ["Hay 3 celdas con error (#REF!: 1, #N/A: 2), máximo 0"]),
+])
+def test_validation_rules_on_inspected_workbook(workbook, job, config, problems):
+    rules = ValidationRules.from_job(job, FakeConfig(config))
+    assert rules.check(inspect_xlsx(workbook)) == problems